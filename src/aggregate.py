@@ -2,52 +2,150 @@
 # aggregate.py — Crawl runs/, assemble a master run log and lint summaries.
 #
 # Usage:
-#   python aggregate.py --runs <runs_dir> --out <reports_dir>
+#   python aggregate.py --runs <runs_dir> --out <reports_dir> [--lint-jsonl <file>] [--full | --no-cache]
+#                       [--format csv|parquet|feather] [--threads N] [--stream [--spill-rows N]]
+#                       [--gold <rubric.csv> ...]
 #
-# Outputs (overwritten each run for simplicity):
+# Trials are the runs/<task>/<model>/<condition>/<sample>/ folders with a run.json,
+# found by crawl.py (exactly four levels deep; the key comes from the depth) and
+# parsed on --threads threads.
+#   python aggregate.py query [--db reports/results.sqlite] [--task T] [--model M] [--condition C]
+#                             [--sample S] [--rule R] [--status fail,warn] [--trial ID] [--limit N] [--count]
+#   python aggregate.py metrics [--db reports/results.sqlite] [--out reports/metrics] [--force]
+#                               [--bootstrap B [--confidence 0.95] [--cluster] [--seed S] [--jobs N]]
+#
+# `metrics` writes the paper tables in reports/metrics/ from results.sqlite (see
+# metrics.py); it does nothing while the store is unchanged since the last run.
+# --bootstrap adds <rate>_ci_low / <rate>_ci_high columns (see bootstrap.py).
+#
+# Incremental: the manifest in .cache/aggregate.sqlite (see aggregate_cache.py)
+# remembers the size, mtime and hash of every run.json / lint.json and the rows
+# parsed from them. A run re-parses only new or changed files, drops deleted
+# trials, and rewrites the reports from the stored rows; when nothing changed
+# since the reports in --out were written, it leaves them alone. --full re-reads
+# everything (and refreshes the manifest); --no-cache neither reads nor writes it.
+#
+# The human ratings in results.sqlite come from the --gold rubric files (default:
+# rubric_keys.DEFAULT_GOLD, resolved against the repo root).
+#
+# --stream keeps memory flat for any number of trials: records flow one at a time
+# from runs/ (or the cache) into results.sqlite and back out, and the report rows
+# are sorted externally: every --spill-rows rows go to a sorted spill file in a
+# temporary folder under --out, k-way merged (heapq.merge) while writing (see
+# external_sort.py). The reports are byte-identical to the default in-memory sort.
+#
+# With --lint-jsonl, lint results come from the JSON Lines file written by
+# `linter.py --batch ... --jsonl <file>` (read in one sequential pass) instead
+# of each trial's lint.json; this always re-reads everything. With --stream the
+# file is merge-joined with the crawl (both are in trial order) rather than loaded.
+#
+# Outputs (all rewritten when anything changed):
+#   reports/results.sqlite     (trials, lint results, rules and human ratings, indexed; upserted by
+#                               trial_id, see results_store.py — the CSVs below are exported from it)
 #   reports/runs.csv
 #   reports/lint_summary.csv
 #   reports/violations.csv
+#   reports/lint_timings.csv   (only when lint results carry `linter.py --timings` costs)
+#   reports/perf_patterns.csv  (per model × condition: share of trials free of perf_* findings,
+#                               and findings per perf rule and complexity class)
+#   reports/runs.parquet/, reports/lint_summary.parquet/  (--format parquet; .arrow/ with feather)
+#                               typed, dictionary-encoded datasets partitioned by task and model,
+#                               see columnar.py; without pyarrow only the CSVs are written
 import argparse
 import csv
+import hashlib
 import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 from collections import Counter
 
-def load_json(p: Path):
-    try:
-        return json.loads(p.read_text())
-    except Exception:
-        return None
+from aggregate_cache import AggregateCache
+from columnar import FORMATS, output_dirs, resolve_format, write_columnar
+from crawl import DEFAULT_THREADS, LEVELS, iter_json, iter_trials, load_json, trial_at, trial_fields
+from external_sort import ExternalSort
+from results_store import QUERY_COLUMNS, ResultsStore
+from rubric_keys import DEFAULT_GOLD, GOLD_FILES
+from runner import sha256
+from stats_utils import percentile_position
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument('--runs', default='runs', help='Path to runs/ directory (task-first)')
-    ap.add_argument('--out', default='reports', help='Directory to write aggregated CSVs')
-    args = ap.parse_args()
+# Bump when the records collect_trial() builds or the reports change shape (invalidates the cache).
+CACHE_VERSION = 2
+TRACKED = ('run.json', 'lint.json')
+STORE_NAME = 'results.sqlite'
+RUN_FIELDS = ['trial_id','task','model','condition','sample','timestamp','duration_sec','returncode',
+              'code_sha256','image_exists','image_sha256','image_w','image_h']
+LINT_ITEM_FIELDS = ['rule','status','value','detail','ratio']
+LINT_FIELDS = ['trial_id','task','model','condition','sample'] + LINT_ITEM_FIELDS
+SPILL_ROWS = 100_000
+ALWAYS_WRITTEN = ('runs.csv', 'lint_summary.csv', 'violations.csv', STORE_NAME)
 
-    runs_dir = Path(args.runs)
-    out_dir  = Path(args.out)
-    out_dir.mkdir(parents=True, exist_ok=True)
+def _jsonl_records(p: Path):
+    with p.open(encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def load_lint_jsonl(p: Path):
+    """Map trial_id -> lint results from a linter.py --jsonl file."""
+    return {rec['trial_id']: rec.get('lint') or [] for rec in _jsonl_records(p)}
+
+class LintJsonlStream:
+    """Lint results of a linter.py --jsonl file, read forward one record at a time.
 
-    run_rows = []
-    lint_rows = []
-    viol_counter = Counter()
+    The file is in crawl order (linter.py --batch writes it so), so calling this with the
+    trials of iter_trials() in turn is a merge join: records of trials without a run.json
+    are skipped, trials without a record get no results. Raises ValueError if the file
+    is not in crawl order; drain() reads the rest of it, so that is checked to the end.
+    """
+    def __init__(self, p: Path):
+        self.path = p
+        self.records = _jsonl_records(p)
+        self.started = False
+        self.key = None
+        self.rec = None
 
-    for run_json in runs_dir.rglob('run.json'):
-        trial_dir = run_json.parent
-        lint_json = trial_dir/'lint.json'
-        run = load_json(run_json)
-        lint = load_json(lint_json) or []
+    def _advance(self):
+        self.started = True
+        rec = next(self.records, None)
+        if rec is not None:
+            key = tuple(rec.get(k, '') for k in LEVELS)
+            if self.key is not None and key < self.key:
+                raise ValueError(f'{self.path} is not in crawl order at {rec["trial_id"]}')
+            self.key = key
+        self.rec = rec
 
-        parts = trial_dir.parts
-        task = parts[-4] if len(parts) >= 5 else ''
-        model = parts[-3] if len(parts) >= 3 else ''
-        condition = parts[-2] if len(parts) >= 2 else ''
-        sample = parts[-1] if len(parts) >= 1 else ''
-        trial_id = f'{task}__{model}__{condition}__{sample}'
+    def __call__(self, trial):
+        key = (trial.task, trial.model, trial.condition, trial.sample)
+        if not self.started:
+            self._advance()
+        while self.rec is not None and self.key < key:
+            self._advance()
+        if self.rec is not None and self.key == key:
+            return self.rec.get('lint') or []
+        return []
 
-        run_rows.append({
+    def drain(self):
+        while not self.started or self.rec is not None:
+            self._advance()
+
+def split_values(value):
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+def build_record(trial_id, task, model, condition, sample, run, lint):
+    """One trial's record: run.json metadata (parsed, or None) and its lint results."""
+    return {
+        'trial_id': trial_id,
+        'task': task,
+        'model': model,
+        'condition': condition,
+        'sample': sample,
+        'run': {
             'trial_id': trial_id,
             'task': task,
             'model': model,
@@ -61,57 +159,397 @@ def main():
             'image_sha256': run.get('image_sha256') if run else '',
             'image_w': (run.get('image_size_px') or {}).get('width') if run else '',
             'image_h': (run.get('image_size_px') or {}).get('height') if run else '',
-        })
-
-        for item in lint:
-            row = {
-                'trial_id': trial_id,
-                'task': task,
-                'model': model,
-                'condition': condition,
-                'sample': sample,
-                'rule': item.get('rule',''),
-                'status': item.get('status',''),
-                'value': item.get('value',''),
-                'detail': item.get('detail',''),
-                'ratio': item.get('ratio',''),
-            }
-            lint_rows.append(row)
-
-            status = item.get('status','')
-            if status in ('fail','warn'):
-                key = (task, model, condition, item.get('rule',''))
-                viol_counter[key] += 1
-
-    runs_csv = out_dir/'runs.csv'
-    with runs_csv.open('w', newline='', encoding='utf-8') as f:
-        w = csv.DictWriter(f, fieldnames=[
-            'trial_id','task','model','condition','sample',
-            'timestamp','duration_sec','returncode',
-            'code_sha256','image_exists','image_sha256','image_w','image_h'
-        ])
-        w.writeheader()
-        for r in sorted(run_rows, key=lambda x: x['trial_id']):
-            w.writerow(r)
-
-    lint_csv = out_dir/'lint_summary.csv'
-    with lint_csv.open('w', newline='', encoding='utf-8') as f:
-        fields = ['trial_id','task','model','condition','sample','rule','status','value','detail','ratio']
-        w = csv.DictWriter(f, fieldnames=fields)
-        w.writeheader()
-        for r in sorted(lint_rows, key=lambda x: (x['rule'], x['trial_id'])):
-            w.writerow({k: r.get(k,'') for k in fields})
-
-    viol_csv = out_dir/'violations.csv'
-    with viol_csv.open('w', newline='', encoding='utf-8') as f:
-        w = csv.writer(f)
-        w.writerow(['task','model','condition','rule','violations'])
-        for (task, model, condition, rule), count in sorted(viol_counter.items()):
-            w.writerow([task, model, condition, rule, count])
-
-    print(f'[aggregate] Wrote {runs_csv}')
-    print(f'[aggregate] Wrote {lint_csv}')
-    print(f'[aggregate] Wrote {viol_csv}')
+        },
+        'lint': lint,
+    }
+
+def collect_trial(trial_dir: Path, lint=None):
+    """One trial's run.json metadata and lint results (read from lint.json unless given)."""
+    if lint is None:
+        lint = load_json(trial_dir/'lint.json') or []
+    return build_record(*trial_fields(trial_dir), load_json(trial_dir/'run.json'), lint)
+
+def iter_records(trials, lint_for=None, threads=DEFAULT_THREADS):
+    """(trial folder, record) for crawled trials, parsing their JSON files on `threads` threads, a batch at a time.
+
+    lint_for(trial) gives a trial's lint results; by default they are read from its lint.json."""
+    names = TRACKED if lint_for is None else ('run.json',)
+    for t, docs in iter_json(trials, names, threads):
+        lint = (docs['lint.json'] or []) if lint_for is None else lint_for(t)
+        yield t.path, build_record(t.trial_id, t.task, t.model, t.condition, t.sample, docs['run.json'], lint)
+
+def stream_records(runs_dir: Path, lint_for=None, threads=DEFAULT_THREADS):
+    """The records of collect(), one at a time; a LintJsonlStream is drained at the end, so a
+    file out of crawl order raises before the store commits anything."""
+    for _, rec in iter_records(iter_trials(runs_dir), lint_for, threads):
+        yield rec
+    if isinstance(lint_for, LintJsonlStream):
+        lint_for.drain()
+
+def collect(runs_dir: Path, lint_for=None, threads=DEFAULT_THREADS):
+    """trial_id -> record for every runs/<task>/<model>/<condition>/<sample>/ folder that has a run.json."""
+    return {rec['trial_id']: rec for _, rec in iter_records(iter_trials(runs_dir), lint_for, threads)}
+
+def cache_key(runs_dir: Path):
+    return f'{runs_dir.resolve()}|v{CACHE_VERSION}'
+
+def sync_manifest(runs_dir: Path, cache, full=False, threads=DEFAULT_THREADS):
+    """Bring the cached records of runs_dir up to date, re-reading only trials whose run.json/lint.json
+    are new or changed (size/mtime moved and the hash differs) and dropping deleted trials.
+
+    Returns (changed, state): whether any record changed, and a digest of every file the records
+    were built from.
+    """
+    key = cache_key(runs_dir)
+    seen = {t.path: t for t in iter_trials(runs_dir.resolve(), stat=TRACKED)}
+    manifest = cache.manifest(key)
+    dirty, updates, current = set(), [], {}
+    for trial, t in seen.items():
+        for name, st in t.stats.items():
+            path = f'{trial}{os.sep}{name}'
+            old = manifest.get(path)
+            if not full and old is not None and old[1:3] == (st.st_size, st.st_mtime_ns):
+                current[path] = old[3]
+                continue
+            digest = sha256(Path(path))
+            current[path] = digest
+            updates.append((path, trial, st.st_size, st.st_mtime_ns, digest))
+            if full or old is None or old[3] != digest:
+                dirty.add(trial)
+    gone_files = [p for p in manifest if p not in current]
+    dirty.update(manifest[p][0] for p in gone_files if manifest[p][0] in seen)   # e.g. lint.json deleted
+    gone_trials = {manifest[p][0] for p in gone_files} - seen.keys()
+    # parsed and stored a batch at a time
+    fresh = iter_records([seen[d] for d in sorted(dirty)], threads=threads)
+    cache.update(key, files=updates, gone_files=gone_files, records=fresh, gone_trials=gone_trials)
+    if dirty or gone_trials:
+        print(f'[aggregate] {len(dirty)} trials (re)read, {len(gone_trials)} removed, '
+              f'{len(seen) - len(dirty)} unchanged')
+    state = hashlib.sha256('\n'.join([key] + [f'{p}\t{current[p]}' for p in sorted(current)]).encode())
+    return bool(dirty or gone_trials), state.hexdigest()
+
+def refresh_trials(runs_dir: Path, cache, trial_dirs, threads=DEFAULT_THREADS):
+    """Re-read the run.json/lint.json of the given trial folders of runs_dir into the cache (manifest
+    and records), for callers that know which trials changed; returns trial_id -> record of those
+    that have a run.json. Trials without one are dropped from the cache."""
+    key = cache_key(runs_dir)
+    manifest = cache.manifest(key)
+    by_trial = {}
+    for path, (trial, *_) in manifest.items():
+        by_trial.setdefault(trial, []).append(path)
+    live, updates, gone_files, gone_trials = [], [], [], []
+    for d in trial_dirs:
+        t = trial_at(Path(d).resolve(), stat=TRACKED)
+        if t is None:
+            gone_files.extend(by_trial.get(str(Path(d).resolve()), []))
+            gone_trials.append(str(Path(d).resolve()))
+            continue
+        live.append(t)
+        for name in TRACKED:
+            path = f'{t.path}{os.sep}{name}'
+            st = t.stats.get(name)
+            if st is not None:
+                updates.append((path, t.path, st.st_size, st.st_mtime_ns, sha256(Path(path))))
+            elif path in manifest:
+                gone_files.append(path)
+    records = list(iter_records(live, threads=threads))
+    cache.update(key, files=updates, gone_files=gone_files, records=records, gone_trials=gone_trials)
+    return {rec['trial_id']: rec for _, rec in records}
+
+def report_state(state, fmt, gold):
+    """What reports are written from: the runs state of sync_manifest(), the format and the rubric files."""
+    files = [f'{Path(g).resolve()}={sha256(Path(g)) if Path(g).exists() else ""}' for g in gold]
+    return ':'.join([state, fmt] + files)
+
+def cached_trials(runs_dir: Path, cache):
+    """trial_id -> record, as collect() would return, from the cache."""
+    return {rec['trial_id']: rec for _, rec in sorted(cache.records(cache_key(runs_dir)).items())}
+
+def cell(value):
+    """A value as csv.writer writes it (None -> '', numbers and lists via str())."""
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else str(value)
+
+def timing_rows(costs, counts):
+    """lint_timings.csv rows from (rule, time_ms, bytes_read) cells sorted by rule and time, read once.
+
+    counts: rule -> number of entries, in the order the rules were first seen (ties in total time keep it).
+    """
+    out = []
+    order = {rule: i for i, rule in enumerate(counts)}
+    for rule, group in groupby(costs, key=itemgetter(0)):
+        n = counts[rule]
+        spots = [percentile_position(n, q) for q in (50, 95)]
+        wanted = {i for _, lo, hi in spots for i in (lo, hi)}
+        picked, total, nbytes = {}, 0, 0
+        for i, (_, ms, b) in enumerate(group):
+            total += ms
+            nbytes += b
+            if i in wanted:
+                picked[i] = ms
+        p50, p95 = (picked[lo] + (pos - lo) * (picked[hi] - picked[lo]) for pos, lo, hi in spots)
+        out.append((-total, order[rule], [rule, n, round(p50, 3), round(p95, 3), ms, round(total, 3),
+                                          round(nbytes / n)]))
+    return [row for *_, row in sorted(out)]
+
+def write_reports(out_dir: Path, trials, fmt='csv', spill_rows=None):
+    """(Re)write every report from collected trials (trial_id -> record, or any iterable of records);
+    returns the paths written.
+
+    Rows are sorted with external_sort.ExternalSort: in memory by default; with spill_rows,
+    in sorted spill files of that many rows (in a temporary folder under out_dir) merged
+    back while writing, so memory stays flat however many trials there are. The output
+    is the same either way. Counts are kept per (task, model, condition, rule).
+
+    With fmt 'parquet' or 'feather' (see columnar.py), runs and lint_summary are also
+    written as datasets partitioned by task and model.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if isinstance(trials, dict):
+        trials = trials.values()
+    written = []
+    with (tempfile.TemporaryDirectory(prefix='.spill-', dir=out_dir) if spill_rows
+          else nullcontext()) as tmp:
+        run_rows = ExternalSort(tmp, spill_rows, 'runs')
+        lint_rows = ExternalSort(tmp, spill_rows, 'lint')
+        costs = ExternalSort(tmp, spill_rows, 'costs')  # (rule, time_ms, bytes_read) of entries computed (not cached) with --timings
+        cost_counts = {}  # rule -> timed entries
+        viol_counter = Counter()
+        perf_trials = {}  # (model, condition) -> [trials with perf_* results, of which without findings]
+        perf_counter = Counter()  # (model, condition, rule, complexity) -> findings
+
+        for rec in trials:
+            trial_id, task, model, condition = rec['trial_id'], rec['task'], rec['model'], rec['condition']
+            run_rows.add([trial_id], [cell(rec['run'].get(k)) for k in RUN_FIELDS])
+            perf_results = perf_findings = 0
+            for seq, item in enumerate(rec['lint']):
+                rule = item.get('rule','')
+                lint_rows.add([rule, trial_id, seq],
+                              [trial_id, task, model, condition, rec['sample']] + [cell(item.get(k,'')) for k in LINT_ITEM_FIELDS])
+
+                if rule.startswith('perf_'):
+                    perf_results += 1
+                    if item.get('status') == 'warn':
+                        for found in item.get('findings') or [item]:
+                            perf_findings += 1
+                            perf_counter[(model, condition, rule, found.get('complexity',''))] += 1
+
+                if 'time_ms' in item and not item.get('cached'):
+                    costs.add([rule, item['time_ms']], [rule, item['time_ms'], item.get('bytes_read') or 0])
+                    cost_counts[rule] = cost_counts.get(rule, 0) + 1
+
+                status = item.get('status','')
+                if status in ('fail','warn'):
+                    key = (task, model, condition, rule)
+                    viol_counter[key] += 1
+            if perf_results:
+                seen = perf_trials.setdefault((model, condition), [0, 0])
+                seen[0] += 1
+                seen[1] += perf_findings == 0
+
+        runs_csv = out_dir/'runs.csv'
+        with runs_csv.open('w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            w.writerow(RUN_FIELDS)
+            w.writerows(run_rows)
+        written.append(runs_csv)
+
+        lint_csv = out_dir/'lint_summary.csv'
+        with lint_csv.open('w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            w.writerow(LINT_FIELDS)
+            w.writerows(lint_rows)
+        written.append(lint_csv)
+        if fmt != 'csv':
+            written.extend(write_columnar(out_dir, run_rows, lint_rows, fmt))
+
+        viol_csv = out_dir/'violations.csv'
+        with viol_csv.open('w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            w.writerow(['task','model','condition','rule','violations'])
+            for (task, model, condition, rule), count in sorted(viol_counter.items()):
+                w.writerow([task, model, condition, rule, count])
+        written.append(viol_csv)
+
+        if cost_counts:
+            timings_csv = out_dir/'lint_timings.csv'
+            with timings_csv.open('w', newline='', encoding='utf-8') as f:
+                w = csv.writer(f)
+                w.writerow(['rule','n','p50_ms','p95_ms','max_ms','total_ms','mean_bytes_read'])
+                w.writerows(timing_rows(costs, cost_counts))
+            written.append(timings_csv)
+
+    if perf_trials:
+        perf_csv = out_dir/'perf_patterns.csv'
+        with perf_csv.open('w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            w.writerow(['model','condition','trials','scalable_trials','scalable_share','rule','complexity','findings'])
+            for (model, condition), (n, clean) in sorted(perf_trials.items()):
+                head = [model, condition, n, clean, round(clean / n, 3)]
+                found = sorted((k[2], k[3], c) for k, c in perf_counter.items() if k[:2] == (model, condition))
+                for rule, complexity, c in found or [('', '', 0)]:
+                    w.writerow(head + [rule, complexity, c])
+        written.append(perf_csv)
+    return written
+
+def export(out_dir: Path, trials, verbose=True, fmt='csv', spill_rows=None, gold=DEFAULT_GOLD):
+    """Upsert trials into out_dir/results.sqlite, refresh the ratings from the `gold` rubric files
+    and export the CSVs from it.
+
+    With spill_rows, trials may be an iterator and the records are streamed out of the store
+    (see write_reports).
+    """
+    store = ResultsStore(out_dir/STORE_NAME)
+    try:
+        upserted, deleted = store.sync(trials)
+        store.sync_ratings(gold)
+        records = store.iter_records() if spill_rows else store.records()
+        written = write_reports(out_dir, records, fmt, spill_rows)
+    finally:
+        store.close()
+    if verbose:
+        print(f'[aggregate] {out_dir/STORE_NAME}: {upserted} trials upserted, {deleted} deleted')
+        for path in written:
+            print(f'[aggregate] Wrote {path}')
+
+def query(args):
+    t0 = time.perf_counter()
+    if not Path(args.db).exists():
+        print(f'[aggregate] No results store at {args.db}; run aggregate.py first', file=sys.stderr)
+        sys.exit(1)
+    store = ResultsStore(args.db)
+    try:
+        rows = store.query(task=args.task, model=args.model, condition=args.condition, sample=args.sample,
+                           rule=args.rule, status=args.status, trial_id=args.trial, limit=args.limit)
+    finally:
+        store.close()
+    if args.count:
+        print(len(rows))
+    else:
+        w = csv.writer(sys.stdout)
+        w.writerow(QUERY_COLUMNS)
+        w.writerows(rows)
+    print(f'[aggregate] {len(rows)} rows in {(time.perf_counter() - t0) * 1000:.1f} ms', file=sys.stderr)
+
+def write_metrics_tables(args):
+    """The reports/metrics tables from results.sqlite, unless they are up to date with it."""
+    from metrics import add_intervals, compute_metrics, load_lint, metrics_files, store_digest, write_metrics
+    if not Path(args.db).exists():
+        print(f'[aggregate] No results store at {args.db}; run aggregate.py first', file=sys.stderr)
+        sys.exit(1)
+    out_dir = Path(args.metrics_out)
+    store = ResultsStore(args.db)
+    try:
+        key = f'metrics:{out_dir.resolve()}'
+        state = store_digest(store.conn)
+        if args.bootstrap:
+            state += f' bootstrap:{args.bootstrap}:{args.confidence}:{args.cluster}:{args.seed}'
+        if (not args.force and store.meta(key) == state
+                and all(p.exists() for p in metrics_files(out_dir))):
+            print(f'[aggregate] {args.db} unchanged; metrics in {out_dir} are up to date')
+            return
+        t0 = time.perf_counter()
+        lint = load_lint(store.conn)
+        tables = compute_metrics(lint)
+        if args.bootstrap:
+            add_intervals(tables, lint, args.bootstrap, args.confidence, args.cluster, args.seed, args.jobs)
+        written = write_metrics(tables, out_dir)
+        store.set_meta(key, state)
+    finally:
+        store.close()
+    for path in written:
+        print(f'[aggregate] Wrote {path}')
+    print(f'[aggregate] {len(written)} metrics tables in {time.perf_counter() - t0:.2f} s', file=sys.stderr)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--runs', default='runs', help='Path to runs/ directory (task-first)')
+    ap.add_argument('--out', default='reports', help='Directory to write aggregated CSVs and results.sqlite')
+    ap.add_argument('--lint-jsonl', help='Read lint results from this linter.py --jsonl file')
+    ap.add_argument('--full', action='store_true', help='Re-read every run.json/lint.json (refreshes the manifest)')
+    ap.add_argument('--no-cache', action='store_true', help='Do not use or update .cache/aggregate.sqlite')
+    ap.add_argument('--threads', type=int, default=DEFAULT_THREADS, help='Threads parsing run.json/lint.json')
+    ap.add_argument('--stream', action='store_true',
+                    help='Bounded memory: stream trials and sort report rows through spill files')
+    ap.add_argument('--spill-rows', type=int, default=SPILL_ROWS, help='(--stream) rows per sorted spill file')
+    ap.add_argument('--gold', action='append',
+                    help=f'Human rubric CSV loaded into the ratings table (repeatable; default: {", ".join(GOLD_FILES)})')
+    ap.add_argument('--format', choices=FORMATS, default='csv',
+                    help='Also write runs/lint_summary as Parquet or Arrow IPC datasets (needs pyarrow)')
+    sub = ap.add_subparsers(dest='cmd')
+    q = sub.add_parser('query', help='Filter lint results in results.sqlite (values may be comma-separated)')
+    q.add_argument('--db', default=f'reports/{STORE_NAME}')
+    for key in ('task', 'model', 'condition', 'sample', 'rule', 'status', 'trial'):
+        q.add_argument(f'--{key}', type=split_values)
+    q.add_argument('--limit', type=int)
+    q.add_argument('--count', action='store_true', help='Print the number of matching rows only')
+    m = sub.add_parser('metrics', help='Write the paper tables (reports/metrics/*.csv) from results.sqlite')
+    m.add_argument('--db', default=f'reports/{STORE_NAME}')
+    m.add_argument('--out', dest='metrics_out', default='reports/metrics', help='Directory for the tables')
+    m.add_argument('--force', action='store_true', help='Rewrite the tables even if results.sqlite is unchanged')
+    m.add_argument('--bootstrap', type=int, default=0, metavar='B',
+                   help='Append bootstrap confidence intervals from B resamples (e.g. 10000) to the rate columns')
+    m.add_argument('--confidence', type=float, default=0.95, help='(--bootstrap) interval coverage')
+    m.add_argument('--cluster', action='store_true', help='(--bootstrap) resample whole tasks, not lint results')
+    m.add_argument('--seed', type=int, default=0, help='(--bootstrap) random seed')
+    m.add_argument('--jobs', type=int, default=1, help='(--bootstrap) worker processes drawing the resamples')
+    args = ap.parse_args()
+    if args.cmd == 'query':
+        query(args)
+        return
+    if args.cmd == 'metrics':
+        write_metrics_tables(args)
+        return
+    out_dir = Path(args.out)
+    fmt, note = resolve_format(args.format)
+    if note:
+        print(f'[aggregate] {note}', file=sys.stderr)
+    outputs = list(ALWAYS_WRITTEN) + ([p.name for p in output_dirs(out_dir, fmt)] if fmt != 'csv' else [])
+    spill_rows = max(1, args.spill_rows) if args.stream else None
+    gold = args.gold or DEFAULT_GOLD
+
+    if args.no_cache or args.lint_jsonl:
+        lint_for = None
+        if args.lint_jsonl and args.stream:
+            lint_for = LintJsonlStream(Path(args.lint_jsonl))
+        elif args.lint_jsonl:
+            by_trial = load_lint_jsonl(Path(args.lint_jsonl))
+            lint_for = lambda t: by_trial.get(t.trial_id, [])
+        try:
+            if args.stream:
+                trials = stream_records(Path(args.runs), lint_for, args.threads)
+            else:
+                trials = collect(Path(args.runs), lint_for, args.threads)
+            export(out_dir, trials, fmt=fmt, spill_rows=spill_rows, gold=gold)
+        except ValueError as e:
+            print(f'[aggregate] {e}', file=sys.stderr)
+            sys.exit(2)
+        if not args.no_cache:
+            # these reports were not written from the manifest: rewrite them next time
+            cache = AggregateCache()
+            cache.set_output_state(str(out_dir.resolve()), None)
+            cache.close()
+        return
+
+    runs_dir = Path(args.runs)
+    cache = AggregateCache()
+    try:
+        out_key = str(out_dir.resolve())
+        changed, state = sync_manifest(runs_dir, cache, args.full, args.threads)
+        state = report_state(state, fmt, gold)
+        if (not changed and cache.output_state(out_key) == state
+                and all((out_dir/n).exists() for n in outputs)):
+            print(f'[aggregate] No changes under {runs_dir}; reports in {out_dir} are up to date')
+            return
+        if args.stream:
+            trials = (rec for _, rec in cache.iter_records(cache_key(runs_dir)))
+        else:
+            trials = cached_trials(runs_dir, cache)
+        export(out_dir, trials, fmt=fmt, spill_rows=spill_rows, gold=gold)
+        cache.set_output_state(out_key, state)
+    finally:
+        cache.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# aggregate_cache.py — What aggregate.py has already read, so it only re-reads what changed.
+#
+# Three tables (files and trials per runs/ directory):
+#   files   — manifest of every run.json / lint.json read: size, mtime (ns), SHA-256
+#   trials  — the parsed trial record (collect_trial()) as JSON
+#   outputs — per reports directory, a digest of the runs/ directory and manifest
+#             the reports were last written from (unchanged digest + reports
+#             present = nothing to do)
+#
+# A file whose size and mtime match the manifest is trusted without reading it;
+# one whose size/mtime moved is hashed, and its trial re-parsed only if the hash
+# changed too.
+import json
+import sqlite3
+from pathlib import Path
+
+DEFAULT_CACHE = Path(__file__).resolve().parent.parent / '.cache' / 'aggregate.sqlite'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    runs_dir TEXT NOT NULL,
+    path     TEXT NOT NULL,
+    trial    TEXT NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256   TEXT NOT NULL,
+    PRIMARY KEY (runs_dir, path)
+);
+CREATE TABLE IF NOT EXISTS trials (
+    runs_dir TEXT NOT NULL,
+    trial    TEXT NOT NULL,
+    record   TEXT NOT NULL,
+    PRIMARY KEY (runs_dir, trial)
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    out_dir  TEXT PRIMARY KEY,
+    state    TEXT NOT NULL
+);
+'''
+
+class AggregateCache:
+    def __init__(self, path=DEFAULT_CACHE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=60)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def manifest(self, runs_dir: str):
+        """path -> (trial, size, mtime_ns, sha256) of every file recorded for runs_dir."""
+        rows = self.conn.execute('SELECT path, trial, size, mtime_ns, sha256 FROM files WHERE runs_dir=?',
+                                 (runs_dir,))
+        return {path: (trial, size, mtime, sha) for path, trial, size, mtime, sha in rows}
+
+    def records(self, runs_dir: str):
+        """trial folder -> parsed record of every trial stored for runs_dir."""
+        return dict(self.iter_records(runs_dir))
+
+    def iter_records(self, runs_dir: str):
+        """(trial folder, parsed record) of every trial stored for runs_dir, by folder, one at a time."""
+        rows = self.conn.execute('SELECT trial, record FROM trials WHERE runs_dir=? ORDER BY trial', (runs_dir,))
+        for trial, record in rows:
+            yield trial, json.loads(record)
+
+    def update(self, runs_dir: str, files=(), gone_files=(), records=(), gone_trials=()):
+        """Upsert manifest entries (path, trial, size, mtime_ns, sha256) and records ({trial: record}, or
+        (trial, record) pairs, consumed lazily); delete the given paths and trials. One transaction."""
+        if isinstance(records, dict):
+            records = records.items()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO files (runs_dir, path, trial, size, mtime_ns, sha256) '
+                'VALUES (?, ?, ?, ?, ?, ?)', [(runs_dir, *f) for f in files])
+            self.conn.executemany('DELETE FROM files WHERE runs_dir=? AND path=?',
+                                  [(runs_dir, p) for p in gone_files])
+            self.conn.executemany('INSERT OR REPLACE INTO trials (runs_dir, trial, record) VALUES (?, ?, ?)',
+                                  ((runs_dir, t, json.dumps(r)) for t, r in records))
+            self.conn.executemany('DELETE FROM trials WHERE runs_dir=? AND trial=?',
+                                  [(runs_dir, t) for t in gone_trials])
+
+    def output_state(self, out_dir: str):
+        row = self.conn.execute('SELECT state FROM outputs WHERE out_dir=?', (out_dir,)).fetchone()
+        return row[0] if row else None
+
+    def set_output_state(self, out_dir: str, state):
+        """Record what the reports in out_dir were written from (None: unknown, rewrite next time)."""
+        with self.conn:
+            if state is None:
+                self.conn.execute('DELETE FROM outputs WHERE out_dir=?', (out_dir,))
+            else:
+                self.conn.execute('INSERT OR REPLACE INTO outputs (out_dir, state) VALUES (?, ?)',
+                                  (out_dir, state))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# agreement.py — How well do the lint rules agree with the human raters?
+#
+# Usage:
+#   python agreement.py [--lint-summary reports/lint_summary.csv]
+#                       [--gold reports/LLM_Plotting_Rubric.csv --gold rating/clean_llm_rubric.csv]
+#                       [--out reports]
+#
+# Human verdicts are per (task, model, condition) and rubric item; the lint
+# verdicts in lint_summary.csv are per trial and rule. Both sides get a
+# normalized key (TASK_ALIASES / MODEL_ALIASES: 'small multi' -> t05_small_multiples,
+# 'ChatGPT 5 Thinking' -> gpt5thinking, 'prompt_style' -> condition) and are
+# hash-joined on it (pandas merge). RUBRIC_RULES says which rules speak to
+# which rubric item.
+#
+# The positive class is a *problem*: the human answered "no" to the rubric item,
+# or the rule's worst status over the samples of the cell is warn/fail. Cells
+# where a rule only gave info/error or the rater left the item blank are left
+# out. With several raters (clean_llm_rubric.csv) the gold verdict is the
+# majority; ties are left out.
+#
+# Output: reports/lint_agreement.csv — per gold file, rubric item and rule:
+#   n, tp/fp/fn/tn (confusion matrix), precision, recall, cohen_kappa,
+#   human_problem_rate, lint_flag_rate
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from rubric_keys import COLUMNS, DEFAULT_GOLD, GOLD_FILES, MODEL_ALIASES, TASK_ALIASES
+
+PERF_RULES = ['perf_row_iteration', 'perf_apply_axis1', 'perf_plot_in_row_loop', 'perf_repeated_read',
+              'perf_manual_binning', 'perf_figure_in_loop']
+
+# rubric item (normalized) -> lint rules that check part of it
+RUBRIC_RULES = {
+    'alignedscales': ['dual_axes'],
+    'scaleconsistencyacrosspanels': ['dual_axes'],
+    'axisintegrity': ['baseline_zero_bar', 'dual_axes'],
+    'appropriatevisualencoding': ['baseline_zero_bar', 'dual_axes'],
+    'encodingchoicematchestask': ['baseline_zero_bar', 'dual_axes'],
+    'colorblindsafety': ['palette_cvd'],
+    'colorcontrastcolorblindsafety': ['contrast_text', 'contrast_text_exact', 'palette_cvd'],
+    'legibility': ['contrast_text', 'contrast_text_exact'],
+    'textclarity': ['labels_present'],
+    'labelsunitstitleslegends': ['labels_present', 'legend_call', 'colorbar_label'],
+    'legendencodingalignment': ['legend_call', 'colorbar_present'],
+    'codereproducibility': ['determinism_seed'],
+    'codevalidityreproducibility': ['determinism_seed'],
+    'efficiency': PERF_RULES,
+}
+KEY = ['task', 'model', 'condition']
+SEVERITY = {'pass': 0, 'warn': 1, 'fail': 2}
+
+def norm(s: pd.Series):
+    """casefolded, without anything but letters and digits ('Legend–encoding alignment' -> 'legendencodingalignment')."""
+    return s.astype(str).str.casefold().str.replace(r'[^a-z0-9]+', '', regex=True)
+
+def normalize_key(df: pd.DataFrame):
+    df['task'] = norm(df['task']).map(TASK_ALIASES)
+    df['model'] = norm(df['model']).map(MODEL_ALIASES)
+    df['condition'] = norm(df['condition'])
+    return df
+
+def load_gold(path: Path):
+    """(task, model, condition, item, rubric, problem) with one row per cell and item."""
+    df = pd.read_csv(path, dtype=str).rename(columns=COLUMNS)
+    missing = sorted({'rubric', 'answer', *KEY} - set(df.columns))
+    if missing:
+        raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+    df = normalize_key(df)
+    answer = df['answer'].str.strip().str.casefold()
+    df['problem'] = answer.map({'no': 1.0, 'yes': 0.0})
+    df['item'] = norm(df['rubric'])
+    df = df.dropna(subset=['problem', *KEY])
+    # majority over raters; ties (mean exactly 0.5) are dropped
+    votes = df.groupby([*KEY, 'item'], sort=False).agg(rubric=('rubric', 'first'), problem=('problem', 'mean'))
+    votes = votes[votes['problem'] != 0.5]
+    votes['problem'] = (votes['problem'] > 0.5).astype(np.int8)
+    return votes.reset_index()
+
+def load_lint(path: Path):
+    """(task, model, condition, rule, flagged): worst pass/warn/fail over the cell's samples."""
+    df = pd.read_csv(path, usecols=['task', 'model', 'condition', 'rule', 'status'], dtype=str)
+    df['severity'] = df['status'].map(SEVERITY)
+    df = df.dropna(subset=['severity'])
+    worst = df.groupby(KEY + ['rule'], sort=False)['severity'].max()
+    return (worst > 0).astype(np.int8).rename('flagged').reset_index()
+
+def agreement(gold: pd.DataFrame, lint: pd.DataFrame):
+    """Confusion matrix, precision, recall and Cohen's kappa per (rubric, rule)."""
+    pairs = pd.DataFrame([(item, r) for item, rules in RUBRIC_RULES.items() for r in rules],
+                         columns=['item', 'rule'])
+    joined = gold.merge(pairs, on='item').merge(lint, on=KEY + ['rule'])
+    h, l = joined['problem'].to_numpy(), joined['flagged'].to_numpy()
+    joined = joined.assign(tp=h & l, fp=(1 - h) & l, fn=h & (1 - l), tn=(1 - h) & (1 - l))
+    m = joined.groupby(['rubric', 'rule'], sort=True)[['tp', 'fp', 'fn', 'tn']].sum().reset_index()
+    tp, fp, fn, tn = (m[c].to_numpy(dtype=float) for c in ('tp', 'fp', 'fn', 'tn'))
+    n = tp + fp + fn + tn
+    with np.errstate(divide='ignore', invalid='ignore'):
+        po = (tp + tn) / n
+        pe = ((tp + fp) * (tp + fn) + (fn + tn) * (fp + tn)) / (n * n)
+        m['n'] = n.astype(int)
+        m['precision'] = np.round(tp / (tp + fp), 3)
+        m['recall'] = np.round(tp / (tp + fn), 3)
+        # kappa is undefined when both sides are constant and agree (pe == 1)
+        m['cohen_kappa'] = np.round(np.where(pe < 1, (po - pe) / (1 - pe), np.nan), 3)
+        m['human_problem_rate'] = np.round((tp + fn) / n, 3)
+        m['lint_flag_rate'] = np.round((tp + fp) / n, 3)
+    return m[['rubric', 'rule', 'n', 'tp', 'fp', 'fn', 'tn', 'precision', 'recall', 'cohen_kappa',
+              'human_problem_rate', 'lint_flag_rate']]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--lint-summary', default='reports/lint_summary.csv')
+    ap.add_argument('--gold', action='append', help=f'Human rubric CSV (repeatable; default: {", ".join(GOLD_FILES)})')
+    ap.add_argument('--out', default='reports', help='Directory to write lint_agreement.csv')
+    args = ap.parse_args()
+
+    lint = load_lint(Path(args.lint_summary))
+    if lint.empty:
+        print(f'[agreement] No pass/warn/fail verdicts in {args.lint_summary}; run linter.py and aggregate.py first',
+              file=sys.stderr)
+        sys.exit(1)
+    tables = []
+    for path in map(Path, args.gold or DEFAULT_GOLD):
+        if not path.exists():
+            print(f'[agreement] Skipping missing gold file: {path}', file=sys.stderr)
+            continue
+        gold = load_gold(path)
+        unmatched = len(gold.drop_duplicates(KEY).merge(lint[KEY].drop_duplicates(), how='left',
+                                                        on=KEY, indicator=True).query('_merge == "left_only"'))
+        table = agreement(gold, lint)
+        table.insert(0, 'gold', path.name)
+        tables.append(table)
+        print(f'[agreement] {path.name}: {len(gold)} human verdicts, {int(table["n"].sum())} compared '
+              f'across {len(table)} rubric × rule pairs ({unmatched} cells without lint results)')
+    if not tables:
+        print('[agreement] No gold files found', file=sys.stderr)
+        sys.exit(1)
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_csv = out_dir/'lint_agreement.csv'
+    pd.concat(tables, ignore_index=True).to_csv(out_csv, index=False)
+    print(f'[agreement] Wrote {out_csv}')
+
+if __name__ == '__main__':
+    main()
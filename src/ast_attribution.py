@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# ast_attribution.py — Which code edits go with which lint fixes across conditions?
+#
+# Usage:
+#   python ast_attribution.py [--runs runs] [--out reports] [--min-pairs 2] [--no-cache]
+#
+# For every task × model × sample, the code.py of baseline, standards and
+# selfcheck are reduced to a multiset of call sites (`call:set_title`) and
+# keyword arguments (`kw:bar.color`). The structural diff of each condition pair
+# (baseline→standards, baseline→selfcheck) is a set of edits ('+' for a site or
+# keyword that was added, '-' for one that was removed). The diff is joined with
+# the lint status of the same pair: a rule is *fixed* when it failed/warned
+# on baseline and passes on the other condition.
+#
+# Outputs:
+#   reports/ast_diffs.csv           — one row per pair: edits, fixed and regressed rules
+#   reports/ast_fix_attribution.csv — per rule and edit, among pairs where baseline
+#                                     violated the rule: how often the edit appears,
+#                                     the fix rate with and without it, and the lift
+#
+# The call-site multisets are cached in the lint cache (.cache/lint.sqlite) by
+# code_sha256, so re-analysis only parses code.py files that changed.
+import argparse
+import ast
+import csv
+import json
+from collections import Counter
+from pathlib import Path
+
+from crawl import walk
+from lint_cache import DEFAULT_CACHE, LintCache
+from linter import TrialInputs
+
+PAIRS = [('baseline', 'standards'), ('baseline', 'selfcheck')]
+FEATURES_VERSION = 1
+SEVERITY = {'pass': 0, 'warn': 1, 'fail': 2}
+
+def call_features(source: str):
+    """Counter of 'call:<name>' and 'kw:<name>.<arg>' over every call site (empty if unparsable)."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return Counter()
+    feats = Counter()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        f = node.func
+        name = f.attr if isinstance(f, ast.Attribute) else (f.id if isinstance(f, ast.Name) else None)
+        if name is None:
+            continue
+        feats[f'call:{name}'] += 1
+        for kw in node.keywords:
+            if kw.arg is not None:
+                feats[f'kw:{name}.{kw.arg}'] += 1
+    return feats
+
+def trial_features(trial_dir: Path, cache):
+    t = TrialInputs(trial_dir)
+    key = t.file_hash('code.py')
+    cached = cache.get('ast_features', FEATURES_VERSION, key) if cache else None
+    if cached is None:
+        cached = dict(call_features(t.source))
+        if cache:
+            cache.put('ast_features', FEATURES_VERSION, key, cached)
+    return Counter(cached)
+
+def rule_statuses(trial_dir: Path):
+    """rule -> worst pass/warn/fail status in lint.json (other statuses ignored)."""
+    try:
+        lint = json.loads((trial_dir/'lint.json').read_text())
+    except Exception:
+        return {}
+    out = {}
+    for item in lint:
+        s = item.get('status')
+        if s in SEVERITY:
+            r = item.get('rule', '')
+            out[r] = s if r not in out or SEVERITY[s] > SEVERITY[out[r]] else out[r]
+    return out
+
+def edits(a: Counter, b: Counter):
+    """'+feature' for call sites/keywords b has more of than a, '-feature' for fewer."""
+    return sorted([f'+{f}' for f in b if b[f] > a.get(f, 0)] + [f'-{f}' for f in a if a[f] > b.get(f, 0)])
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--runs', default='runs', help='Path to runs/ directory (task-first)')
+    ap.add_argument('--out', default='reports', help='Directory to write the CSVs')
+    ap.add_argument('--min-pairs', type=int, default=2, help='Leave out edits seen in fewer eligible pairs')
+    ap.add_argument('--no-cache', action='store_true', help='Re-parse every code.py')
+    args = ap.parse_args()
+
+    cells = {}
+    for t in walk(Path(args.runs), require='code.py'):
+        cells.setdefault((t.task, t.model, t.sample), {})[t.condition] = t.dir
+
+    cache = None if args.no_cache else LintCache(DEFAULT_CACHE)
+    pair_rows = []
+    # rule -> [(edits of the pair, fixed?)] over pairs where baseline violated the rule
+    eligible = {}
+    try:
+        for (task, model, sample), trials in sorted(cells.items()):
+            feats = {c: trial_features(d, cache) for c, d in trials.items()}
+            status = {c: rule_statuses(d) for c, d in trials.items()}
+            for ca, cb in PAIRS:
+                if ca not in trials or cb not in trials:
+                    continue
+                diff = edits(feats[ca], feats[cb])
+                fixed, regressed = [], []
+                for rule, sa in sorted(status[ca].items()):
+                    sb = status[cb].get(rule)
+                    if sb is None:
+                        continue
+                    if sa != 'pass':
+                        eligible.setdefault(rule, []).append((set(diff), sb == 'pass'))
+                        if sb == 'pass':
+                            fixed.append(rule)
+                    elif sb != 'pass':
+                        regressed.append(rule)
+                pair_rows.append([task, model, sample, ca, cb, len(diff),
+                                  ' '.join(e for e in diff if e[0] == '+'),
+                                  ' '.join(e for e in diff if e[0] == '-'),
+                                  ' '.join(fixed), ' '.join(regressed)])
+    finally:
+        if cache:
+            cache.close()
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    diffs_csv = out_dir/'ast_diffs.csv'
+    with diffs_csv.open('w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['task', 'model', 'sample', 'cond_a', 'cond_b', 'n_edits', 'added', 'removed',
+                    'fixed_rules', 'regressed_rules'])
+        w.writerows(pair_rows)
+
+    attr_csv = out_dir/'ast_fix_attribution.csv'
+    with attr_csv.open('w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['rule', 'edit', 'violated_pairs', 'fixes', 'pairs_with_edit', 'fixes_with_edit',
+                    'fix_rate_with_edit', 'fix_rate_without_edit', 'lift'])
+        for rule, pairs in sorted(eligible.items()):
+            n, fixes = len(pairs), sum(fx for _, fx in pairs)
+            if fixes == 0:
+                continue
+            with_edit = Counter(e for diff, _ in pairs for e in diff)
+            fixed_with = Counter(e for diff, fx in pairs if fx for e in diff)
+            rows = []
+            for e, k in with_edit.items():
+                if k < args.min_pairs or fixed_with[e] == 0:
+                    continue
+                rate_with = fixed_with[e] / k
+                rate_without = (fixes - fixed_with[e]) / (n - k) if n > k else ''
+                lift = round(rate_with / (fixes / n), 3)
+                rows.append([rule, e, n, fixes, k, fixed_with[e], round(rate_with, 3),
+                             round(rate_without, 3) if rate_without != '' else '', lift])
+            rows.sort(key=lambda r: (-r[5], -r[8], r[1]))
+            w.writerows(rows)
+
+    print(f'[ast_attribution] {len(pair_rows)} condition pairs in {len(cells)} cells')
+    print(f'[ast_attribution] Wrote {diffs_csv}')
+    print(f'[ast_attribution] Wrote {attr_csv}')
+
+if __name__ == '__main__':
+    main()
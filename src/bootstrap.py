@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# bootstrap.py — Percentile bootstrap intervals for many grouped rates at once.
+#
+# A rate is sum(successes) / sum(trials) over the units of a group: a lint result
+# is a unit with trials = 1, a task (cluster resampling) is a unit carrying the
+# totals of its results. Units are drawn with replacement inside blocks of fixed
+# size. A block is a group by default; blocks finer than the groups, e.g. (group,
+# model, condition), make the bootstrap stratified: a pooled rate keeps the share
+# each design cell has in it. Blocks must not straddle groups.
+#
+# Every batch of resamples is one (resamples, units) index matrix; the sums of
+# all groups in all of them come from np.bincount over resample * n_groups + group.
+# Each batch has its own seed, spawned from `seed`, so the draws are the same
+# whether the batches run here or on a process pool (jobs > 1).
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_RESAMPLES = 10_000
+BATCH_CELLS = 4_000_000   # index matrix entries per batch (~32 MB of indices)
+
+def _draw(successes, trials, group, start, size, n_groups, n, seed):
+    """Rates (n, n_groups, k) of n resamples."""
+    rng = np.random.default_rng(seed)
+    u = rng.random((n, len(size)))
+    u *= size
+    idx = start + u.astype(np.intp)   # uniform position within the unit's block
+    del u
+    keys = (np.arange(n)[:, None] * n_groups + group).ravel()
+    cells = n * n_groups
+    if trials.ndim == 2:   # trials per success column
+        totals = np.stack([np.bincount(keys, weights=trials[idx, j].ravel(), minlength=cells)
+                           for j in range(trials.shape[1])], axis=1)
+    elif (trials == 1).all():   # single results: every resample has the group's own count
+        totals = np.tile(np.bincount(group, minlength=n_groups).astype(np.float64), n)[:, None]
+    else:
+        totals = np.bincount(keys, weights=trials[idx].ravel(), minlength=cells)[:, None]
+    sums = [np.bincount(keys, weights=successes[idx, j].ravel(), minlength=cells)
+            for j in range(successes.shape[1])]
+    with np.errstate(invalid='ignore'):   # no trials drawn: NaN
+        return (np.stack(sums, axis=1) / totals).reshape(n, n_groups, -1)
+
+def bootstrap_rates(successes, trials, group, block=None, resamples=DEFAULT_RESAMPLES, seed=0, jobs=1):
+    """Bootstrap draws (resamples, groups, k) of the rates of k success columns per group.
+
+    successes: (units,) or (units, k); trials: (units,), or (units, k) when the columns count
+    different trials; group: codes 0..G-1 per unit;
+    block: codes of the resampling blocks (default: the groups)."""
+    successes = np.asarray(successes, dtype=np.float64)
+    if successes.ndim == 1:
+        successes = successes[:, None]
+    trials = np.asarray(trials, dtype=np.float64)
+    group = np.asarray(group, dtype=np.intp)
+    block = group if block is None else np.asarray(block)
+    n_groups = int(group.max()) + 1 if len(group) else 0
+    if not n_groups:
+        return np.empty((resamples, 0, successes.shape[1]))
+
+    # units of a block are contiguous; each position draws from its own block
+    order = np.argsort(block, kind='stable')
+    successes, trials, group, block = successes[order], trials[order], group[order], block[order]
+    _, first, inverse, counts = np.unique(block, return_index=True, return_inverse=True, return_counts=True)
+    start, size = first[inverse], counts[inverse]
+
+    per_batch = max(1, min(resamples, BATCH_CELLS // len(group)))
+    sizes = [min(per_batch, resamples - i) for i in range(0, resamples, per_batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    common = (successes, trials, group, start, size, n_groups)
+    if jobs > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_draw, *common, n, s) for n, s in zip(sizes, seeds)]
+            draws = [f.result() for f in futures]
+    else:
+        draws = [_draw(*common, n, s) for n, s in zip(sizes, seeds)]
+    return np.concatenate(draws)
+
+def percentile_interval(draws, confidence=0.95):
+    """(low, high) percentile bounds over the first axis of the draws, leaving out NaN draws
+    (resamples without trials for a rate); NaN where every draw is."""
+    alpha = (1 - confidence) / 2
+    if not np.isnan(draws).any():   # np.quantile is much faster than np.nanquantile
+        low, high = np.quantile(draws, [alpha, 1 - alpha], axis=0)
+        return low, high
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)   # all-NaN slices
+        low, high = np.nanquantile(draws, [alpha, 1 - alpha], axis=0)
+    return low, high
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# calibrate_contrast.py — Pick the contrast_text cut-off that best agrees with the raters.
+#
+# Usage:
+#   python calibrate_contrast.py [--lint-summary reports/lint_summary.csv] [--rule contrast_text]
+#                                [--gold FILE ...] [--item "Legibility" ...] [--out reports]
+#                                [--write-config [lint_config.json]]
+#
+# Scores: the `ratio` of --rule for every trial in lint_summary.csv, reduced to
+# the lowest ratio of each (task, model, condition) cell. Labels: the human
+# verdicts on the accessibility items of the rubric exports (joined as in
+# agreement.py); a "no" is a contrast problem.
+#
+# A chart is flagged when its ratio is below the threshold. Every candidate
+# threshold (midpoints between consecutive distinct ratios) is evaluated at once:
+# after sorting the ratios, the flagged count of a threshold is a searchsorted
+# index and its true positives a cumulative sum of the labels at that index.
+#
+# Outputs:
+#   reports/contrast_calibration.csv — one row per threshold: confusion matrix,
+#       TPR/FPR (ROC), precision/recall (PR), accuracy and Cohen's kappa
+#   reports/figs/contrast_calibration.png — ROC and PR curves, current and best threshold marked
+# The best threshold maximizes Cohen's kappa. --write-config stores it as the
+# rule's threshold_text in the linter config (lowering threshold_graphics to it
+# if needed); re-run linter.py afterwards.
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from agreement import KEY, load_gold, norm
+from linter import DEFAULT_CONFIG, RULES, load_config
+from rubric_keys import DEFAULT_GOLD, GOLD_FILES
+
+DEFAULT_ITEMS = ['Color contrast & colorblind safety', 'Legibility']
+
+def load_scores(path: Path, rule: str):
+    """(task, model, condition, ratio): the lowest ratio of the rule over each cell's trials."""
+    df = pd.read_csv(path, usecols=KEY + ['rule', 'ratio'])
+    df = df[(df['rule'] == rule) & df['ratio'].notna()]
+    return df.groupby(KEY, as_index=False)['ratio'].min()
+
+def sweep(ratio, problem):
+    """Confusion counts and agreement metrics for every threshold (flag ratio < threshold)."""
+    order = np.argsort(ratio, kind='stable')
+    s, y = ratio[order], problem[order].astype(np.int64)
+    u = np.unique(s)
+    cuts = np.concatenate([[u[0]], (u[:-1] + u[1:]) / 2, [u[-1] + 0.01]])
+    flagged = np.searchsorted(s, cuts, side='left')
+    cum = np.concatenate([[0], np.cumsum(y)])
+    n, pos = len(s), int(y.sum())
+    tp = cum[flagged]
+    fp = flagged - tp
+    fn = pos - tp
+    tn = n - pos - fp
+    with np.errstate(divide='ignore', invalid='ignore'):
+        po = (tp + tn) / n
+        pe = (flagged * pos + (n - flagged) * (n - pos)) / (n * n)
+        out = pd.DataFrame({
+            'threshold': np.round(cuts, 3),
+            'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+            'tpr': tp / pos if pos else np.nan,
+            'fpr': fp / (n - pos) if n > pos else np.nan,
+            'precision': np.where(flagged > 0, tp / np.maximum(flagged, 1), np.nan),
+            'recall': tp / pos if pos else np.nan,
+            'accuracy': po,
+            'cohen_kappa': np.where(pe < 1, (po - pe) / (1 - pe), np.nan),
+        })
+    return out.round({c: 4 for c in ('tpr', 'fpr', 'precision', 'recall', 'accuracy', 'cohen_kappa')})
+
+def at_threshold(curve, ratio, t: float):
+    """Row of the sweep that flags the same charts as threshold t."""
+    flagged = int((ratio < t).sum())
+    return curve[curve['tp'] + curve['fp'] == flagged].iloc[0]
+
+def plot(curve, marks, path: Path):
+    """ROC and PR curves with the (row, label, colour) points in `marks`."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    fig, (roc, pr) = plt.subplots(1, 2, figsize=(10, 4.5))
+    roc.plot(curve['fpr'], curve['tpr'], color='#1f77b4')
+    roc.plot([0, 1], [0, 1], color='#999999', linestyle='--', linewidth=1)
+    roc.set(title='ROC', xlabel='False positive rate', ylabel='True positive rate', xlim=(0, 1), ylim=(0, 1.02))
+    pr.plot(curve['recall'], curve['precision'], color='#1f77b4')
+    pr.set(title='Precision-recall', xlabel='Recall', ylabel='Precision', xlim=(0, 1), ylim=(0, 1.02))
+    for row, label, color in marks:
+        roc.scatter(row['fpr'], row['tpr'], color=color, zorder=3, label=label)
+        pr.scatter(row['recall'], row['precision'], color=color, zorder=3, label=label)
+    roc.legend(loc='lower right')
+    pr.legend(loc='lower left')
+    fig.tight_layout()
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+
+def write_config(path: Path, rule: str, threshold: float):
+    config = load_config(path)
+    params = dict(RULES[rule].defaults, **config.get(rule, {}))
+    params['threshold_text'] = threshold
+    params['threshold_graphics'] = min(params['threshold_graphics'], threshold)
+    config[rule] = params
+    path.write_text(json.dumps(config, indent=2) + '\n')
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--lint-summary', default='reports/lint_summary.csv')
+    ap.add_argument('--rule', default='contrast_text', choices=['contrast_text', 'contrast_text_exact'])
+    ap.add_argument('--gold', action='append', help=f'Human rubric CSV (repeatable; default: {", ".join(GOLD_FILES)})')
+    ap.add_argument('--item', action='append', help=f'Rubric item(s) about contrast (default: {", ".join(DEFAULT_ITEMS)})')
+    ap.add_argument('--out', default='reports', help='Directory to write contrast_calibration.csv (and figs/)')
+    ap.add_argument('--write-config', nargs='?', const=str(DEFAULT_CONFIG), metavar='FILE',
+                    help='Store the best threshold in the linter config (default file: lint_config.json)')
+    args = ap.parse_args()
+
+    scores = load_scores(Path(args.lint_summary), args.rule)
+    items = set(norm(pd.Series(args.item or DEFAULT_ITEMS)))
+    gold = pd.concat([load_gold(Path(p)) for p in args.gold or DEFAULT_GOLD if Path(p).exists()],
+                     ignore_index=True)
+    labels = gold[gold['item'].isin(items)].merge(scores, on=KEY)
+    if labels.empty or labels['problem'].nunique() < 2:
+        print(f'[calibrate] Need rated cells with and without contrast problems and a {args.rule} ratio; '
+              f'found {len(labels)}', file=sys.stderr)
+        sys.exit(1)
+
+    ratio = labels['ratio'].to_numpy(dtype=float)
+    curve = sweep(ratio, labels['problem'].to_numpy())
+    current_t = RULES[args.rule].params['threshold_text']
+    current = at_threshold(curve, ratio, current_t)
+    best = curve.iloc[int(np.nanargmax(curve['cohen_kappa'].to_numpy()))]
+    # the current threshold flags the same charts as the best one: keep it
+    best_t = current_t if best.name == current.name else float(best['threshold'])
+    tpr, fpr = curve['tpr'].to_numpy(), curve['fpr'].to_numpy()
+    auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+    out_dir = Path(args.out)
+    (out_dir/'figs').mkdir(parents=True, exist_ok=True)
+    out_csv = out_dir/'contrast_calibration.csv'
+    curve.to_csv(out_csv, index=False)
+    out_png = out_dir/'figs'/'contrast_calibration.png'
+    plot(curve, [(current, f'current {current_t:g}', '#d62728'),
+                 (best, f'best {best_t:g}', '#2ca02c')], out_png)
+
+    print(f"[calibrate] {args.rule}: {len(labels)} rated cells ({int(labels['problem'].sum())} with problems), "
+          f"ROC AUC {auc:.3f}")
+    for name, row, t in [('current', current, current_t), ('best', best, best_t)]:
+        print(f"[calibrate] {name:<7} threshold {t:g}: kappa {row['cohen_kappa']:.3f}, "
+              f"precision {row['precision']:.3f}, recall {row['recall']:.3f}, accuracy {row['accuracy']:.3f}")
+    print(f'[calibrate] Wrote {out_csv}')
+    print(f'[calibrate] Wrote {out_png}')
+    if args.write_config:
+        write_config(Path(args.write_config), args.rule, best_t)
+        print(f"[calibrate] Set {args.rule} threshold_text = {best_t:g} in {args.write_config}; "
+              f"re-run linter.py to apply it")
+
+if __name__ == '__main__':
+    main()
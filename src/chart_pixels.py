@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# chart_pixels.py — Pixel-level analysis of a rendered chart.png.
+#
+# Imported lazily by linter.py, only when an enabled rule needs pixels, so
+# code-only lint runs never pay for PIL/numpy.
+from pathlib import Path
+
+from PIL import Image
+import numpy as np
+
+def load_rgb(img_path: Path):
+    """Decode a PNG into a uint8 (h, w, 3) array."""
+    with Image.open(img_path) as im:
+        return np.asarray(im.convert('RGB'))
+
+def open_image(img_path: Path):
+    """Open and decode a PNG, keeping only PIL's packed pixel buffer in memory."""
+    im = Image.open(img_path)
+    im.load()
+    return im
+
+class Planes:
+    """A decoded chart held as arrays: uint8 RGB (h, w, 3) and, optionally, the
+    fixed-point luminance keys (h, w) of luminance_keys(). pixel_cache.py hands
+    these out as read-only memory maps of its .npy files; every function below
+    that takes a decoded PIL image accepts a Planes as well."""
+
+    def __init__(self, rgb, lum=None):
+        self.rgb = rgb
+        self.lum = lum
+
+    @property
+    def height(self):
+        return self.rgb.shape[0]
+
+    @property
+    def width(self):
+        return self.rgb.shape[1]
+
+    def close(self):
+        self.rgb = self.lum = None
+
+# Image rules walk the picture in horizontal bands of about TILE_PIXELS pixels,
+# so their working set does not grow with the image size.
+TILE_PIXELS = 1 << 20
+
+def iter_rows(im, tile_pixels=TILE_PIXELS):
+    """Yield (y0, y1) row bands of about tile_pixels pixels."""
+    rows = max(1, tile_pixels // max(1, im.width))
+    for y0 in range(0, im.height, rows):
+        yield y0, min(im.height, y0 + rows)
+
+def iter_rgb_tiles(im, tile_pixels=TILE_PIXELS):
+    """Yield (y0, uint8 RGB array) row bands covering a decoded image (PIL or Planes)."""
+    for y0, y1 in iter_rows(im, tile_pixels):
+        if isinstance(im, Planes):
+            yield y0, im.rgb[y0:y1]
+        else:
+            yield y0, np.asarray(im.crop((0, y0, im.width, y1)).convert('RGB'))
+
+def iter_lum_tiles(im, tile_pixels=TILE_PIXELS):
+    """Yield (y0, luminance keys) row bands; read straight from the plane when a Planes carries one."""
+    if isinstance(im, Planes) and im.lum is not None:
+        for y0, y1 in iter_rows(im, tile_pixels):
+            yield y0, im.lum[y0:y1]
+    else:
+        for y0, tile in iter_rgb_tiles(im, tile_pixels):
+            yield y0, luminance_keys(tile)
+
+# Fixed-point luminance: each sRGB channel value maps through a 256-entry table
+# to its weighted linear contribution scaled by LUM_SCALE, so a pixel's relative
+# luminance is the integer sum of three lookups (max error ~1.5e-6 vs. float).
+LUM_SCALE = (1 << 20) - 1
+
+def _srgb_lum_luts():
+    c = np.arange(256, dtype=np.float64) / 255.0
+    lin = np.where(c <= 0.04045, c/12.92, ((c+0.055)/1.055)**2.4)
+    weights = np.array([0.2126, 0.7152, 0.0722])[:, None]
+    return np.rint(weights * lin * LUM_SCALE).astype(np.uint32)
+
+LUM_LUTS = _srgb_lum_luts()
+
+def luminance_keys(rgb):
+    """Fixed-point relative luminance (uint32, 0..LUM_SCALE) of a uint8 RGB array."""
+    keys = np.take(LUM_LUTS[0], rgb[..., 0])
+    keys += np.take(LUM_LUTS[1], rgb[..., 1])
+    keys += np.take(LUM_LUTS[2], rgb[..., 2])
+    return keys
+
+def border_width(h: int, w: int):
+    return 10 if min(h, w) >= 40 else max(1, min(h, w) // 8)
+
+def border_hist(keys, b: int):
+    """Luminance histogram of the four border strips (corners counted twice, as before)."""
+    strips = [keys[:b, :], keys[-b:, :], keys[:, :b], keys[:, -b:]]
+    return np.bincount(np.concatenate([s.ravel() for s in strips]))
+
+def border_strips(keys, y0: int, h: int, b: int):
+    """The parts of a row band (starting at row y0 of an h-row image) that fall in the border."""
+    n = keys.shape[0]
+    top = keys[:max(0, min(n, b - y0))]
+    bottom = keys[max(0, h - b - y0):]
+    return [top, bottom, keys[:, :b], keys[:, -b:]]
+
+def add_hist(acc, keys):
+    """Accumulate the histogram of `keys` into the fixed-size `acc` in place."""
+    h = np.bincount(keys.ravel())
+    acc[:h.size] += h
+
+def hist_quantile(hist, q: float):
+    """np.quantile(..., q) (linear interpolation) of the values a histogram counts."""
+    cum = np.cumsum(hist)
+    pos = q * (int(cum[-1]) - 1)
+    lo = int(np.floor(pos))
+    k_lo = int(np.searchsorted(cum, lo, side='right'))
+    k_hi = int(np.searchsorted(cum, lo + 1, side='right')) if pos > lo else k_lo
+    value = k_lo + (pos - lo) * (k_hi - k_lo)
+    return value / LUM_SCALE
+
+def contrast_from_hists(hist, bhist):
+    # border median as background proxy, darkest 5% of pixels as "ink"
+    L_bg = hist_quantile(bhist, 0.5)
+    L_fg = hist_quantile(hist, 0.05)
+    lighter = max(L_bg, L_fg)
+    darker = min(L_bg, L_fg)
+    return (lighter + 0.05) / (darker + 0.05)
+
+def contrast_ratio(img_path: Path, im=None):
+    """Approximate WCAG-like contrast between background and darkest marks.
+
+    `im` may carry the already-decoded image of `img_path` (PIL or Planes). Works
+    band by band with the lookup-table/histogram path (identical to
+    contrast_ratio_rgb() on the full array); contrast_ratio_float() is the reference.
+    """
+    own = im is None
+    if own:
+        im = open_image(img_path)
+    try:
+        h, w = im.height, im.width
+        if h == 0 or w == 0:
+            raise ValueError("empty image")
+        b = border_width(h, w)
+        # keys never exceed LUM_SCALE + 1 (three rounded table entries)
+        hist = np.zeros(LUM_SCALE + 2, dtype=np.int64)
+        bhist = np.zeros(LUM_SCALE + 2, dtype=np.int64)
+        for y0, keys in iter_lum_tiles(im):
+            add_hist(hist, keys)
+            add_hist(bhist, np.concatenate([s.ravel() for s in border_strips(keys, y0, h, b)]))
+        return contrast_from_hists(hist, bhist)
+    finally:
+        if own:
+            im.close()
+
+def contrast_ratio_rgb(rgb):
+    """contrast_ratio() on a fully decoded uint8 RGB array."""
+    h, w = rgb.shape[:2]
+    if h == 0 or w == 0:
+        raise ValueError("empty image")
+    keys = luminance_keys(rgb)
+    hist = np.bincount(keys.ravel())
+    return contrast_from_hists(hist, border_hist(keys, border_width(h, w)))
+
+def contrast_ratio_float(rgb):
+    """Reference float32 implementation of contrast_ratio() (full-size temporaries, sort-based quantiles)."""
+    arr = rgb.astype(np.float32) / 255.0
+
+    def to_linear(c):
+        return np.where(c <= 0.04045, c/12.92, ((c+0.055)/1.055)**2.4)
+
+    lin = to_linear(arr)
+    L = 0.2126 * lin[..., 0] + 0.7152 * lin[..., 1] + 0.0722 * lin[..., 2]
+    h, w = L.shape
+    if h == 0 or w == 0:
+        raise ValueError("empty image")
+
+    # border as background proxy
+    b = border_width(h, w)
+    border = np.concatenate([
+        L[:b, :].ravel(),
+        L[-b:, :].ravel(),
+        L[:, :b].ravel(),
+        L[:, -b:].ravel(),
+    ])
+    L_bg = float(np.median(border))
+
+    # darkest 5% of pixels as "ink"
+    L_fg = float(np.quantile(L, 0.05))
+
+    lighter = max(L_bg, L_fg)
+    darker = min(L_bg, L_fg)
+    ratio = (lighter + 0.05) / (darker + 0.05)
+    return ratio
+
+# --- perceptual hash -------------------------------------------------------
+# pHash: DCT of a 32x32 grey thumbnail; the 8x8 lowest frequencies are compared
+# to their median (DC excluded) to give 64 bits that survive re-encoding,
+# metadata changes and anti-aliasing differences.
+PHASH_SIZE = 32
+
+def _dct_matrix(n: int):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+DCT_MATRIX = _dct_matrix(PHASH_SIZE)
+
+def phash(im):
+    """64-bit perceptual hash of a decoded image (PIL or Planes), as an int."""
+    if isinstance(im, Planes):
+        im = Image.fromarray(np.asarray(im.rgb))
+    thumb = im.convert('L').resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.BOX)
+    freq = DCT_MATRIX @ np.asarray(thumb, dtype=np.float64) @ DCT_MATRIX.T
+    low = freq[:8, :8].ravel()
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+# --- palette and colour-vision deficiency ----------------------------------
+# The mark palette comes from a quantized 3-D colour histogram (4 bits per
+# channel -> 4096 bins, one bincount per band over every PALETTE_STRIDE-th row
+# and column) with the mean colour of each bin. Greys (background, text, axes,
+# gridlines) are dropped by a chroma threshold, anti-aliasing fringes by a
+# minimum pixel share, and alpha tints of an already picked colour over the
+# background are folded into that colour.
+COLOR_BITS = 4
+PALETTE_STRIDE = 2
+PALETTE_MIN_SHARE = 0.001   # of all pixels
+PALETTE_TINT_RESIDUAL = 12.0  # sRGB units off the colour->background blend line
+PALETTE_MIN_CHROMA = 15.0   # CIE Lab C*
+PALETTE_MERGE_DE = 8.0      # bins closer than this are one colour split by quantization
+PALETTE_MAX_COLORS = 12
+
+# Machado, Oliveira & Fernandes (2009), severity 1.0, applied to linear RGB.
+CVD_MATRICES = {
+    'protanopia': [[0.152286, 1.052583, -0.204868],
+                   [0.114503, 0.786281, 0.099216],
+                   [-0.003882, -0.048116, 1.051998]],
+    'deuteranopia': [[0.367322, 0.860646, -0.227968],
+                     [0.280085, 0.672501, 0.047413],
+                     [-0.011820, 0.042940, 0.968881]],
+    'tritanopia': [[1.255528, -0.076749, -0.178779],
+                   [-0.078411, 0.930809, 0.147602],
+                   [0.004733, 0.691367, 0.303900]],
+}
+# linear sRGB -> XYZ (D65), and the D65 white point
+RGB_TO_XYZ = np.array([[0.4124, 0.3576, 0.1805],
+                       [0.2126, 0.7152, 0.0722],
+                       [0.0193, 0.1192, 0.9505]])
+WHITE_D65 = np.array([0.95047, 1.0, 1.08883])
+
+def srgb_to_linear(c):
+    return np.where(c <= 0.04045, c/12.92, ((c+0.055)/1.055)**2.4)
+
+def linear_to_lab(lin):
+    """CIE Lab of (..., 3) linear RGB values in [0, 1]."""
+    xyz = np.clip(lin, 0.0, 1.0) @ RGB_TO_XYZ.T / WHITE_D65
+    f = np.where(xyz > (6/29)**3, np.cbrt(xyz), xyz / (3 * (6/29)**2) + 4/29)
+    return np.stack([116*f[..., 1] - 16, 500*(f[..., 0] - f[..., 1]), 200*(f[..., 1] - f[..., 2])], axis=-1)
+
+def color_hist(im, stride=PALETTE_STRIDE):
+    """(counts, mean colour) per quantized RGB bin, accumulated band by band."""
+    nbins = 1 << (3 * COLOR_BITS)
+    shift = 8 - COLOR_BITS
+    counts = np.zeros(nbins, dtype=np.int64)
+    sums = np.zeros((3, nbins))
+    for y0, tile in iter_rgb_tiles(im):
+        # keep the global row parity so banding does not change the sample
+        sample = tile[(-y0) % stride::stride, ::stride]
+        r, g, b = (sample[..., ch].ravel() for ch in range(3))
+        idx = (((r >> shift).astype(np.uint16) << (2 * COLOR_BITS))
+               | ((g >> shift).astype(np.uint16) << COLOR_BITS)
+               | (b >> shift))
+        counts += np.bincount(idx, minlength=nbins)
+        for ch, v in enumerate((r, g, b)):
+            sums[ch] += np.bincount(idx, weights=v, minlength=nbins)
+    seen = counts > 0
+    means = np.zeros((nbins, 3))
+    means[seen] = (sums[:, seen] / counts[seen]).T
+    return counts, means
+
+def dominant_palette(im):
+    """Mark colours of a chart as a (k, 3) float array of sRGB values in [0, 255]."""
+    counts, means = color_hist(im)
+    total = counts.sum()
+    if total == 0:
+        return np.zeros((0, 3))
+    background = means[counts.argmax()]
+    cand = np.flatnonzero(counts >= PALETTE_MIN_SHARE * total)
+    lab = linear_to_lab(srgb_to_linear(means[cand] / 255.0))
+    chroma = np.hypot(lab[:, 1], lab[:, 2])
+    keep = chroma >= PALETTE_MIN_CHROMA
+    cand, lab = cand[keep], lab[keep]
+    order = np.argsort(-counts[cand], kind='stable')
+    picked = []
+    for i in order:
+        if any(np.linalg.norm(lab[i] - lab[j]) < PALETTE_MERGE_DE for j in picked):
+            continue
+        x = means[cand[i]]
+        if any(is_tint(x, means[cand[j]], background) or is_tint(means[cand[j]], x, background)
+               for j in picked):
+            continue
+        picked.append(i)
+        if len(picked) == PALETTE_MAX_COLORS:
+            break
+    return means[cand[picked]]
+
+def is_tint(x, c, bg):
+    """True if colour x is c alpha-blended over the background bg (in sRGB, as matplotlib blends)."""
+    axis = c - bg
+    norm2 = float(axis @ axis)
+    if norm2 == 0.0:
+        return False
+    alpha = float((x - bg) @ axis) / norm2
+    if not 0.0 < alpha < 1.0:
+        return False
+    return float(np.linalg.norm(bg + alpha * axis - x)) < PALETTE_TINT_RESIDUAL
+
+def cvd_min_delta_e(palette):
+    """Minimum pairwise CIE76 ΔE of a palette under normal vision and each simulated deficiency.
+
+    Returns {view: (min ΔE, index i, index j)}; all views are simulated with one matrix multiply.
+    """
+    lin = srgb_to_linear(np.asarray(palette, dtype=np.float64) / 255.0)
+    mats = np.stack([np.eye(3)] + [np.array(m) for m in CVD_MATRICES.values()])
+    views = ['normal'] + list(CVD_MATRICES)
+    lab = linear_to_lab(np.einsum('vij,kj->vki', mats, lin))
+    d = np.linalg.norm(lab[:, :, None, :] - lab[:, None, :, :], axis=-1)
+    iu = np.triu_indices(len(palette), k=1)
+    pair = d[:, iu[0], iu[1]]
+    best = pair.argmin(axis=1)
+    return {v: (float(pair[n, best[n]]), int(iu[0][best[n]]), int(iu[1][best[n]]))
+            for n, v in enumerate(views)}
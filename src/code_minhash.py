@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# code_minhash.py — Near-duplicate generated code: MinHash signatures + LSH banding.
+#
+# Usage:
+#   python code_minhash.py similar-code [--runs runs] [--out reports] [--threshold 0.8] [--no-cache]
+#
+# Every runs/<task>/<model>/<condition>/<sample>/code.py is tokenized (stdlib
+# `tokenize`; comments and blank lines dropped, identifiers normalized; imported
+# names, attribute and keyword-argument names kept since they name the library and
+# plotting API) into a MinHash signature of its 5-token shingles, plus `exec_key`,
+# a hash of the token stream with identifiers renamed by first use, so two
+# scripts that differ only in variable names get the same key. Both are kept in
+# the linter's cache (.cache/lint.sqlite) as the `code_minhash` pseudo-rule, keyed
+# by the SHA-256 of code.py, so unchanged scripts are not tokenized again; they
+# are not lint verdicts and stay out of lint.json.
+#
+# `similar-code` splits every signature into LSH bands. Scripts sharing a band
+# bucket are compared to the bucket's first member only, so the work grows about
+# linearly with the number of scripts. Pairs whose estimated Jaccard similarity
+# reaches --threshold are joined into clusters, written to:
+#   reports/similar_code.csv — cluster, trial, estimated Jaccard to the cluster's
+#       first member, and `redundant_with`: an earlier trial with the same exec_key
+#       and the same data.csv (the same code up to variable names, on the same data).
+import argparse
+import base64
+import builtins
+import csv
+import hashlib
+import io
+import keyword
+import sys
+import tokenize
+from pathlib import Path
+
+import numpy as np
+
+SHINGLE_K = 5
+NUM_PERM = 128
+BANDS, ROWS = 32, 4            # BANDS * ROWS == NUM_PERM; candidate threshold ~ (1/BANDS)**(1/ROWS) = 0.42
+PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20250901)   # fixed: signatures must be comparable across runs
+PERM_A = _rng.integers(1, PRIME, NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.integers(0, PRIME, NUM_PERM, dtype=np.uint64)
+KEEP_NAMES = set(keyword.kwlist) | set(dir(builtins))
+SKIP_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+SIGNATURE_VERSION = 2   # of the cached code_minhash entries; bump when the tokens or hashing change
+
+def code_tokens(source: str):
+    """[(token type, text)] of the code, without comments/blank lines; None if it does not tokenize."""
+    try:
+        return [(t.type, t.string) for t in tokenize.generate_tokens(io.StringIO(source).readline)
+                if t.type not in SKIP_TOKENS]
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return None
+
+def imported_names(tokens):
+    """Every name in the import statements: the modules and the names they bind."""
+    names, in_import, start = set(), False, True
+    for typ, s in tokens:
+        if typ == tokenize.NEWLINE or (typ == tokenize.OP and s == ';'):
+            in_import, start = False, True
+            continue
+        if typ in (tokenize.INDENT, tokenize.DEDENT):
+            continue
+        if start and typ == tokenize.NAME and s in ('import', 'from'):
+            in_import = True
+        elif in_import and typ == tokenize.NAME:
+            names.add(s)
+        start = False
+    return names
+
+def normalize(tokens, rename=False):
+    """Token texts with local identifiers replaced by 'ID' (or 'ID<n>' by first use, with rename).
+    Imported names (pd, np, plt, ...) are kept: they say which library the code calls."""
+    out, names, depth = [], {}, 0
+    keep = KEEP_NAMES | imported_names(tokens)
+    for i, (typ, s) in enumerate(tokens):
+        if typ == tokenize.OP:
+            depth += s in '([{'
+            depth -= s in ')]}'
+        if typ == tokenize.INDENT:
+            s = 'INDENT'   # the same block whether indented by 2 or 4 spaces
+        elif typ == tokenize.NAME and s not in keep:
+            after_dot = i > 0 and tokens[i - 1][1] == '.'
+            kwarg = depth > 0 and i + 1 < len(tokens) and tokens[i + 1][1] == '='
+            if not (after_dot or kwarg):
+                s = names.setdefault(s, f'ID{len(names)}') if rename else 'ID'
+        out.append(s)
+    return out
+
+def shingle_hashes(words, k=SHINGLE_K):
+    """Distinct 31-bit hashes of the k-token shingles."""
+    if len(words) < k:
+        words = words + [''] * (k - len(words))
+    seen = {int.from_bytes(hashlib.blake2b('\x1f'.join(words[i:i + k]).encode(), digest_size=4).digest(),
+                           'little') % PRIME
+            for i in range(len(words) - k + 1)}
+    return np.fromiter(seen, dtype=np.uint64, count=len(seen))
+
+def minhash(hashes):
+    """NUM_PERM-entry MinHash signature (uint32) of a set of shingle hashes."""
+    return ((PERM_A[:, None] * hashes[None, :] + PERM_B[:, None]) % PRIME).min(axis=1).astype(np.uint32)
+
+def encode(sig):
+    return base64.b64encode(sig.astype('<u4').tobytes()).decode('ascii')
+
+def decode(text: str):
+    return np.frombuffer(base64.b64decode(text), dtype='<u4')
+
+def code_signature(source: str):
+    """(base64 MinHash signature, exec_key) of a script, or None if it does not tokenize."""
+    tokens = code_tokens(source)
+    if tokens is None:
+        return None
+    sig = minhash(shingle_hashes(normalize(tokens)))
+    exec_key = hashlib.sha256('\x1f'.join(normalize(tokens, rename=True)).encode()).hexdigest()
+    return encode(sig), exec_key
+
+def trial_signature(trial_dir: Path, cache=None):
+    """(base64 MinHash signature, exec_key) of a trial's code.py (None if it does not tokenize),
+    cached in the lint cache by the SHA-256 of the file."""
+    from runner import sha256
+    code = trial_dir/'code.py'
+    key = sha256(code)
+    cached = cache.get('code_minhash', SIGNATURE_VERSION, key) if cache else None
+    if cached is None:
+        sig = code_signature(code.read_text(encoding='utf-8', errors='replace'))
+        cached = list(sig) if sig else []
+        if cache:
+            cache.put('code_minhash', SIGNATURE_VERSION, key, cached)
+    return tuple(cached) or None
+
+def lsh_clusters(sigs, threshold: float):
+    """Union-find clusters of rows of `sigs` (n x NUM_PERM) whose estimated Jaccard >= threshold.
+
+    Returns (groups as lists of row indices, estimated Jaccard of each row to its group's first row).
+    """
+    n = len(sigs)
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    bands = np.ascontiguousarray(sigs).reshape(n, BANDS, ROWS)
+    for b in range(BANDS):
+        buckets = {}
+        for i, key in enumerate(map(bytes, bands[:, b])):
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            rep = members[0]
+            est = (sigs[members[1:]] == sigs[rep]).mean(axis=1)
+            for i, j in zip(members[1:], est):
+                if j >= threshold:
+                    parent[find(i)] = find(rep)
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    clusters = sorted((sorted(g) for g in groups.values() if len(g) > 1), key=lambda g: (-len(g), g[0]))
+    est = np.zeros(n)
+    for g in clusters:
+        est[g] = (sigs[g] == sigs[g[0]]).mean(axis=1)
+    return clusters, est
+
+def similar_code(args):
+    from crawl import walk
+    from lint_cache import DEFAULT_CACHE, LintCache
+    from runner import sha256
+    runs_dir = Path(args.runs)
+    cache = None if args.no_cache else LintCache(DEFAULT_CACHE)
+    rows = []
+    try:
+        for trial in walk(runs_dir, require='code.py'):
+            sig = trial_signature(trial.dir, cache)
+            if sig:
+                rows.append({'trial_id': trial.trial_id, 'task': trial.task, 'model': trial.model,
+                             'condition': trial.condition, 'sample': trial.sample,
+                             'value': sig[0], 'detail': sig[1]})
+    finally:
+        if cache:
+            cache.close()
+    if not rows:
+        print(f"[minhash] No tokenizable code.py under {runs_dir}", file=sys.stderr)
+        sys.exit(1)
+    rows.sort(key=lambda r: r['trial_id'])
+    sigs = np.stack([decode(r['value']) for r in rows])
+    clusters, est = lsh_clusters(sigs, args.threshold)
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_csv = out_dir/'similar_code.csv'
+    n_redundant = 0
+    with out_csv.open('w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['cluster', 'size', 'trial_id', 'task', 'model', 'condition', 'sample', 'est_jaccard',
+                    'exec_key', 'redundant_with'])
+        for c, g in enumerate(clusters, start=1):
+            first_run = {}   # (exec_key, data.csv hash) -> first trial_id
+            for i in g:
+                r = rows[i]
+                data_hash = sha256(runs_dir/r['task']/r['model']/r['condition']/r['sample']/'data.csv')
+                key = (r['detail'], data_hash)
+                same = first_run.setdefault(key, r['trial_id']) if data_hash else r['trial_id']
+                redundant = same if same != r['trial_id'] else ''
+                n_redundant += bool(redundant)
+                w.writerow([c, len(g), r['trial_id'], r['task'], r['model'], r['condition'], r['sample'],
+                            round(float(est[i]), 3), r['detail'], redundant])
+    print(f'[minhash] {len(rows)} scripts, {len(clusters)} clusters at J >= {args.threshold}, '
+          f'{n_redundant} redundant executions')
+    print(f'[minhash] Wrote {out_csv}')
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    s = sub.add_parser('similar-code', help='Cluster near-duplicate code.py files')
+    s.add_argument('--runs', default='runs', help='Path to runs/ directory (task-first)')
+    s.add_argument('--out', default='reports')
+    s.add_argument('--threshold', type=float, default=0.8, help='Estimated Jaccard similarity to cluster at')
+    s.add_argument('--no-cache', action='store_true', help='Re-tokenize every code.py')
+    args = ap.parse_args()
+    similar_code(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# columnar.py — runs and lint_summary as Parquet / Arrow IPC datasets, partitioned by task and model.
+#
+# Written by `aggregate.py --format parquet|feather` next to the CSVs:
+#   reports/runs.parquet/task=<task>/model=<model>/part-0.parquet
+#   reports/lint_summary.parquet/task=<task>/model=<model>/part-0.parquet
+# (`.arrow` directories with --format feather). Columns are typed (ratio is a
+# float, returncode an int, ...) and the repeated strings (condition, sample,
+# rule, status) are dictionary-encoded, so they load as categoricals.
+# Rows are converted BATCH_ROWS at a time from the same row stream the CSVs
+# are written from (see aggregate.write_reports).
+#
+# Reading only some columns and partitions:
+#   import pyarrow.dataset as ds
+#   lint = ds.dataset('reports/lint_summary.parquet', partitioning='hive')
+#   lint.to_table(columns=['rule', 'status', 'ratio'], filter=ds.field('model') == 'grok').to_pandas()
+# The Feather files are uncompressed Arrow IPC, so they can be memory-mapped
+# without copying: pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all().
+#
+# pyarrow is optional: without it (or, for parquet, without its Parquet module)
+# aggregate.py falls back to feather, then to the CSVs alone.
+import shutil
+from pathlib import Path
+
+FORMATS = ('csv', 'parquet', 'feather')
+EXTENSIONS = {'parquet': 'parquet', 'feather': 'arrow'}
+PARTITIONS = ['task', 'model']
+BATCH_ROWS = 65_536   # rows per record batch, so the rows are never all in memory as Arrow arrays
+
+# column -> type name; 'dict' = dictionary-encoded string
+RUN_COLUMNS = {
+    'trial_id': 'string', 'task': 'string', 'model': 'string', 'condition': 'dict', 'sample': 'dict',
+    'timestamp': 'string', 'duration_sec': 'float64', 'returncode': 'int64', 'code_sha256': 'string',
+    'image_exists': 'bool', 'image_sha256': 'string', 'image_w': 'int64', 'image_h': 'int64',
+}
+LINT_COLUMNS = {
+    'trial_id': 'string', 'task': 'string', 'model': 'string', 'condition': 'dict', 'sample': 'dict',
+    'rule': 'dict', 'status': 'dict', 'value': 'string', 'detail': 'string', 'ratio': 'float64',
+}
+
+def resolve_format(fmt: str):
+    """(format actually available, note): parquet falls back to feather, feather to csv."""
+    if fmt == 'csv':
+        return 'csv', None
+    try:
+        import pyarrow.dataset  # noqa: F401
+    except ImportError:
+        return 'csv', f'pyarrow is not installed; writing CSV only (pip install pyarrow for --format {fmt})'
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            return 'feather', 'this pyarrow has no Parquet support; writing Arrow IPC (feather) instead'
+    return fmt, None
+
+def output_dirs(out_dir: Path, fmt: str):
+    return [out_dir/f'{name}.{EXTENSIONS[fmt]}' for name in ('runs', 'lint_summary')]
+
+def _clean(value: str, kind):
+    """A CSV cell as a value of the column's type ('' is null)."""
+    if value == '':
+        return None
+    if kind in ('string', 'dict'):
+        return value
+    if kind == 'float64':
+        return float(value)
+    if kind == 'int64':
+        return int(value)
+    return value == 'True'
+
+def _schema(columns):
+    import pyarrow as pa
+    special = {'dict': pa.dictionary(pa.int32(), pa.string()), 'bool': pa.bool_()}
+    return pa.schema([(name, special.get(kind) or getattr(pa, kind)()) for name, kind in columns.items()])
+
+def _batches(rows, columns, schema):
+    """Record batches of `rows` (cell lists in column order, iterated twice). Every batch of a
+    dictionary column shares one dictionary, the sorted distinct values over all rows, as
+    Arrow IPC files require."""
+    import pyarrow as pa
+    kinds = list(columns.values())
+    coded = [i for i, kind in enumerate(kinds) if kind == 'dict']
+    values = {i: set() for i in coded}
+    for r in rows:
+        for i in coded:
+            values[i].add(r[i])
+    dictionaries = {i: pa.array(sorted(values[i] - {''}), type=pa.string()) for i in coded}
+    codes = {i: {v: n for n, v in enumerate(dictionaries[i].to_pylist())} for i in coded}
+
+    def batch(chunk):
+        arrays = []
+        for i, kind in enumerate(kinds):
+            if kind == 'dict':
+                indices = pa.array([codes[i].get(r[i]) for r in chunk], type=pa.int32())
+                arrays.append(pa.DictionaryArray.from_arrays(indices, dictionaries[i]))
+            else:
+                arrays.append(pa.array([_clean(r[i], kind) for r in chunk], type=schema.field(i).type))
+        return pa.record_batch(arrays, schema=schema)
+
+    chunk = []
+    for r in rows:
+        chunk.append(r)
+        if len(chunk) >= BATCH_ROWS:
+            yield batch(chunk)
+            chunk = []
+    if chunk:
+        yield batch(chunk)
+
+def _write(rows, columns, path: Path, fmt: str):
+    """Replace the dataset at `path` (written to a sibling folder first, so readers never see half of it)."""
+    import pyarrow.dataset as ds
+    tmp = path.with_name(path.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    schema = _schema(columns)
+    ds.write_dataset(_batches(rows, columns, schema), tmp, schema=schema,
+                     format='parquet' if fmt == 'parquet' else 'ipc',
+                     partitioning=PARTITIONS, partitioning_flavor='hive',
+                     basename_template=f'part-{{i}}.{EXTENSIONS[fmt]}')
+    tmp.mkdir(exist_ok=True)   # no rows: an empty dataset
+    shutil.rmtree(path, ignore_errors=True)
+    tmp.rename(path)
+
+def write_columnar(out_dir: Path, run_rows, lint_rows, fmt: str):
+    """Write the runs and lint_summary datasets in `fmt` ('parquet' or 'feather') from their CSV rows
+    (re-iterable lists of cells in RUN_COLUMNS / LINT_COLUMNS order); returns their paths."""
+    runs_path, lint_path = output_dirs(out_dir, fmt)
+    _write(run_rows, RUN_COLUMNS, runs_path, fmt)
+    _write(lint_rows, LINT_COLUMNS, lint_path, fmt)
+    return [runs_path, lint_path]
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# condition_diff.py — What do `standards` and `selfcheck` change in the chart vs `baseline`?
+#
+# Usage:
+#   python condition_diff.py [--runs runs] [--out reports] [--jobs N] [--tol 16]
+#                            [--heatmaps reports/condition_diffs] [--no-pixel-cache]
+#
+# For every runs/<task>/<model>/*/<sample>/ cell with more than one condition,
+# the condition charts are compared pairwise (baseline→standards,
+# baseline→selfcheck, standards→selfcheck) after padding both to a common size
+# with white (top-left aligned, as matplotlib lays out a grown figure):
+#   diff_ratio — share of pixels where some channel moved by more than --tol
+#   ssim       — mean SSIM of the greyscale images (7x7 uniform window, after the
+#                F x F block averaging of Wang et al.'s reference code, F = min(h, w)/256)
+#   regions    — bounding boxes of the changed areas (8 px blocks, connected),
+#                largest first, as x0:y0:x1:y1
+# All of it is whole-array numpy/scipy work; cells run in a process pool.
+#
+# Output:
+#   reports/condition_diffs.csv
+#   --heatmaps DIR: one PNG per pair, the per-pixel change (max channel) in red over grey
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy import ndimage
+
+from crawl import walk
+
+CONDITIONS = ('baseline', 'standards', 'selfcheck')
+PAIRS = [('baseline', 'standards'), ('baseline', 'selfcheck'), ('standards', 'selfcheck')]
+SSIM_WINDOW = 7
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+SSIM_SCALE = 256   # images are averaged down until their short side is about this
+REGION_BLOCK = 8
+MAX_REGIONS = 5
+
+def pad_to(rgb, h: int, w: int):
+    """Pad an (h0, w0, 3) uint8 array to (h, w, 3) with white on the right and bottom."""
+    if rgb.shape[:2] == (h, w):
+        return rgb
+    out = np.full((h, w, 3), 255, dtype=np.uint8)
+    out[:rgb.shape[0], :rgb.shape[1]] = rgb
+    return out
+
+def grey(rgb):
+    """ITU-R 601 luma as float32, as PIL's convert('L')."""
+    return rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+def downsample(g, f: int):
+    """Mean over f x f blocks (trailing rows/columns that do not fill a block are dropped)."""
+    if f <= 1:
+        return g
+    h, w = g.shape[0] // f * f, g.shape[1] // f * f
+    return g[:h, :w].reshape(h // f, f, w // f, f).mean(axis=(1, 3))
+
+def ssim(a, b):
+    """Mean SSIM of two float32 greyscale images (uniform window, Wang et al. 2004 constants)."""
+    k = max(1, round(min(a.shape) / SSIM_SCALE))
+    a, b = downsample(a, k), downsample(b, k)
+    f = lambda x: ndimage.uniform_filter(x, size=SSIM_WINDOW, mode='reflect')
+    mu_a, mu_b = f(a), f(b)
+    var_a = f(a * a) - mu_a * mu_a
+    var_b = f(b * b) - mu_b * mu_b
+    cov = f(a * b) - mu_a * mu_b
+    s = ((2 * mu_a * mu_b + SSIM_C1) * (2 * cov + SSIM_C2)) / \
+        ((mu_a * mu_a + mu_b * mu_b + SSIM_C1) * (var_a + var_b + SSIM_C2))
+    return float(s.mean())
+
+def changed_regions(mask):
+    """Bounding boxes (x0, y0, x1, y1) of connected changed areas, largest first."""
+    h, w = mask.shape
+    bh, bw = -(-h // REGION_BLOCK), -(-w // REGION_BLOCK)
+    padded = np.zeros((bh * REGION_BLOCK, bw * REGION_BLOCK), dtype=bool)
+    padded[:h, :w] = mask
+    blocks = padded.reshape(bh, REGION_BLOCK, bw, REGION_BLOCK).any(axis=(1, 3))
+    labels, n = ndimage.label(blocks, structure=np.ones((3, 3)))
+    if n == 0:
+        return []
+    sizes = np.bincount(labels.ravel())[1:]
+    objects = ndimage.find_objects(labels)
+    boxes = []
+    for i in np.argsort(-sizes, kind='stable'):
+        ys, xs = objects[i]
+        boxes.append((xs.start * REGION_BLOCK, ys.start * REGION_BLOCK,
+                      min(w, xs.stop * REGION_BLOCK), min(h, ys.stop * REGION_BLOCK)))
+    return boxes
+
+def compare(rgb_a, rgb_b, tol: int):
+    """Metrics of one pair of charts, plus the per-pixel change for heatmaps."""
+    h = max(rgb_a.shape[0], rgb_b.shape[0])
+    w = max(rgb_a.shape[1], rgb_b.shape[1])
+    a, b = pad_to(rgb_a, h, w), pad_to(rgb_b, h, w)
+    d = np.maximum(a, b)
+    d -= np.minimum(a, b)   # |a - b| without leaving uint8
+    delta = np.maximum(np.maximum(d[..., 0], d[..., 1]), d[..., 2])
+    mask = delta > tol
+    regions = changed_regions(mask)
+    return {
+        'width': w,
+        'height': h,
+        'size_changed': rgb_a.shape[:2] != rgb_b.shape[:2],
+        'diff_ratio': round(float(mask.mean()), 6),
+        'ssim': round(ssim(grey(a), grey(b)), 6),
+        'n_regions': len(regions),
+        'regions': ';'.join('%d:%d:%d:%d' % r for r in regions[:MAX_REGIONS]),
+    }, a, delta
+
+def write_heatmap(path: Path, base, delta):
+    from PIL import Image
+    g = grey(base).astype(np.uint8) // 2 + 64   # faded chart underneath
+    out = np.stack([np.maximum(g, delta), g, g], axis=2)
+    Image.fromarray(out).save(path, compress_level=1)
+
+def load_planes(trial_dir: Path, pixels):
+    if pixels is not None:
+        from linter import TrialInputs
+        return pixels.get(trial_dir/'chart.png', TrialInputs(trial_dir).file_hash('chart.png')).rgb
+    from chart_pixels import load_rgb
+    return load_rgb(trial_dir/'chart.png')
+
+def diff_cell(cell, trials, tol, heatmaps, pixels):
+    """All condition pairs of one (task, model, sample) cell."""
+    task, model, sample = cell
+    images = {c: load_planes(d, pixels) for c, d in trials.items()}
+    rows = []
+    for ca, cb in PAIRS:
+        if ca not in images or cb not in images:
+            continue
+        m, base, delta = compare(images[ca], images[cb], tol)
+        rows.append(dict(task=task, model=model, sample=sample, cond_a=ca, cond_b=cb, **m))
+        if heatmaps:
+            write_heatmap(Path(heatmaps)/f'{task}__{model}__{sample}__{ca}_vs_{cb}.png', base, delta)
+    return rows
+
+def find_cells(runs_dir: Path):
+    """(task, model, sample) -> {condition: trial_dir} for trials with a chart.png."""
+    cells = {}
+    for t in walk(runs_dir, require='chart.png'):
+        cells.setdefault((t.task, t.model, t.sample), {})[t.condition] = t.dir
+    return {k: v for k, v in cells.items() if len(v) > 1}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--runs', default='runs', help='Path to runs/ directory (task-first)')
+    ap.add_argument('--out', default='reports', help='Directory to write condition_diffs.csv')
+    ap.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    ap.add_argument('--tol', type=int, default=16, help='Per-channel change (0-255) that counts as a difference')
+    ap.add_argument('--heatmaps', help='Also write one diff heatmap PNG per pair into this folder')
+    ap.add_argument('--no-pixel-cache', action='store_true', help='Decode chart.png with PIL every time')
+    args = ap.parse_args()
+
+    pixels = None
+    if not args.no_pixel_cache:
+        from pixel_cache import PixelCache
+        pixels = PixelCache()
+    if args.heatmaps:
+        Path(args.heatmaps).mkdir(parents=True, exist_ok=True)
+
+    cells = find_cells(Path(args.runs))
+    keys = sorted(cells)
+    n = len(keys)
+    if args.jobs > 1 and n > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(diff_cell, keys, [cells[k] for k in keys], [args.tol] * n,
+                                    [args.heatmaps] * n, [pixels] * n))
+    else:
+        results = [diff_cell(k, cells[k], args.tol, args.heatmaps, pixels) for k in keys]
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_csv = out_dir/'condition_diffs.csv'
+    fields = ['task', 'model', 'sample', 'cond_a', 'cond_b', 'width', 'height', 'size_changed',
+              'diff_ratio', 'ssim', 'n_regions', 'regions']
+    with out_csv.open('w', newline='', encoding='utf-8') as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        for rows in results:
+            w.writerows(rows)
+    print(f'[condition_diff] Compared {sum(len(r) for r in results)} pairs in {n} cells')
+    print(f'[condition_diff] Wrote {out_csv}')
+
+if __name__ == '__main__':
+    main()
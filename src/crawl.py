@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# crawl.py — Find the trial folders of a runs/ tree and read their JSON files.
+#
+# The layout is fixed: runs/<task>/<model>/<condition>/<sample>/. walk() descends
+# exactly TRIAL_DEPTH levels with os.scandir: one directory listing per folder,
+# directory checks from the listing itself (no stat), hidden entries and files
+# above the trial level pruned, and nothing below a trial folder visited. Only the
+# files asked for are stat'ed, so chart.png, logs and caches cost nothing.
+# task, model, condition and sample come from the depth at which each folder
+# was found, not from the tail of its path.
+#
+# read_json() parses the requested files of many trials on a thread pool;
+# iter_trials() / iter_json() do the same lazily, for callers that stream;
+# trial_at() gives the Trial of a single folder a caller already knows.
+#
+# Used by runner.py --batch, linter.py --batch, aggregate.py, failures.py,
+# condition_diff.py, ast_attribution.py and code_minhash.py.
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import NamedTuple
+
+LEVELS = ('task', 'model', 'condition', 'sample')
+TRIAL_DEPTH = len(LEVELS)
+DEFAULT_THREADS = min(8, os.cpu_count() or 1)
+READ_BATCH = 512   # trials handed to the thread pool at a time by iter_json()
+
+class Trial(NamedTuple):
+    path: str          # trial folder
+    task: str
+    model: str
+    condition: str
+    sample: str
+    files: frozenset   # names in the folder
+    stats: dict        # name -> os.stat_result, for the requested names present
+
+    @property
+    def trial_id(self):
+        return f'{self.task}__{self.model}__{self.condition}__{self.sample}'
+
+    @property
+    def dir(self):
+        return Path(self.path)
+
+def trial_fields(trial_dir: Path):
+    """(trial_id, task, model, condition, sample) of a single trial folder named on the command line."""
+    parts = list(Path(trial_dir).parts[-TRIAL_DEPTH:])
+    task, model, condition, sample = [''] * (TRIAL_DEPTH - len(parts)) + parts
+    return f'{task}__{model}__{condition}__{sample}', task, model, condition, sample
+
+def _subdirs(path: str):
+    try:
+        with os.scandir(path) as it:
+            return sorted((e.name, e.path) for e in it if not e.name.startswith('.') and e.is_dir())
+    except OSError:
+        return []
+
+def _trial(d: str, names, require, stat):
+    try:
+        with os.scandir(d) as it:
+            entries = {e.name: e for e in it}
+    except OSError:
+        return None
+    if require and require not in entries:
+        return None
+    stats = {}
+    for name in stat:
+        if name in entries:
+            try:
+                stats[name] = entries[name].stat()
+            except OSError:
+                pass
+    return Trial(d, *names, frozenset(entries), stats)
+
+def iter_trials(runs_dir: Path, require='run.json', stat=()):
+    """Trial folders under runs_dir that contain `require`, in sorted order, one at a time (depth first),
+    with the stats of the `stat` names."""
+    def descend(names, d):
+        if len(names) < TRIAL_DEPTH:
+            for name, path in _subdirs(d):
+                yield from descend(names + (name,), path)
+            return
+        t = _trial(d, names, require, stat)
+        if t is not None:
+            yield t
+    return descend((), str(runs_dir))
+
+def trial_at(trial_dir: Path, require='run.json', stat=()):
+    """The Trial of one trial folder (levels from its path, see trial_fields), or None without `require`."""
+    return _trial(str(trial_dir), trial_fields(trial_dir)[1:], require, stat)
+
+def walk(runs_dir: Path, require='run.json', stat=()):
+    """iter_trials() as a list."""
+    return list(iter_trials(runs_dir, require, stat))
+
+def load_json(p):
+    try:
+        with open(p, 'rb') as f:
+            return json.loads(f.read())
+    except Exception:
+        return None
+
+def read_json(trials, names, threads=DEFAULT_THREADS):
+    """For each trial (in order), {name: parsed JSON or None} of the given file names."""
+    def read(t):
+        return {n: load_json(os.path.join(t.path, n)) if n in t.files else None for n in names}
+    trials = list(trials)
+    if threads <= 1 or len(trials) < 2:
+        return [read(t) for t in trials]
+    with ThreadPoolExecutor(max_workers=threads) as tp:
+        return list(tp.map(read, trials))
+
+def iter_json(trials, names, threads=DEFAULT_THREADS, batch=READ_BATCH):
+    """(trial, {name: parsed JSON or None}) for an iterable of trials, read `batch` trials at a time."""
+    trials = iter(trials)
+    while True:
+        chunk = list(islice(trials, batch))
+        if not chunk:
+            return
+        yield from zip(chunk, read_json(chunk, names, threads))
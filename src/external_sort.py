@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# external_sort.py — Sort more rows than fit in memory: sorted spill files, k-way merged.
+#
+# ExternalSort collects (key, cells) rows. With chunk_rows set, every chunk_rows
+# rows are sorted and written to a JSON Lines spill file in tmp_dir; iterating
+# merges the spill files and the last, in-memory chunk with heapq.merge, reading
+# one line per file at a time. Without chunk_rows nothing is spilled and it is a
+# plain in-memory sort. Either way the order is the same: by key, ties in the
+# order the rows were added (the merge takes files in the order they were written).
+#
+# Keys and cells go through JSON, so they must be JSON values; ints and floats
+# come back exactly, tuples come back as lists (keys are compared as lists).
+import heapq
+import json
+import os
+from operator import itemgetter
+
+_KEY = itemgetter(0)
+
+class ExternalSort:
+    def __init__(self, tmp_dir, chunk_rows=None, name='rows'):
+        self.tmp_dir = tmp_dir
+        self.chunk_rows = chunk_rows
+        self.name = name
+        self.rows = []
+        self.files = []
+        self.count = 0
+
+    def add(self, key, cells):
+        self.rows.append((list(key), cells))
+        self.count += 1
+        if self.chunk_rows and len(self.rows) >= self.chunk_rows:
+            self._spill()
+
+    def _spill(self):
+        self.rows.sort(key=_KEY)
+        path = os.path.join(self.tmp_dir, f'{self.name}-{len(self.files):05d}.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(row, separators=(',', ':')) + '\n' for row in self.rows)
+        self.files.append(path)
+        self.rows = []
+
+    @staticmethod
+    def _read(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def __iter__(self):
+        """Cells of every row, in key order (can be iterated more than once)."""
+        self.rows.sort(key=_KEY)
+        if not self.files:
+            return map(itemgetter(1), self.rows)
+        runs = [self._read(p) for p in self.files] + [iter(self.rows)]
+        return map(itemgetter(1), heapq.merge(*runs, key=_KEY))
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# failures.py — Classify why trials failed, from the tail of their stderr.txt.
+#
+# Usage:
+#   python failures.py [--runs runs] [--out reports] [--all]
+#
+# Every signature in SIGNATURES is one regex; they are compiled together into a
+# single alternation, so each stderr tail is scanned once whatever the number
+# of signatures. The last match wins, since Python prints the exception that
+# killed the script at the bottom of the traceback. Only the last TAIL_BYTES of
+# a stderr file are read.
+#
+# Output: reports/failures.csv — one row per failed trial (non-zero return code
+# or no chart.png; with --all, every trial with a non-empty stderr.txt):
+#   category, exception, detail (offending column / module / file / attribute), message
+#
+# runner.py calls describe() on the captured stderr and stores the result as
+# `failure` in run.json.
+import argparse
+import csv
+import json
+import re
+from pathlib import Path
+
+from crawl import walk
+
+TAIL_BYTES = 16 * 1024
+
+# (category, pattern). Patterns match from the start of a line; `detail`
+# captures the offending name. Earlier entries win when several match the same line.
+SIGNATURES = [
+    ('timeout', r'\[runner\] (?P<exc>TimeoutExpired) \((?P<detail>\d+)s\)'),
+    ('missing_module', r"(?P<exc>ModuleNotFoundError|ImportError): No module named '(?P<detail>[\w.]+)'"),
+    ('import_name', r"(?P<exc>ImportError): cannot import name '(?P<detail>\w+)'"),
+    ('missing_data_csv', r"(?P<exc>FileNotFoundError): \[Errno 2\] No such file or directory: "
+                         r"'(?P<detail>(?:[^']*/)?data\.csv)'"),
+    ('missing_file', r"(?P<exc>FileNotFoundError): \[Errno 2\] No such file or directory: '(?P<detail>[^']*)'"),
+    ('missing_column', r"(?P<exc>KeyError): \"?\[?'(?P<detail>[^']*)'"),
+    ('missing_column', r"(?P<exc>KeyError): \"None of \[Index\(\['(?P<detail>[^']*)'"),
+    ('plot_shape_mismatch', r"(?P<exc>ValueError): (?P<detail>(?:x and y must (?:have same first dimension|be the "
+                            r"same size)|shape mismatch|operands could not be broadcast|The number of FixedLocator "
+                            r"locations|'\w+' (?:argument )?must be (?:a |the )?(?:same size|scalar|1D|color))[^\n]*)"),
+    ('bad_value', r'(?P<exc>ValueError): (?P<detail>could not convert [^\n]*|Unknown format code[^\n]*|'
+                  r'time data [^\n]*|Invalid RGBA argument[^\n]*|[^\n]* is not a valid value for [^\n]*)'),
+    ('missing_attribute', r"(?P<exc>AttributeError): [^\n]*has no attribute '(?P<detail>\w+)'"),
+    ('undefined_name', r"(?P<exc>NameError): name '(?P<detail>\w+)' is not defined"),
+    ('syntax', r'(?P<exc>SyntaxError|IndentationError|TabError): (?P<detail>[^\n]*)'),
+    ('type_error', r'(?P<exc>TypeError): (?P<detail>[^\n]*)'),
+    ('memory', r'(?P<exc>MemoryError)(?P<detail>)'),
+    ('other_exception', r'(?P<exc>[A-Za-z_][\w.]*(?:Error|Exception|Exit)): (?P<detail>[^\n]*)'),
+]
+
+def _compile(signatures):
+    """One multiline regex: alternative i is (?P<s{i}>...) with its groups renamed exc{i}/detail{i}."""
+    parts = []
+    for i, (_, pat) in enumerate(signatures):
+        pat = pat.replace('(?P<exc>', f'(?P<exc{i}>').replace('(?P<detail>', f'(?P<detail{i}>')
+        parts.append(f'(?P<s{i}>{pat})')
+    return re.compile(r'^(?:' + '|'.join(parts) + r')', re.M)
+
+SIGNATURE_RE = _compile(SIGNATURES)
+
+def classify(text: str):
+    """{'category', 'exception', 'detail', 'message'} of the last recognised failure line, or None."""
+    # the failure is below the last traceback header (or the runner's marker); warnings above it are skipped
+    start = max(text.rfind('Traceback (most recent call last)'), text.rfind('[runner] '), 0)
+    last = None
+    for last in SIGNATURE_RE.finditer(text, start):
+        pass
+    if last is None:
+        return None
+    end = text.find('\n', last.start())
+    i = int(last.lastgroup[1:])   # the outer (?P<s{i}>...) group closes last
+    return {
+        'category': SIGNATURES[i][0],
+        'exception': last.group(f'exc{i}'),
+        'detail': last.group(f'detail{i}') or '',
+        'message': text[last.start():end if end >= 0 else None].strip()[:300],
+    }
+
+def read_tail(path: Path, nbytes=TAIL_BYTES):
+    with path.open('rb') as f:
+        f.seek(0, 2)
+        size = f.tell()
+        f.seek(max(0, size - nbytes))
+        return f.read().decode('utf-8', errors='replace')
+
+def last_line(text: str):
+    lines = [l for l in text.splitlines() if l.strip()]
+    return lines[-1].strip()[:300] if lines else ''
+
+def describe(text: str, returncode):
+    """classify(), or a fallback record for failures without a recognised line."""
+    found = classify(text)
+    if found is None:
+        found = {'category': 'no_chart' if returncode == 0 else 'unknown',
+                 'exception': '', 'detail': '', 'message': last_line(text)}
+    return found
+
+def classify_trial(trial_dir: Path, include_ok=False):
+    """Failure record of a trial, or None when it ran fine (and include_ok is off)."""
+    try:
+        run = json.loads((trial_dir/'run.json').read_text())
+    except Exception:
+        run = None
+    failed = run is None or run.get('returncode') != 0 or not (trial_dir/'chart.png').exists()
+    stderr = trial_dir/'stderr.txt'
+    if not failed and not (include_ok and stderr.exists() and stderr.stat().st_size):
+        return None
+    rc = run.get('returncode') if run else None
+    tail = read_tail(stderr) if stderr.exists() else ''
+    found = classify(tail) if not failed else describe(tail, rc)
+    if found is None:
+        return None
+    found['returncode'] = '' if rc is None else rc
+    return found
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--runs', default='runs', help='Path to runs/ directory (task-first)')
+    ap.add_argument('--out', default='reports', help='Directory to write failures.csv')
+    ap.add_argument('--all', action='store_true', help='Also classify successful trials with a non-empty stderr')
+    args = ap.parse_args()
+
+    rows = []
+    for t in walk(Path(args.runs), require='stderr.txt'):
+        rec = classify_trial(t.dir, args.all)
+        if rec is None:
+            continue
+        rows.append(dict(trial_id=t.trial_id, task=t.task, model=t.model, condition=t.condition,
+                         sample=t.sample, **rec))
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_csv = out_dir/'failures.csv'
+    fields = ['trial_id', 'task', 'model', 'condition', 'sample', 'returncode', 'category', 'exception',
+              'detail', 'message']
+    with out_csv.open('w', newline='', encoding='utf-8') as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        w.writerows(rows)
+    print(f'[failures] Classified {len(rows)} trials')
+    print(f'[failures] Wrote {out_csv}')
+
+if __name__ == '__main__':
+    main()
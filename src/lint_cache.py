@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# lint_cache.py — Local store of per-rule lint results, keyed by input hashes.
+#
+# One row per (rule, rule version, input key). The input key is the SHA-256 of
+# whatever the rule reads (code.py for code rules, chart.png for image rules),
+# so editing one rule, or re-rendering one chart, only invalidates the rows that
+# actually depend on it. Results are stored as the JSON list the rule returned.
+#
+# The store is a single SQLite file; concurrent linter workers share it safely
+# (WAL journal, busy timeout).
+import json
+import sqlite3
+from pathlib import Path
+
+DEFAULT_CACHE = Path(__file__).resolve().parent.parent / '.cache' / 'lint.sqlite'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rule_results (
+    rule    TEXT NOT NULL,
+    version TEXT NOT NULL,
+    input   TEXT NOT NULL,
+    results TEXT NOT NULL,
+    PRIMARY KEY (rule, version, input)
+)
+'''
+
+class LintCache:
+    def __init__(self, path=DEFAULT_CACHE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=60)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self._pending = []
+
+    def get(self, rule: str, version, key: str):
+        """Cached results for a rule on an input, or None."""
+        row = self.conn.execute(
+            'SELECT results FROM rule_results WHERE rule=? AND version=? AND input=?',
+            (rule, str(version), key)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, rule: str, version, key: str, results):
+        """Queue a result; written in one short transaction by commit() so workers don't block each other."""
+        self._pending.append((rule, str(version), key, json.dumps(results)))
+
+    def commit(self):
+        if self._pending:
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO rule_results (rule, version, input, results) VALUES (?, ?, ?, ?)',
+                    self._pending
+                )
+            self._pending = []
+
+    def close(self):
+        self.commit()
+        self.conn.close()
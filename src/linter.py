@@ -1,25 +1,58 @@
 #!/usr/bin/env python3
 # linter.py — Post-hoc checks for standards adherence on a rendered chart and its source code.
 
+import argparse
+import ast
 import json
 import re
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
-from PIL import Image
-import numpy as np
+from crawl import trial_fields, walk
+from lint_cache import DEFAULT_CACHE, LintCache
+from runner import sha256
+from stats_utils import percentile
 
 USAGE = '''Usage:
   python linter.py <trial_folder>
+  python linter.py --batch <runs_dir> [--jobs N] [--threads N] [--jsonl <file>]
+
+Options:
+  --rules a,b / --skip-rules a,b — run only / leave out the named rules
+                                (code-only selections never decode chart.png;
+                                lint.json keeps the other rules' entries)
+  --timings                   — add time_ms / bytes_read / cached to every
+                                entry and print a per-rule cost summary
+  --cache <file> / --no-cache — per-rule result cache keyed by the SHA-256 of
+                                code.py / chart.png and the rule version
+  --config <file>             — rule parameters (default: lint_config.json in the
+                                repo root, if present), e.g.
+                                {"contrast_text": {"threshold_text": 4.5}};
+                                calibrate_contrast.py --write-config fills it in
+  --pixel-cache <dir> / --no-pixel-cache [--pixel-budget-mb N]
+                              — decoded chart planes (.npy, memory-mapped) shared
+                                with notebooks and report scripts; see pixel_cache.py
 
 Inputs:
   <trial_folder>/code.py   — the model-generated code
   <trial_folder>/chart.png — the rendered image (created by runner.py)
+  <trial_folder>/figure.json — drawn-text colours recorded by runner.py at
+                             savefig time (optional; contrast_text_exact)
 
 Outputs:
   <trial_folder>/lint.json — JSON list of rule results.
+  --jsonl <file>           — (batch) one JSON object per trial, readable by
+                             aggregate.py --lint-jsonl in a single pass.
 '''
 
+# Trials handed to one worker process at a time; within a chunk the PNGs are
+# decoded by a thread pool (PIL releases the GIL while decoding).
+BATCH_CHUNK = 8
+
+DEFAULT_CONFIG = Path(__file__).resolve().parent.parent / 'lint_config.json'
+
 def read_text(p: Path):
     try:
         return p.read_text(encoding='utf-8', errors='replace')
@@ -96,144 +129,886 @@ def bar_has_baseline_hint(code: str):
         return True
     return False
 
-def contrast_ratio(img_path: Path):
-    """Approximate WCAG-like contrast between background and darkest marks."""
-    im = Image.open(img_path).convert('RGB')
-    arr = np.asarray(im).astype(np.float32) / 255.0
-
-    def to_linear(c):
-        return np.where(c <= 0.04045, c/12.92, ((c+0.055)/1.055)**2.4)
-
-    lin = to_linear(arr)
-    L = 0.2126 * lin[..., 0] + 0.7152 * lin[..., 1] + 0.0722 * lin[..., 2]
-    h, w = L.shape
-    if h == 0 or w == 0:
-        raise ValueError("empty image")
-
-    # border as background proxy
-    b = 10 if min(h, w) >= 40 else max(1, min(h, w) // 8)
-    border = np.concatenate([
-        L[:b, :].ravel(),
-        L[-b:, :].ravel(),
-        L[:, :b].ravel(),
-        L[:, -b:].ravel(),
-    ])
-    L_bg = float(np.median(border))
-
-    # darkest 5% of pixels as "ink"
-    L_fg = float(np.quantile(L, 0.05))
-
-    lighter = max(L_bg, L_fg)
-    darker = min(L_bg, L_fg)
-    ratio = (lighter + 0.05) / (darker + 0.05)
-    im.close()
-    return ratio
+# --- performance anti-patterns (static, on the AST) -------------------------
+#
+# The task instances are small, but the generated scripts get reused on much
+# bigger tables. PerfScan walks code.py once and records constructs whose cost
+# grows with the number of rows in Python rather than in pandas/numpy. Each
+# finding is (line, complexity class, detail); n = rows, b = bins,
+# k = loop iterations.
+
+PLOT_MARKS = {'bar', 'barh', 'scatter', 'plot', 'hist', 'fill_between', 'errorbar', 'step', 'stem',
+              'vlines', 'hlines', 'axvline', 'axhline', 'axvspan', 'add_patch', 'pie'}
+READERS = {'read_csv', 'read_table', 'read_excel'}
+# DataFrame/Series methods that keep one entry per row
+ROW_METHODS = {'copy', 'dropna', 'fillna', 'sort_values', 'sort_index', 'reset_index', 'set_index',
+               'astype', 'query', 'assign', 'rename', 'where', 'mask', 'clip', 'abs', 'round',
+               'interpolate', 'ffill', 'bfill', 'to_numpy', 'tolist', 'to_list'}
+
+def call_name(node):
+    """'read_csv' for pd.read_csv(...) / read_csv(...); None for other callees."""
+    f = node.func
+    return f.attr if isinstance(f, ast.Attribute) else (f.id if isinstance(f, ast.Name) else None)
+
+class PerfScan(ast.NodeVisitor):
+    def __init__(self):
+        self.kinds = {}     # variable -> 'frame' | 'column' (row-shaped values)
+        self.loops = []     # enclosing For/While nodes, innermost last
+        self.row_loops = 0  # how many of them iterate over rows
+        self.reads = []     # (line, path expression, inside a loop, inside an except handler)
+        self.in_except = 0
+        self.retries = []   # per enclosing try: depth of the loop it can leave on success, else -1
+        self.iter_of = None # the For whose header is being visited
+        self.findings = {name: [] for name in PERF_RULES}
+
+    def add(self, rule_name, node, complexity, detail):
+        self.findings[rule_name].append((node.lineno, complexity, detail))
+
+    # -- shapes --
+    def kind(self, e):
+        """'frame' / 'column' when e is row-shaped (one entry per data row), else None."""
+        if isinstance(e, ast.Name):
+            return self.kinds.get(e.id)
+        if isinstance(e, ast.Call):
+            name = call_name(e)
+            if name in READERS or name == 'DataFrame':
+                return 'frame'
+            if isinstance(e.func, ast.Attribute) and name in ROW_METHODS:
+                k = self.kind(e.func.value)
+                return 'column' if k and name in ('to_numpy', 'tolist', 'to_list') else k
+            return None
+        if isinstance(e, ast.Attribute):
+            k = self.kind(e.value)
+            if k is None or e.attr in ('columns', 'dtypes', 'shape', 'T', 'str', 'dt'):
+                return None
+            if e.attr in ('loc', 'iloc'):
+                return k
+            return 'column' if k == 'frame' or e.attr in ('values', 'index') else None
+        if isinstance(e, ast.Subscript):
+            k = self.kind(e.value)
+            if k != 'frame':
+                return k
+            sl = e.slice
+            if isinstance(sl, ast.Tuple) and len(sl.elts) == 2:   # .loc[rows, cols]
+                sl = sl.elts[1]
+            if isinstance(sl, ast.Constant) and isinstance(sl.value, str):
+                return 'column'
+            return 'frame'   # column list or boolean mask
+        return None
 
-def main():
-    if len(sys.argv) != 2:
-        print(USAGE, file=sys.stderr)
-        sys.exit(2)
+    def per_row(self, it):
+        """Does iterating over `it` visit every data row?"""
+        if isinstance(it, ast.Call):
+            name = call_name(it)
+            if name in ('iterrows', 'itertuples'):
+                return True
+            if name in ('zip', 'enumerate'):
+                return any(self.per_row(a) for a in it.args)
+            if name == 'range' and it.args:
+                n = it.args[1] if len(it.args) > 1 else it.args[0]
+                if isinstance(n, ast.Call) and call_name(n) == 'len' and n.args:
+                    return self.kind(n.args[0]) is not None
+                if isinstance(n, ast.Subscript) and isinstance(n.value, ast.Attribute) \
+                        and n.value.attr == 'shape':
+                    return self.kind(n.value.value) is not None
+                return False
+        return self.kind(it) == 'column'   # iterating a frame yields its columns
+
+    # -- statements --
+    def visit_Assign(self, node):
+        self.generic_visit(node)
+        k = self.kind(node.value)
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                if k:
+                    self.kinds[target.id] = k
+                else:
+                    self.kinds.pop(target.id, None)
+            elif isinstance(target, ast.Subscript) and self.loops and is_increment(target, node.value):
+                self.binning(node, target)
+
+    def visit_AugAssign(self, node):
+        self.generic_visit(node)
+        if self.loops and isinstance(node.target, ast.Subscript) and isinstance(node.op, ast.Add) \
+                and isinstance(node.value, ast.Constant) and node.value.value == 1:
+            self.binning(node, node.target)
+
+    def binning(self, node, target):
+        nested = sum(isinstance(l, ast.For) for l in self.loops) >= 2
+        self.add('perf_manual_binning', node, 'O(n*b) interpreted' if nested else 'O(n) interpreted',
+                 f'{ast.unparse(target.value)}[...] += 1 in a Python loop' + (' over bins' if nested else '') +
+                 '; use np.histogram / pd.cut + value_counts')
+
+    def visit_Try(self, node):
+        exits = any(isinstance(n, (ast.Break, ast.Return)) for stmt in node.body + node.orelse for n in ast.walk(stmt))
+        self.retries.append(len(self.loops) if exits and self.loops else -1)
+        for stmt in node.body:
+            self.visit(stmt)
+        self.retries.pop()
+        for part in node.handlers + node.orelse + node.finalbody:
+            self.visit(part)
+
+    visit_TryStar = visit_Try
+
+    def visit_ExceptHandler(self, node):
+        self.in_except += 1
+        self.generic_visit(node)
+        self.in_except -= 1
+
+    def visit_For(self, node):
+        self.iter_of = node
+        self.visit(node.iter)
+        self.iter_of = None
+        self.visit(node.target)
+        row = self.per_row(node.iter)
+        self.loop(node, row)
+        for stmt in node.orelse:
+            self.visit(stmt)
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        self.visit(node.test)
+        self.loop(node, False)
+        for stmt in node.orelse:
+            self.visit(stmt)
+
+    def loop(self, node, row):
+        self.loops.append(node)
+        self.row_loops += row
+        for stmt in node.body:
+            self.visit(stmt)
+        self.row_loops -= row
+        self.loops.pop()
+        every = [n for stmt in node.body for n in ast.walk(stmt) if isinstance(n, ast.Call)]
+        if not any(call_name(c) == 'close' for c in every):
+            for c in own_calls(node.body):
+                if call_name(c) in ('figure', 'subplots') and isinstance(c.func, ast.Attribute) \
+                        and isinstance(c.func.value, ast.Name) and c.func.value.id == 'plt':
+                    self.add('perf_figure_in_loop', c, 'O(k) open figures',
+                             f'plt.{call_name(c)}() in a loop without plt.close()')
+
+    # -- calls --
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        name = call_name(node)
+        if name in ('iterrows', 'itertuples'):
+            feeds = self.iter_of is not None and any(
+                isinstance(n, ast.Call) and call_name(n) in PLOT_MARKS
+                for stmt in self.iter_of.body for n in ast.walk(stmt))
+            self.add('perf_row_iteration', node, 'O(n) artists' if feeds else 'O(n) interpreted',
+                     f'.{name}()' + (' feeding plot calls' if feeds else '') + '; use vectorised columns')
+        elif name == 'apply' and any(k.arg == 'axis' and isinstance(k.value, ast.Constant)
+                                     and k.value.value in (1, 'columns') for k in node.keywords):
+            self.add('perf_apply_axis1', node, 'O(n) interpreted',
+                     '.apply(..., axis=1) calls Python once per row; use column arithmetic')
+        elif name in PLOT_MARKS and self.row_loops and isinstance(node.func, ast.Attribute):
+            self.add('perf_plot_in_row_loop', node, 'O(n) artists',
+                     f'.{name}() called once per data row; pass the whole column in one call')
+        elif name in READERS:
+            path = ast.unparse(node.args[0]) if node.args else ''
+            # a try in the innermost loop that leaves it once the read worked is a retry, not a re-read
+            retry = bool(self.retries) and self.retries[-1] == len(self.loops)
+            self.reads.append((node, path, bool(self.loops) and not retry, bool(self.in_except)))
+
+    def finish(self):
+        seen = {}
+        for node, path, in_loop, fallback in self.reads:
+            if in_loop:
+                self.add('perf_repeated_read', node, 'O(k*n) I/O', f'{call_name(node)}({path}) inside a loop')
+            elif not fallback:
+                seen[path] = seen.get(path, 0) + 1
+                if seen[path] > 1:
+                    self.add('perf_repeated_read', node, 'O(k*n) I/O',
+                             f'{path or "input"} parsed {seen[path]} times; reuse the first DataFrame')
+        return self.findings
+
+def own_calls(body):
+    """Calls in `body` that run once per iteration of its loop: not inside an inner loop (an inner
+    for's iterable still counts) nor a nested def/class."""
+    calls, todo = [], list(body)
+    while todo:
+        n = todo.pop()
+        if isinstance(n, (ast.For, ast.AsyncFor)):
+            todo.append(n.iter)
+            continue
+        if isinstance(n, (ast.While, ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        if isinstance(n, ast.Call):
+            calls.append(n)
+        todo.extend(ast.iter_child_nodes(n))
+    return sorted(calls, key=lambda c: (c.lineno, c.col_offset))
+
+def is_increment(target, value):
+    """x[k] = x[k] + 1 / x[k] = x.get(k, 0) + 1"""
+    if not (isinstance(value, ast.BinOp) and isinstance(value.op, ast.Add)
+            and isinstance(value.right, ast.Constant) and value.right.value == 1):
+        return False
+    base = ast.unparse(target.value)
+    return any(ast.unparse(n) == base for n in ast.walk(value.left) if isinstance(n, (ast.Name, ast.Attribute)))
+
+PERF_RULES = ('perf_row_iteration', 'perf_apply_axis1', 'perf_plot_in_row_loop', 'perf_repeated_read',
+              'perf_manual_binning', 'perf_figure_in_loop')
+
+def perf_findings(t):
+    """rule name -> [(line, complexity, detail)], scanned once per trial."""
+    if t._perf is None:
+        scan = PerfScan()
+        if t.ast is not None:
+            scan.visit(t.ast)
+        t._perf = scan.finish()
+    return t._perf
+
+# --- inputs ----------------------------------------------------------------
+# Inputs a rule may declare, and the trial file each one is derived from. The
+# SHA-256 of those files keys the rule's cached results.
+INPUT_FILES = {
+    'source':   'code.py',     # source text
+    'ast':      'code.py',     # parsed module (None on SyntaxError)
+    'image':    'chart.png',   # decoded PIL image
+    'manifest': 'figure.json', # figure manifest written by the runner, if any
+}
+OPTIONAL_FILES = {'figure.json'}
+
+class TrialInputs:
+    """Lazily loaded inputs of one trial folder; each is loaded at most once."""
+
+    def __init__(self, trial_dir: Path, pixels=None, task=None):
+        self.trial_dir = trial_dir
+        self.img_path = trial_dir / 'chart.png'
+        self.pixels = pixels   # PixelCache serving the image as memory-mapped planes, if any
+        self.task = task if task is not None else trial_fields(trial_dir)[1]
+        self._loaded = {}
+        self._hashes = {}
+        self._run = None
+        self._perf = None
+        # cost accounting for --timings: what loading each input took, which
+        # inputs the current rule touched, and which costs were already charged
+        self.load_seconds = 0.0
+        self._costs = {}
+        self._used = set()
+        self._charged = set()
+
+    def _load(self, name, loader, path=None):
+        self._used.add(name)
+        if name not in self._loaded:
+            t0, nested0 = time.perf_counter(), self.load_seconds
+            self._loaded[name] = loader()
+            # exclude inputs loaded on the way (ast -> source); they carry their own cost
+            own = time.perf_counter() - t0 - (self.load_seconds - nested0)
+            self.load_seconds += own
+            nbytes = path.stat().st_size if path is not None and path.exists() else 0
+            self._costs[name] = (own, nbytes)
+        return self._loaded[name]
+
+    def reset_usage(self):
+        self._used.clear()
+
+    def claim_costs(self):
+        """(seconds, bytes) of loading the inputs used since reset_usage() that nobody was charged for yet."""
+        secs, nbytes = 0.0, 0
+        for name in self._used - self._charged:
+            if name in self._costs:
+                s, b = self._costs[name]
+                secs += s
+                nbytes += b
+                self._charged.add(name)
+        return secs, nbytes
+
+    @property
+    def source(self):
+        path = self.trial_dir / 'code.py'
+        return self._load('source', lambda: read_text(path), path)
+
+    @property
+    def ast(self):
+        def parse():
+            try:
+                return ast.parse(self.source)
+            except (SyntaxError, ValueError):
+                return None
+        return self._load('ast', parse)
+
+    @property
+    def image(self):
+        def decode():
+            if self.pixels is not None:
+                return self.pixels.get(self.img_path, self.file_hash('chart.png'))
+            from chart_pixels import open_image
+            return open_image(self.img_path)
+        return self._load('image', decode, self.img_path)
+
+    @property
+    def manifest(self):
+        path = self.trial_dir / 'figure.json'
+        return self._load('manifest', lambda: load_json(path), path)
+
+    def file_hash(self, name: str):
+        """SHA-256 of a trial file, taken from run.json when it is not older than the file."""
+        if name not in self._hashes:
+            self._hashes[name] = self._hash_from_run(name) or sha256(self.trial_dir / name)
+        return self._hashes[name]
+
+    def _hash_from_run(self, name: str):
+        field = {'code.py': 'code_sha256', 'chart.png': 'image_sha256'}.get(name)
+        if field is None:
+            return None
+        run_path = self.trial_dir / 'run.json'
+        try:
+            if run_path.stat().st_mtime < (self.trial_dir / name).stat().st_mtime:
+                return None
+            if self._run is None:
+                self._run = json.loads(run_path.read_text())
+            return self._run.get(field)
+        except Exception:
+            return None
+
+    def close(self):
+        im = self._loaded.pop('image', None)
+        if im is not None:
+            im.close()
+
+def load_json(p: Path):
+    try:
+        return json.loads(p.read_text())
+    except Exception:
+        return None
 
-    trial_dir = Path(sys.argv[1]).resolve()
-    code_path = trial_dir / 'code.py'
-    img_path  = trial_dir / 'chart.png'
+# --- registry --------------------------------------------------------------
 
-    if not code_path.exists() or not img_path.exists():
-        print(f"[linter] Missing code.py or chart.png in {trial_dir}", file=sys.stderr)
-        sys.exit(1)
+class Rule:
+    """A lint rule: `fn(trial_inputs)` returns a list of result entries (possibly empty)."""
 
-    code = read_text(code_path)
-    results = []
+    def __init__(self, name, fn, inputs, version, tasks, params):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.version = version
+        self.tasks = tuple(tasks) if tasks else None
+        self.defaults = dict(params or {})
+        self.params = dict(self.defaults)
+
+    @property
+    def files(self):
+        return list(dict.fromkeys(INPUT_FILES[i] for i in self.inputs))
+
+    @property
+    def needs_pixels(self):
+        return 'image' in self.inputs
+
+    def applies_to(self, task: str):
+        return self.tasks is None or task in self.tasks
 
-    ctype = detect_chart_type(code)
-    results.append({'rule': 'chart_type', 'value': ctype})
+    def cache_key(self, t: TrialInputs):
+        key = '+'.join(t.file_hash(f) or '-' for f in self.files)
+        if self.params != self.defaults:
+            key += '+' + json.dumps(self.params, sort_keys=True)
+        return key
 
-    t, x, y = has_labels(code)
-    labels_ok = t and x and y
-    detail = ",".join([name for ok, name in [(t, 'title'), (x, 'xlabel'), (y, 'ylabel')] if ok])
-    results.append({
+# name -> Rule, in lint.json order
+RULES = {}
+
+def rule(name, inputs=('source',), version=1, tasks=None, params=None):
+    """Register a rule. Bump `version` whenever its logic (or a helper it relies on) changes.
+
+    `params` are keyword arguments passed to the rule, with their defaults; the
+    linter config can override them.
+    """
+    def register(fn):
+        RULES[name] = Rule(name, fn, inputs, version, tasks, params)
+        return fn
+    return register
+
+def load_config(path: Path = DEFAULT_CONFIG):
+    """{rule: {param: value}} from a JSON config file ({} if there is none)."""
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+def configure(config):
+    """Set every rule's params to its defaults, overridden by `config`; raises ValueError on unknown names."""
+    for r in RULES.values():
+        r.params = dict(r.defaults)
+    for name, params in config.items():
+        if name not in RULES:
+            raise ValueError(f"config: unknown rule {name!r}")
+        unknown = sorted(set(params) - set(RULES[name].defaults))
+        if unknown:
+            raise ValueError(f"config: {name} has no parameter(s) {', '.join(unknown)}")
+        RULES[name].params.update(params)
+
+def select_rules(only=None, skip=None):
+    """Enabled rules in registry order; raises ValueError on unknown names."""
+    unknown = sorted(set(only or []).union(skip or []) - set(RULES))
+    if unknown:
+        raise ValueError(f"unknown rule(s): {', '.join(unknown)} (known: {', '.join(RULES)})")
+    return [r for name, r in RULES.items()
+            if (not only or name in only) and name not in (skip or [])]
+
+BAR_TASKS = ('t01_bars', 't07_histogram', 't08_stacked_bars')
+# tasks whose colours encode categories (the heatmap uses a continuous colormap)
+CATEGORICAL_TASKS = ('t01_bars', 't02_line_gaps', 't03_scatter_group', 't05_small_multiples',
+                     't06_dual_axis', 't07_histogram', 't08_stacked_bars')
+
+# --- rules -----------------------------------------------------------------
+
+@rule('chart_type')
+def rule_chart_type(t):
+    return [{'rule': 'chart_type', 'value': detect_chart_type(t.source)}]
+
+@rule('labels_present')
+def rule_labels_present(t):
+    title, xlabel, ylabel = has_labels(t.source)
+    labels_ok = title and xlabel and ylabel
+    detail = ",".join([name for ok, name in [(title, 'title'), (xlabel, 'xlabel'), (ylabel, 'ylabel')] if ok])
+    return [{
         'rule': 'labels_present',
         'status': 'pass' if labels_ok else 'fail',
         'detail': detail
-    })
-
+    }]
 
-    leg = has_legend(code)
-    cb, cb_label = has_colorbar(code)
-
-    if ctype == 'heatmap':
+@rule('legend_call')
+def rule_legend_call(t):
+    if detect_chart_type(t.source) == 'heatmap':
         # legends not normally expected; rely on colorbar instead
-        results.append({
+        return [{
             'rule': 'legend_call',
             'status': 'info',
             'detail': 'legend() not required for heatmap'
-        })
-        results.append({
-            'rule': 'colorbar_present',
-            'status': 'pass' if cb else 'warn',
-            'detail': 'colorbar() detected' if cb else 'no colorbar() call'
-        })
-        results.append({
-            'rule': 'colorbar_label',
-            'status': 'pass' if cb_label else ('warn' if cb else 'info'),
-            'detail': 'colorbar label set' if cb_label else 'no explicit colorbar label'
-        })
-    else:
-        leg = has_legend(code)
-        results.append({
-            'rule': 'legend_call',
-            'status': 'pass' if leg else 'warn',
-            'detail': 'legend() detected' if leg else 'no legend() call'
-        })
-
-    dual = uses_dual_axes(code)
-    results.append({
+        }]
+    leg = has_legend(t.source)
+    return [{
+        'rule': 'legend_call',
+        'status': 'pass' if leg else 'warn',
+        'detail': 'legend() detected' if leg else 'no legend() call'
+    }]
+
+@rule('colorbar_present', tasks=('t04_heatmap_corr',))
+def rule_colorbar_present(t):
+    if detect_chart_type(t.source) != 'heatmap':
+        return []
+    cb, _ = has_colorbar(t.source)
+    return [{
+        'rule': 'colorbar_present',
+        'status': 'pass' if cb else 'warn',
+        'detail': 'colorbar() detected' if cb else 'no colorbar() call'
+    }]
+
+@rule('colorbar_label', tasks=('t04_heatmap_corr',))
+def rule_colorbar_label(t):
+    if detect_chart_type(t.source) != 'heatmap':
+        return []
+    cb, cb_label = has_colorbar(t.source)
+    return [{
+        'rule': 'colorbar_label',
+        'status': 'pass' if cb_label else ('warn' if cb else 'info'),
+        'detail': 'colorbar label set' if cb_label else 'no explicit colorbar label'
+    }]
+
+@rule('dual_axes')
+def rule_dual_axes(t):
+    dual = uses_dual_axes(t.source)
+    return [{
         'rule': 'dual_axes',
         'status': 'fail' if dual else 'pass',
         'detail': 'twinx/twiny/secondary_y detected' if dual else 'not detected'
-    })
+    }]
 
-    rng_unseeded = rng_without_seed(code)
-    results.append({
+@rule('determinism_seed')
+def rule_determinism_seed(t):
+    rng_unseeded = rng_without_seed(t.source)
+    return [{
         'rule': 'determinism_seed',
         'status': 'fail' if rng_unseeded else 'pass',
         'detail': 'rng without seed' if rng_unseeded else 'no unseeded rng'
-    })
+    }]
 
-    seaborn = uses_seaborn(code)
-    results.append({
+@rule('seaborn_usage')
+def rule_seaborn_usage(t):
+    seaborn = uses_seaborn(t.source)
+    return [{
         'rule': 'seaborn_usage',
         'status': 'info',
         'detail': 'seaborn used' if seaborn else 'not used'
-    })
-
-    base_hint = bar_has_baseline_hint(code)
-    if base_hint is not None:
-        results.append({
-            'rule': 'baseline_zero_bar',
-            'status': 'pass' if base_hint else 'warn',
-            'detail': 'baseline at 0 hinted' if base_hint else 'no explicit baseline enforcement'
-        })
-
+    }]
+
+@rule('baseline_zero_bar', tasks=BAR_TASKS)
+def rule_baseline_zero_bar(t):
+    base_hint = bar_has_baseline_hint(t.source)
+    if base_hint is None:
+        return []
+    return [{
+        'rule': 'baseline_zero_bar',
+        'status': 'pass' if base_hint else 'warn',
+        'detail': 'baseline at 0 hinted' if base_hint else 'no explicit baseline enforcement'
+    }]
+
+CONTRAST_PARAMS = {'threshold_text': 4.5, 'threshold_graphics': 3.0}   # WCAG 2.x AA
+
+@rule('contrast_text', inputs=('image',), params=CONTRAST_PARAMS)
+def rule_contrast_text(t, threshold_text, threshold_graphics):
     try:
-        ratio = contrast_ratio(img_path)
-        status = 'pass' if ratio >= 4.5 else ('warn' if ratio >= 3.0 else 'fail')
-        results.append({
+        from chart_pixels import contrast_ratio
+        ratio = contrast_ratio(t.img_path, t.image)
+        status = 'pass' if ratio >= threshold_text else ('warn' if ratio >= threshold_graphics else 'fail')
+        return [{
             'rule': 'contrast_text',
             'status': status,
             'ratio': round(float(ratio), 2),
-            'threshold_text': 4.5,
-            'threshold_graphics': 3.0
-        })
+            'threshold_text': threshold_text,
+            'threshold_graphics': threshold_graphics
+        }]
     except Exception as e:
-        results.append({
+        return [{
             'rule': 'contrast_text',
             'status': 'error',
             'detail': f'contrast calc failed: {e}'
-        })
+        }]
+
+@rule('contrast_text_exact', inputs=('manifest',), params=CONTRAST_PARAMS)
+def rule_contrast_text_exact(t, threshold_text, threshold_graphics):
+    """Exact WCAG ratio of the worst drawn text, from the runner's figure.json (no pixels)."""
+    m = t.manifest
+    if m is None:
+        return [{
+            'rule': 'contrast_text_exact',
+            'status': 'info',
+            'detail': 'no figure.json (re-run runner.py, or chart not saved via matplotlib)'
+        }]
+    if 'error' in m:
+        return [{
+            'rule': 'contrast_text_exact',
+            'status': 'error',
+            'detail': f"figure manifest failed: {m['error']}"
+        }]
+    ratio = m.get('min_ratio')
+    if ratio is None:
+        return [{'rule': 'contrast_text_exact', 'status': 'info', 'detail': 'no text drawn'}]
+    worst = m['worst']
+    return [{
+        'rule': 'contrast_text_exact',
+        'status': 'pass' if ratio >= threshold_text else ('warn' if ratio >= threshold_graphics else 'fail'),
+        'ratio': round(float(ratio), 2),
+        'min_by_kind': m.get('min_by_kind', {}),
+        'detail': f"{worst['kind']} {worst['text']!r}: {worst['color']} on {worst['background']}",
+        'threshold_text': threshold_text,
+        'threshold_graphics': threshold_graphics
+    }]
+
+@rule('chart_phash', inputs=('image',))
+def rule_chart_phash(t):
+    try:
+        from chart_pixels import phash
+        return [{'rule': 'chart_phash', 'value': f'{phash(t.image):016x}'}]
+    except Exception as e:
+        return [{
+            'rule': 'chart_phash',
+            'status': 'error',
+            'detail': f'phash failed: {e}'
+        }]
+
+@rule('palette_cvd', inputs=('image',), tasks=CATEGORICAL_TASKS)
+def rule_palette_cvd(t):
+    """Category colours must stay distinguishable under simulated colour-vision deficiencies."""
+    try:
+        from chart_pixels import cvd_min_delta_e, dominant_palette
+        palette = dominant_palette(t.image)
+        hexes = ['#%02x%02x%02x' % tuple(int(round(v)) for v in c) for c in palette]
+        if len(palette) < 2:
+            return [{
+                'rule': 'palette_cvd',
+                'status': 'info',
+                'detail': f'{len(palette)} mark colour(s); nothing to compare',
+                'palette': hexes
+            }]
+        views = cvd_min_delta_e(palette)
+        worst = min(views, key=lambda v: views[v][0])
+        de, i, j = views[worst]
+        return [{
+            'rule': 'palette_cvd',
+            'status': 'pass' if de >= 10.0 else 'warn',
+            'detail': f'min ΔE {de:.1f} ({worst}) between {hexes[i]} and {hexes[j]}',
+            'palette': hexes,
+            'min_delta_e': {v: round(views[v][0], 2) for v in views},
+            'threshold_delta_e': 10.0
+        }]
+    except Exception as e:
+        return [{
+            'rule': 'palette_cvd',
+            'status': 'error',
+            'detail': f'palette/cvd failed: {e}'
+        }]
+
+def perf_rule(name):
+    """Register one rule of the perf_* family: one entry per trial, warn with the first finding's
+    line/complexity/detail and all of them under `findings`, else pass."""
+    @rule(name, inputs=('ast',), version=3)
+    def check(t):
+        if t.ast is None:
+            return []
+        found = perf_findings(t)[name]
+        if not found:
+            return [{'rule': name, 'status': 'pass', 'detail': 'not detected'}]
+        line, complexity, detail = found[0]
+        return [{
+            'rule': name,
+            'status': 'warn',
+            'line': line,
+            'complexity': complexity,
+            'detail': detail + (f' (+{len(found) - 1} more)' if len(found) > 1 else ''),
+            'findings': [{'line': l, 'complexity': c, 'detail': d} for l, c, d in found]
+        }]
+    return check
+
+for _name in PERF_RULES:
+    perf_rule(_name)
+
+# --- engine ----------------------------------------------------------------
+
+def plan_trial(t: TrialInputs, rules, cache=None):
+    """Pair every applicable rule with its cached results (None when it must run)."""
+    plan = []
+    for r in rules:
+        if not r.applies_to(t.task):
+            continue
+        cached = cache.get(r.name, r.version, r.cache_key(t)) if cache else None
+        plan.append((r, cached))
+    return plan
+
+def needs_pixels(plan):
+    return any(cached is None and r.needs_pixels for r, cached in plan)
+
+def lint_trial(t: TrialInputs, rules, cache=None, plan=None, timings=False):
+    """Run the enabled rules on one trial (reusing cached results) and return the list of results.
+
+    With `timings`, every entry also carries the rule's wall time (`time_ms`, including
+    loading the inputs it was first to use, even if they were prefetched), the input
+    bytes it read and whether it came from the cache.
+    """
+    if plan is None:
+        plan = plan_trial(t, rules, cache)
+    results = []
+    for r, cached in plan:
+        t.reset_usage()
+        t0, load0 = time.perf_counter(), t.load_seconds
+        hit = cached is not None
+        if not hit:
+            cached = r.fn(t, **r.params)
+        secs = time.perf_counter() - t0 - (t.load_seconds - load0)
+        if cache and not hit:
+            cache.put(r.name, r.version, r.cache_key(t), cached)
+        if timings:
+            load_secs, nbytes = t.claim_costs()
+            secs += load_secs
+            cost = {'time_ms': round(secs * 1000, 3), 'bytes_read': nbytes, 'cached': hit}
+            cached = [dict(entry, **cost) for entry in cached]
+        results.extend(cached)
+    return results
+
+def timing_summary(records):
+    """Per-rule n / p50 / p95 / total ms over computed (non-cached) entries of trial records."""
+    by_rule = {}
+    for rec in records:
+        for entry in rec['lint']:
+            if 'time_ms' in entry and not entry.get('cached'):
+                by_rule.setdefault(entry['rule'], []).append(entry['time_ms'])
+    lines = [f"{'rule':<22}{'n':>6}{'p50_ms':>10}{'p95_ms':>10}{'total_ms':>12}"]
+    for name, ms in sorted(by_rule.items(), key=lambda kv: -sum(kv[1])):
+        ms.sort()
+        lines.append(f"{name:<22}{len(ms):>6}{percentile(ms, 50):>10.2f}{percentile(ms, 95):>10.2f}{sum(ms):>12.1f}")
+    return '\n'.join(lines)
+
+def missing_inputs(trial_dir: Path, rules, present=None):
+    """Required trial files the enabled rules read that do not exist (in `present`, the folder's
+    file names, when the caller already listed it)."""
+    needed = dict.fromkeys(f for r in rules for f in r.files if f not in OPTIONAL_FILES)
+    if present is not None:
+        return [f for f in needed if f not in present]
+    return [f for f in needed if not (trial_dir / f).exists()]
+
+def write_lint(trial_dir: Path, results, rules=None):
+    """Write lint.json and return what it now holds. When only some `rules` ran (--rules/--skip-rules),
+    their entries replace those of the same rules in the existing lint.json and the others are kept."""
+    path = trial_dir / 'lint.json'
+    ran = {r.name for r in rules} if rules is not None else set(RULES)
+    if not ran >= set(RULES):
+        old = load_json(path) if path.exists() else None
+        if isinstance(old, list):
+            by_rule = {}
+            for entry in old:
+                if entry.get('rule') not in ran:
+                    by_rule.setdefault(entry.get('rule'), []).append(entry)
+            for entry in results:
+                by_rule.setdefault(entry.get('rule'), []).append(entry)
+            order = list(RULES) + [name for name in by_rule if name not in RULES]
+            results = [entry for name in order for entry in by_rule.get(name, [])]
+    path.write_text(json.dumps(results, indent=2))
+    return results
+
+def find_trials(runs_dir: Path):
+    """Trials (crawl.Trial) under runs/<task>/<model>/<condition>/<sample>/ holding a code.py."""
+    return walk(runs_dir, require='code.py')
+
+def trial_record(trial_dir: Path, results, fields=None):
+    """Batch/--jsonl record of a trial; `fields` = (trial_id, task, model, condition, sample) if known."""
+    trial_id, task, model, condition, sample = fields or trial_fields(trial_dir)
+    return {
+        'trial_id': trial_id,
+        'trial_dir': str(trial_dir),
+        'task': task,
+        'model': model,
+        'condition': condition,
+        'sample': sample,
+        'lint': results,
+    }
+
+def _prefetch_image(t: TrialInputs):
+    try:
+        t.image
+    except Exception:
+        # the image rule tries again and records the error in lint.json
+        pass
+
+def _lint_chunk(chunk, rule_names, threads=4, cache_path=None, timings=False, pixels=None, config=None):
+    """Lint a chunk of trials, decoding the PNGs that image rules still need concurrently on threads."""
+    if config is not None:
+        configure(config)
+    rules = select_rules(rule_names)
+    cache = LintCache(cache_path) if cache_path else None
+    records = []
+    try:
+        trials = [TrialInputs(c.dir, pixels, c.task) for c in chunk]
+        plans = [plan_trial(t, rules, cache) for t in trials]
+        pending = [t for t, plan in zip(trials, plans) if needs_pixels(plan)]
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, threads)) as tp:
+                list(tp.map(_prefetch_image, pending))
+        for c, t, plan in zip(chunk, trials, plans):
+            try:
+                results = lint_trial(t, rules, cache, plan, timings)
+            finally:
+                t.close()
+            results = write_lint(t.trial_dir, results, rules)
+            records.append(trial_record(t.trial_dir, results,
+                                        (c.trial_id, c.task, c.model, c.condition, c.sample)))
+    finally:
+        if cache:
+            cache.close()
+    return records
+
+def _iter_chunks(chunks, rule_names, jobs, threads, cache_path, timings, pixels):
+    if jobs > 1 and len(chunks) > 1:
+        # workers re-apply the parent's rule params (they may have been started without them)
+        config = {r.name: r.params for r in RULES.values() if r.params}
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            n = len(chunks)
+            yield from pool.map(_lint_chunk, chunks, [rule_names] * n, [threads] * n,
+                                [cache_path] * n, [timings] * n, [pixels] * n, [config] * n)
+    else:
+        for chunk in chunks:
+            yield _lint_chunk(chunk, rule_names, threads, cache_path, timings, pixels)
+
+def lint_batch(runs_dir: Path, rules, jobs=1, threads=4, jsonl=None, cache_path=None, timings=False,
+               pixels=None):
+    """Lint every trial under `runs_dir` with a process pool of `jobs` workers."""
+    trials = []
+    for trial in find_trials(runs_dir):
+        missing = missing_inputs(trial.dir, rules, trial.files)
+        if missing:
+            print(f"[linter] Missing {', '.join(missing)} in {trial.path}", file=sys.stderr)
+        else:
+            trials.append(trial)
+    chunks = [trials[i:i + BATCH_CHUNK] for i in range(0, len(trials), BATCH_CHUNK)]
+    rule_names = [r.name for r in rules]
+
+    out = open(jsonl, 'w', encoding='utf-8') if jsonl else None
+    n = 0
+    timed = []
+    try:
+        for records in _iter_chunks(chunks, rule_names, jobs, threads, cache_path, timings, pixels):
+            for rec in records:
+                n += 1
+                if out:
+                    out.write(json.dumps(rec) + '\n')
+                if timings:
+                    timed.append(rec)
+    finally:
+        if out:
+            out.close()
+    if timings:
+        print(timing_summary(timed), file=sys.stderr)
+    print(f"[linter] Linted {n} trials under {runs_dir}", file=sys.stderr)
+    if jsonl:
+        print(f"[linter] Wrote {jsonl}", file=sys.stderr)
+    return n
+
+def split_names(value):
+    return [n.strip() for n in value.split(',') if n.strip()] if value else None
 
-    (trial_dir / 'lint.json').write_text(json.dumps(results, indent=2))
+def main():
+    ap = argparse.ArgumentParser(usage=USAGE)
+    ap.add_argument('trial_dir', nargs='?', help='Single trial folder to lint')
+    ap.add_argument('--batch', metavar='RUNS_DIR', help='Lint every trial under a runs/ tree')
+    ap.add_argument('--jobs', type=int, default=1, help='Worker processes for --batch')
+    ap.add_argument('--threads', type=int, default=4, help='PNG decoding threads per worker')
+    ap.add_argument('--jsonl', help='(batch) also write all results as JSON Lines to this file')
+    ap.add_argument('--cache', default=str(DEFAULT_CACHE), help='Per-rule result cache (SQLite file)')
+    ap.add_argument('--no-cache', action='store_true', help='Recompute every rule, ignoring the cache')
+    ap.add_argument('--pixel-cache', help='Decoded-plane cache directory (default: .cache/pixels)')
+    ap.add_argument('--no-pixel-cache', action='store_true', help='Decode chart.png with PIL every time')
+    ap.add_argument('--pixel-budget-mb', type=int, help='Disk budget of the pixel cache (default: 1024)')
+    ap.add_argument('--rules', help='Comma-separated rules to run (default: all)')
+    ap.add_argument('--skip-rules', help='Comma-separated rules to leave out')
+    ap.add_argument('--timings', action='store_true',
+                    help='Record time_ms/bytes_read per entry and print a per-rule summary')
+    ap.add_argument('--config', help='Rule parameters as JSON (default: lint_config.json in the repo root)')
+    args = ap.parse_args()
+    cache_path = None if args.no_cache else args.cache
+    try:
+        if args.config and not Path(args.config).exists():
+            raise ValueError(f"config not found: {args.config}")
+        configure(load_config(Path(args.config) if args.config else DEFAULT_CONFIG))
+    except ValueError as e:
+        print(f"[linter] {e}", file=sys.stderr)
+        sys.exit(2)
+
+    if bool(args.trial_dir) == bool(args.batch):
+        print(USAGE, file=sys.stderr)
+        sys.exit(2)
+    try:
+        rules = select_rules(split_names(args.rules), split_names(args.skip_rules))
+    except ValueError as e:
+        print(f"[linter] {e}", file=sys.stderr)
+        sys.exit(2)
+
+    pixels = None
+    if not args.no_pixel_cache and any(r.needs_pixels for r in rules):
+        from pixel_cache import DEFAULT_BUDGET_MB, DEFAULT_DIR, PixelCache
+        pixels = PixelCache(args.pixel_cache or DEFAULT_DIR, (args.pixel_budget_mb or DEFAULT_BUDGET_MB) << 20)
+
+    if args.batch:
+        lint_batch(Path(args.batch).resolve(), rules, jobs=args.jobs, threads=args.threads,
+                   jsonl=args.jsonl, cache_path=cache_path, timings=args.timings, pixels=pixels)
+        return
+
+    trial_dir = Path(args.trial_dir).resolve()
+    missing = missing_inputs(trial_dir, rules)
+    if missing:
+        print(f"[linter] Missing {', '.join(missing)} in {trial_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    cache = LintCache(cache_path) if cache_path else None
+    t = TrialInputs(trial_dir, pixels)
+    try:
+        results = lint_trial(t, rules, cache, timings=args.timings)
+    finally:
+        t.close()
+        if cache:
+            cache.close()
+    results = write_lint(trial_dir, results, rules)
     print(json.dumps(results, indent=2))
+    if args.timings:
+        print(timing_summary([trial_record(trial_dir, results)]), file=sys.stderr)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# metrics.py — The paper tables in reports/metrics/ from the lint results.
+#
+# Usage:
+#   python aggregate.py metrics [--db reports/results.sqlite] [--out reports/metrics] [--force]
+# or from a notebook:
+#   from metrics import compute_metrics, load_lint
+#   tables = compute_metrics(load_lint(sqlite3.connect('reports/results.sqlite')))
+#
+# Tables (results_eda.ipynb loads them from here and only draws the figures):
+#   violation_rate_by_model_condition_rule.csv — share of warn/fail results per (model, condition, rule),
+#                                                for the gate-like and auxiliary rules (KEEP_RULES)
+#   pass_rate_by_model_condition_rule.csv      — the same with pass_rate = 1 - violation_rate
+#   violation_heatmap_table.csv                — rule × (model, condition) violation rates
+#   prompt_gain_by_rule_model.csv              — violation rate per condition and the drops
+#                                                baseline -> standards and standards -> selfcheck
+#   prompt_gain_by_rule_mean.csv               — those drops averaged over models
+#   prompt_gain_selected_rules_mean.csv        — the same for SELECTED_RULES
+#   contrast_summary.csv                       — share of contrast_text ratios below 4.5 and 3.0
+#   violation_rate_by_task_rule.csv
+#   gate_like_pass_rate_by_model.csv           — rule × model pass rates of GATE_RULES
+#   top_violations_raw_counts.csv              — warn/fail counts per (task, model, condition, rule)
+#   top_violations_normalized.csv              — per rule, violations per 100 trials it ran on
+#   overall_selected_pass_by_model_condition.csv
+#
+# The lint rows are read once, with categorical keys. One groupby over (task,
+# model, condition, rule) counts results and violations; every rate is a sum of
+# that cube over coarser keys divided by its count (the same float as a mean of
+# 0/1 flags), and the rule × column tables are unstacks of it.
+#
+# With --bootstrap B, add_intervals() appends percentile bootstrap bounds
+# <rate>_ci_low / <rate>_ci_high after the columns above (for the gate-like
+# pivot, <model>_ci_low / <model>_ci_high). Per (model, condition, rule) cell the
+# lint results are resampled within the cell. Pooled rates are stratified, each
+# stratum keeping its size: task × rule rates by model, gate-like rates by
+# condition, top_violations_normalized (trials) by (model, condition) and the
+# overall rates by rule. For the gains, the (task, sample) pairs of a (model,
+# rule) are resampled with all three conditions at once, so each draw keeps the
+# pairing the gains are differences over; their means over models are means of
+# those. --cluster resamples whole tasks instead, and a rate over fewer than 2
+# tasks gets NaN bounds.
+# The heatmap repeats violation_rate_by_model_condition_rule and gets no bounds.
+#
+# The command is incremental: results.sqlite keeps a digest of the trials the
+# tables were last computed from, and nothing is rewritten while it is unchanged.
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bootstrap import DEFAULT_RESAMPLES, bootstrap_rates, percentile_interval
+
+METRICS_VERSION = 2
+
+GATE_RULES = {
+    'baseline_zero_bar': 'Bars baseline at zero (or justified)',
+    'dual_axes': 'No unjustified dual axes',
+}
+AUX_RULES = {
+    'labels_present': 'Title + X + Y labels present',
+    'legend_call': 'Legend present when needed',
+    'contrast_text': 'Text contrast >= threshold',
+}
+KEEP_RULES = list(GATE_RULES) + list(AUX_RULES)
+SELECTED_RULES = ['baseline_zero_bar', 'dual_axes', 'labels_present', 'legend_call', 'contrast_text']
+VIOL_STATUSES = ['warn', 'fail']
+CONDITIONS = ['baseline', 'standards', 'selfcheck']
+GAINS = ['gain_baseline_to_standards', 'gain_standards_to_selfcheck']
+KEYS = ['task', 'model', 'condition', 'rule']
+# tables written with their index (rule × column pivots)
+INDEXED = {'violation_heatmap_table', 'gate_like_pass_rate_by_model'}
+
+LINT_SQL = ('SELECT t.trial_id, t.task, t.model, t.condition, t.sample, r.name AS rule, l.status, l.ratio '
+            'FROM lint_results l JOIN trials t USING (trial_id) JOIN rules r USING (rule_id)')
+
+def load_lint(conn):
+    """Lint rows (trial_id, task, model, condition, sample, rule, status, ratio) from a results store connection."""
+    df = pd.read_sql_query(LINT_SQL, conn)
+    for col in KEYS + ['status']:
+        df[col] = df[col].astype('category')
+    return df
+
+def store_digest(conn):
+    """Digest of the trials in the store (their record digests) and of this module's version."""
+    h = hashlib.sha256(f'metrics v{METRICS_VERSION}\n'.encode())
+    for trial_id, source in conn.execute('SELECT trial_id, source FROM trials ORDER BY trial_id'):
+        h.update(f'{trial_id}\t{source}\n'.encode())
+    return h.hexdigest()
+
+def rates(cube, keys, rules=None):
+    """(n, violations) of the cube summed over `keys`, optionally for some rules only."""
+    if rules is not None:
+        cube = cube[cube['rule'].isin(rules)]
+    return cube.groupby(keys, observed=True)[['n', 'viol', 'counted']].sum()
+
+def lint_flags(lint: pd.DataFrame):
+    """The lint keys, trial_id and sample with 0/1 violation flags, one row per lint result."""
+    status = lint['status'].astype(object)
+    flags = pd.DataFrame({
+        'viol': status.str.lower().isin(VIOL_STATUSES).to_numpy(np.int64),    # the notebook's is_viol
+        'counted': status.isin(VIOL_STATUSES).to_numpy(np.int64),            # violations.csv
+    })
+    return pd.concat([lint[KEYS + ['trial_id', 'sample']].reset_index(drop=True), flags], axis=1)
+
+def compute_metrics(lint: pd.DataFrame):
+    """name -> table for every reports/metrics CSV."""
+    cube = (lint_flags(lint)
+              .groupby(KEYS, observed=True)
+              .agg(n=('viol', 'size'), viol=('viol', 'sum'), counted=('counted', 'sum'))
+              .reset_index())
+    tables = {}
+
+    mcr = rates(cube, ['model', 'condition', 'rule'], KEEP_RULES)
+    viol_rate = (mcr['viol'] / mcr['n']).rename('violation_rate').reset_index()
+    tables['violation_rate_by_model_condition_rule'] = viol_rate.sort_values(['rule', 'model', 'condition'])
+    tables['pass_rate_by_model_condition_rule'] = viol_rate.assign(pass_rate=1 - viol_rate['violation_rate'])
+    by_cell = viol_rate.set_index(['rule', 'model', 'condition'])['violation_rate']
+    tables['violation_heatmap_table'] = by_cell.unstack(['model', 'condition']).dropna(axis=1, how='all')
+
+    pg = by_cell.unstack('condition').dropna(axis=1, how='all')
+    pg.columns = pg.columns.astype(object)
+    for col in CONDITIONS:
+        if col not in pg.columns:
+            pg[col] = np.nan
+    pg['gain_baseline_to_standards'] = pg['baseline'] - pg['standards']   # positive = fewer violations
+    pg['gain_standards_to_selfcheck'] = pg['standards'] - pg['selfcheck']
+    pg = pg.reset_index()
+    tables['prompt_gain_by_rule_model'] = pg
+    tables['prompt_gain_by_rule_mean'] = (pg.groupby('rule', observed=True)[GAINS].mean()
+                                            .sort_values(GAINS[0], ascending=False).reset_index())
+
+    contrast = lint.loc[lint['rule'] == 'contrast_text', ['model', 'condition', 'ratio']]
+    ratio = pd.to_numeric(contrast['ratio'], errors='coerce')
+    contrast = contrast[ratio.notna()].assign(pct_below_4p5=ratio < 4.5, pct_below_3p0=ratio < 3.0)
+    tables['contrast_summary'] = (contrast.groupby(['model', 'condition'], observed=True)
+                                          .agg(pct_below_4p5=('pct_below_4p5', 'mean'),
+                                               pct_below_3p0=('pct_below_3p0', 'mean'),
+                                               n=('pct_below_4p5', 'size'))
+                                          .reset_index())
+
+    tr = rates(cube, ['task', 'rule'], KEEP_RULES)
+    tables['violation_rate_by_task_rule'] = (tr['viol'] / tr['n']).rename('violation_rate').reset_index()
+
+    gate = rates(cube, ['rule', 'model'], list(GATE_RULES))
+    tables['gate_like_pass_rate_by_model'] = ((gate['n'] - gate['viol']) / gate['n']).unstack('model')
+
+    raw = cube.loc[cube['counted'] > 0, KEYS + ['counted']].rename(columns={'counted': 'violations'})
+    tables['top_violations_raw_counts'] = raw
+    applicable = (lint[['rule', 'trial_id']].dropna().drop_duplicates()
+                  .groupby('rule', observed=True).size().rename('applicable_trials').reset_index())
+    norm = (raw.groupby('rule', observed=True)['violations'].sum().reset_index()
+               .merge(applicable, on='rule', how='left'))
+    norm['violations_per_100_trials'] = 100 * norm['violations'] / norm['applicable_trials'].clip(lower=1)
+    tables['top_violations_normalized'] = norm.sort_values('violations_per_100_trials', ascending=False)
+
+    sel = rates(cube, ['model', 'condition'], SELECTED_RULES)
+    tables['overall_selected_pass_by_model_condition'] = (
+        ((sel['n'] - sel['viol']) / sel['n']).rename('overall_pass_rate_on_selected_rules').reset_index())
+    tables['prompt_gain_selected_rules_mean'] = (pg[pg['rule'].isin(SELECTED_RULES)]
+                                                 .groupby('rule', observed=True)[GAINS].mean().reset_index()
+                                                 .sort_values(GAINS[0], ascending=False))
+    return tables
+
+def _units(rows, keys, values, strata=(), cluster=False):
+    """Bootstrap units for the rates of `values` per `keys`: (group index, successes, trials, group codes,
+    block codes). Rows are resampled within their (keys, strata) block; with cluster=True (unless task is
+    a key) whole tasks are, one unit per (keys, task) holding its totals."""
+    if cluster and 'task' not in keys:
+        rows = (rows.groupby(keys + ['task'], observed=True)
+                    .agg(trials=(values[0], 'size'), **{v: (v, 'sum') for v in values}).reset_index())
+        strata = ()
+    else:
+        rows = rows.assign(trials=1)
+    groups = rows.groupby(keys, observed=True)
+    block = rows.groupby(keys + list(strata), observed=True).ngroup().to_numpy()
+    return (groups.size().index, rows[values].to_numpy(np.float64), rows['trials'].to_numpy(),
+            groups.ngroup().to_numpy(), block)
+
+def _bounds(index, low, high, names):
+    """Columns <name>_ci_low / <name>_ci_high indexed like the groups."""
+    cols = {}
+    for j, name in enumerate(names):
+        cols[f'{name}_ci_low'] = low[:, j]
+        cols[f'{name}_ci_high'] = high[:, j]
+    return pd.DataFrame(cols, index=index)
+
+def add_intervals(tables, lint: pd.DataFrame, resamples=DEFAULT_RESAMPLES, confidence=0.95, cluster=False,
+                  seed=0, jobs=1):
+    """Append percentile bootstrap bounds (<rate>_ci_low, <rate>_ci_high) to the rate columns of the
+    compute_metrics() tables, in place. Pooled rates are resampled within their (model, condition) or
+    rule cells (stratified); cluster=True resamples whole tasks instead of lint results."""
+    flags = lint_flags(lint)
+
+    def draws(rows, keys, values, strata=()):
+        index, successes, trials, group, block = _units(rows, keys, values, strata, cluster)
+        d = bootstrap_rates(successes, trials, group, block, resamples, seed, jobs)
+        if cluster and 'task' not in keys:   # one unit per task: a single task cannot be resampled
+            d[:, np.bincount(group, minlength=len(index)) < 2] = np.nan
+        return index, d
+
+    def bounds(rows, keys, values, strata=(), names=None, complement=False):
+        index, d = draws(rows, keys, values, strata)
+        low, high = percentile_interval(d, confidence)
+        if complement:   # bounds of 1 - rate
+            low, high = 1 - high, 1 - low
+        return _bounds(index, low, high, names or values)
+
+    keep = flags[flags['rule'].isin(KEEP_RULES)]
+    mcr_keys = ['model', 'condition', 'rule']
+    index, mcr = draws(keep, mcr_keys, ['viol'])
+    low, high = percentile_interval(mcr, confidence)
+    viol_ci = _bounds(index, low, high, ['violation_rate'])
+    pass_ci = _bounds(index, 1 - high, 1 - low, ['pass_rate'])
+    for name, extra in (('violation_rate_by_model_condition_rule', [viol_ci]),
+                        ('pass_rate_by_model_condition_rule', [viol_ci, pass_ci])):
+        tables[name] = tables[name].join(pd.concat(extra, axis=1), on=mcr_keys)
+
+    # gains: one unit per (task, sample) of a (rule, model) cell (per task with cluster) holding the
+    # totals of each condition, so the conditions of a draw come from the same tasks and samples
+    pg = tables['prompt_gain_by_rule_model']
+    pair = ['task'] if cluster else ['task', 'sample']
+    paired = (keep.groupby(['rule', 'model'] + pair + ['condition'], observed=True)['viol']
+                  .agg(['sum', 'size']).unstack('condition'))
+    paired.columns = paired.columns.set_levels(paired.columns.levels[1].astype(object), level=1)
+    successes = paired['sum'].reindex(columns=CONDITIONS).fillna(0).to_numpy(np.float64)
+    trials = paired['size'].reindex(columns=CONDITIONS).fillna(0).to_numpy(np.float64)
+    cells = paired.groupby(level=['rule', 'model'], observed=True)
+    group = cells.ngroup().to_numpy()
+    cell_keys = cells.size().index
+    d = bootstrap_rates(successes, trials, group, None, resamples, seed, jobs)
+    if cluster:
+        clusters = np.stack([np.bincount(group, weights=trials[:, j] > 0, minlength=len(cell_keys)) for j in range(len(CONDITIONS))], axis=1)
+        d[:, clusters < 2] = np.nan
+    cell = {key: i for i, key in enumerate(cell_keys)}
+    rows = [cell[key] for key in zip(pg['rule'], pg['model'])]
+    gain_draws = np.stack([d[:, rows, 0] - d[:, rows, 1], d[:, rows, 1] - d[:, rows, 2]], axis=2)
+    low, high = percentile_interval(gain_draws, confidence)
+    tables['prompt_gain_by_rule_model'] = pg.join(_bounds(pg.index, low, high, GAINS))
+    rules = list(dict.fromkeys(pg['rule']))
+    mean_draws = np.full((len(gain_draws), len(rules), len(GAINS)), np.nan)
+    for i, rule in enumerate(rules):
+        for j, gain in enumerate(GAINS):
+            valid = ((pg['rule'] == rule) & pg[gain].notna()).to_numpy()
+            if valid.any():
+                mean_draws[:, i, j] = gain_draws[:, valid, j].mean(axis=1)
+    low, high = percentile_interval(mean_draws, confidence)
+    mean_ci = _bounds(pd.Index(rules, name='rule'), low, high, GAINS)
+    for name in ('prompt_gain_by_rule_mean', 'prompt_gain_selected_rules_mean'):
+        tables[name] = tables[name].join(mean_ci, on='rule')
+
+    contrast = lint.loc[lint['rule'] == 'contrast_text', ['task', 'model', 'condition', 'ratio']]
+    ratio = pd.to_numeric(contrast['ratio'], errors='coerce')
+    contrast = contrast[ratio.notna()].assign(pct_below_4p5=(ratio < 4.5).astype(np.int64),
+                                              pct_below_3p0=(ratio < 3.0).astype(np.int64))
+    tables['contrast_summary'] = tables['contrast_summary'].join(
+        bounds(contrast, ['model', 'condition'], ['pct_below_4p5', 'pct_below_3p0']), on=['model', 'condition'])
+
+    tables['violation_rate_by_task_rule'] = tables['violation_rate_by_task_rule'].join(
+        bounds(keep, ['task', 'rule'], ['viol'], ['model'], ['violation_rate']), on=['task', 'rule'])
+
+    gate = bounds(flags[flags['rule'].isin(list(GATE_RULES))], ['rule', 'model'], ['viol'], ['condition'],
+                  ['pass_rate'], complement=True)
+    table = tables['gate_like_pass_rate_by_model']
+    table.columns = table.columns.astype(object)
+    tables['gate_like_pass_rate_by_model'] = pd.concat(
+        [table] + [gate[f'pass_rate_{b}'].unstack('model').rename(columns=lambda m, b=b: f'{m}_{b}')
+                   for b in ('ci_low', 'ci_high')], axis=1)
+
+    trials = (flags.dropna(subset=['trial_id'])
+                   .groupby(['rule', 'trial_id', 'task', 'model', 'condition'], observed=True)['counted'].sum()
+                   .reset_index())
+    index, d = draws(trials, ['rule'], ['counted'], ['model', 'condition'])
+    low, high = percentile_interval(100 * d, confidence)
+    tables['top_violations_normalized'] = tables['top_violations_normalized'].join(
+        _bounds(index, low, high, ['violations_per_100_trials']), on='rule')
+
+    sel = flags[flags['rule'].isin(SELECTED_RULES)]
+    tables['overall_selected_pass_by_model_condition'] = tables['overall_selected_pass_by_model_condition'].join(
+        bounds(sel, ['model', 'condition'], ['viol'], ['rule'], ['overall_pass_rate_on_selected_rules'],
+               complement=True), on=['model', 'condition'])
+    return tables
+
+def write_metrics(tables, out_dir: Path):
+    """Write every table as <name>.csv; returns the paths."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for name, table in sorted(tables.items()):
+        path = out_dir/f'{name}.csv'
+        table.to_csv(path, index=name in INDEXED)
+        written.append(path)
+    return written
+
+def metrics_files(out_dir: Path):
+    return [out_dir/f'{name}.csv' for name in (
+        'violation_rate_by_model_condition_rule', 'pass_rate_by_model_condition_rule', 'violation_heatmap_table',
+        'prompt_gain_by_rule_model', 'prompt_gain_by_rule_mean', 'contrast_summary', 'violation_rate_by_task_rule',
+        'gate_like_pass_rate_by_model', 'top_violations_raw_counts', 'top_violations_normalized',
+        'overall_selected_pass_by_model_condition', 'prompt_gain_selected_rules_mean')]
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# phash_index.py — BK-tree index over chart perceptual hashes (near-duplicate charts).
+#
+# Usage:
+#   python phash_index.py build [--lint-summary reports/lint_summary.csv] [--out reports] [-k 4]
+#   python phash_index.py near <trial_id | 16-hex-digit hash> [-k 6] [--index reports/phash_bktree.json]
+#
+# `build` reads the `chart_phash` values that linter.py records (via aggregate.py's
+# lint_summary.csv) and writes:
+#   reports/phash_bktree.json           — the BK-tree (Hamming metric), reloaded by `near`
+#   reports/phash_duplicates.csv        — clusters of charts within Hamming distance k
+#   reports/phash_condition_distance.csv — per (task, model, sample): distance from the
+#                                          baseline chart to the standards/selfcheck charts
+#
+# A BK-tree only descends into children whose edge distance d satisfies
+# |d - d(query, node)| <= k, so "all charts within k bits" visits a small part
+# of the tree instead of every hash.
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+CONDITIONS = ('baseline', 'standards', 'selfcheck')
+
+def hamming(a: int, b: int):
+    return bin(a ^ b).count('1')
+
+class BKTree:
+    """Node = [hash, [trial_ids], {distance: child node}]."""
+
+    def __init__(self, root=None):
+        self.root = root
+
+    def add(self, h: int, trial_id: str):
+        if self.root is None:
+            self.root = [h, [trial_id], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].append(trial_id)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [trial_id], {}]
+                return
+            node = child
+
+    def query(self, h: int, k: int):
+        """[(distance, hash, trial_ids)] for every stored hash within Hamming distance k."""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= k:
+                found.append((d, node[0], node[1]))
+            for edge, child in node[2].items():
+                if d - k <= edge <= d + k:
+                    stack.append(child)
+        return sorted(found)
+
+    def to_json(self):
+        def enc(node):
+            return [f'{node[0]:016x}', node[1], {str(d): enc(c) for d, c in node[2].items()}]
+        return enc(self.root) if self.root is not None else None
+
+    @classmethod
+    def from_json(cls, data):
+        def dec(node):
+            return [int(node[0], 16), node[1], {int(d): dec(c) for d, c in node[2].items()}]
+        return cls(dec(data) if data is not None else None)
+
+def load_hashes(lint_summary: Path):
+    """trial_id -> (task, model, condition, sample, hash) from chart_phash rows."""
+    out = {}
+    with lint_summary.open(newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row.get('rule') == 'chart_phash' and row.get('value'):
+                out[row['trial_id']] = (row['task'], row['model'], row['condition'], row['sample'],
+                                        int(row['value'], 16))
+    return out
+
+def clusters(tree: BKTree, hashes, k: int):
+    """Connected components of charts linked by Hamming distance <= k (union-find)."""
+    parent = {tid: tid for tid in hashes}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for tid, (*_, h) in hashes.items():
+        for _, _, ids in tree.query(h, k):
+            for other in ids:
+                parent[find(other)] = find(tid)
+    groups = {}
+    for tid in hashes:
+        groups.setdefault(find(tid), []).append(tid)
+    return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=lambda g: (-len(g), g[0]))
+
+def build(args):
+    hashes = load_hashes(Path(args.lint_summary))
+    if not hashes:
+        print(f"[phash] No chart_phash values in {args.lint_summary}; run linter.py and aggregate.py first",
+              file=sys.stderr)
+        sys.exit(1)
+    tree = BKTree()
+    for tid in sorted(hashes):
+        tree.add(hashes[tid][-1], tid)
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    index_path = out_dir/'phash_bktree.json'
+    index_path.write_text(json.dumps({
+        'hashes': {tid: f'{v[-1]:016x}' for tid, v in sorted(hashes.items())},
+        'tree': tree.to_json(),
+    }))
+
+    dup_csv = out_dir/'phash_duplicates.csv'
+    with dup_csv.open('w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['cluster', 'trial_id', 'task', 'model', 'condition', 'sample', 'phash'])
+        for i, group in enumerate(clusters(tree, hashes, args.k), start=1):
+            for tid in group:
+                task, model, condition, sample, h = hashes[tid]
+                w.writerow([i, tid, task, model, condition, sample, f'{h:016x}'])
+
+    by_cell = {}
+    for task, model, condition, sample, h in hashes.values():
+        by_cell.setdefault((task, model, sample), {})[condition] = h
+    dist_csv = out_dir/'phash_condition_distance.csv'
+    with dist_csv.open('w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['task', 'model', 'sample', 'baseline_to_standards', 'baseline_to_selfcheck',
+                    'standards_to_selfcheck'])
+        for (task, model, sample), hs in sorted(by_cell.items()):
+            def dist(a, b):
+                return hamming(hs[a], hs[b]) if a in hs and b in hs else ''
+            w.writerow([task, model, sample, dist('baseline', 'standards'), dist('baseline', 'selfcheck'),
+                        dist('standards', 'selfcheck')])
+
+    print(f'[phash] Wrote {index_path}')
+    print(f'[phash] Wrote {dup_csv}')
+    print(f'[phash] Wrote {dist_csv}')
+
+def near(args):
+    data = json.loads(Path(args.index).read_text())
+    tree = BKTree.from_json(data['tree'])
+    target = data['hashes'].get(args.target, args.target)
+    try:
+        h = int(target, 16)
+    except ValueError:
+        print(f"[phash] {args.target!r} is neither an indexed trial_id nor a hex hash", file=sys.stderr)
+        sys.exit(1)
+    for d, node_hash, ids in tree.query(h, args.k):
+        for tid in ids:
+            print(f'{d:>2}  {node_hash:016x}  {tid}')
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('build', help='Build the index and the duplicate/condition reports')
+    b.add_argument('--lint-summary', default='reports/lint_summary.csv')
+    b.add_argument('--out', default='reports')
+    b.add_argument('-k', type=int, default=4, help='Hamming distance for duplicate clusters')
+    n = sub.add_parser('near', help='List indexed charts within Hamming distance k')
+    n.add_argument('target', help='trial_id or 16-hex-digit phash')
+    n.add_argument('-k', type=int, default=6)
+    n.add_argument('--index', default='reports/phash_bktree.json')
+    args = ap.parse_args()
+    build(args) if args.cmd == 'build' else near(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# pixel_cache.py — Decoded chart.png planes on disk, shared by every image consumer.
+#
+# Usage:
+#   python pixel_cache.py stats [--dir .cache/pixels]
+#   python pixel_cache.py prune [--dir .cache/pixels] [--budget-mb 1024]
+#
+# From code (linter image rules, notebooks, report scripts):
+#   from pixel_cache import PixelCache
+#   planes = PixelCache().get(Path('runs/.../chart.png'), image_sha256)
+#   planes.rgb   # uint8 (h, w, 3), np.load(mmap_mode='r') — zero-copy, read-only
+#   planes.lum   # uint32 (h, w) relative luminance * chart_pixels.LUM_SCALE
+#
+# Entries are keyed by the PNG's SHA-256 (run.json's image_sha256), so re-rendered
+# charts get new entries and identical charts share one. The first request for a
+# chart decodes it band by band straight into the .npy files; later requests only
+# map them. Total size is kept under a disk budget by evicting the least recently
+# used entries (a hit touches the entry's mtime).
+import argparse
+import os
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from chart_pixels import Planes, iter_rgb_tiles, luminance_keys, open_image
+from runner import sha256
+
+DEFAULT_DIR = Path(__file__).resolve().parent.parent / '.cache' / 'pixels'
+DEFAULT_BUDGET_MB = 1024
+
+class PixelCache:
+    def __init__(self, root=DEFAULT_DIR, budget_bytes=DEFAULT_BUDGET_MB << 20):
+        self.root = Path(root)
+        self.budget_bytes = budget_bytes
+
+    def paths(self, key: str):
+        return self.root / f'{key}.rgb.npy', self.root / f'{key}.lum.npy'
+
+    def get(self, img_path: Path, key=None):
+        """Planes of a chart, memory-mapped; decoded and stored first if not cached yet."""
+        key = key or sha256(img_path)
+        rgb_path, lum_path = self.paths(key)
+        try:
+            planes = Planes(np.load(rgb_path, mmap_mode='r'), np.load(lum_path, mmap_mode='r'))
+            os.utime(rgb_path)
+            return planes
+        except (OSError, ValueError):
+            pass
+        self.put(img_path, key)
+        self.evict(keep=key)
+        return Planes(np.load(rgb_path, mmap_mode='r'), np.load(lum_path, mmap_mode='r'))
+
+    def put(self, img_path: Path, key: str):
+        """Decode a PNG band by band into the two .npy files (published atomically)."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tag = f'{os.getpid()}.{threading.get_ident()}'
+        with open_image(img_path) as im:
+            shape = (im.height, im.width)
+            finals = self.paths(key)
+            tmps = [p.with_name(f'{p.name}.{tag}.tmp') for p in finals]
+            rgb = np.lib.format.open_memmap(tmps[0], mode='w+', dtype=np.uint8, shape=shape + (3,))
+            lum = np.lib.format.open_memmap(tmps[1], mode='w+', dtype=np.uint32, shape=shape)
+            for y0, tile in iter_rgb_tiles(im):
+                rgb[y0:y0 + len(tile)] = tile
+                lum[y0:y0 + len(tile)] = luminance_keys(tile)
+            rgb.flush()
+            lum.flush()
+            del rgb, lum
+        # lum first: a reader that finds the rgb file finds both
+        os.replace(tmps[1], finals[1])
+        os.replace(tmps[0], finals[0])
+
+    def entries(self):
+        """[(mtime, bytes, key)] of complete entries, least recently used first."""
+        out = []
+        for e in os.scandir(self.root) if self.root.is_dir() else []:
+            if e.name.endswith('.rgb.npy'):
+                key = e.name[:-len('.rgb.npy')]
+                try:
+                    st = e.stat()
+                    size = st.st_size + self.paths(key)[1].stat().st_size
+                except OSError:
+                    continue
+                out.append((st.st_mtime, size, key))
+        return sorted(out)
+
+    def evict(self, keep=None):
+        """Drop least recently used entries until the cache fits its budget; returns bytes freed."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, key in entries:
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            for p in self.paths(key):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass   # still mapped on a platform that forbids it; try again next time
+            total -= size
+            freed += size
+        return freed
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('cmd', choices=['stats', 'prune'])
+    ap.add_argument('--dir', default=str(DEFAULT_DIR))
+    ap.add_argument('--budget-mb', type=int, default=DEFAULT_BUDGET_MB)
+    args = ap.parse_args()
+    cache = PixelCache(args.dir, args.budget_mb << 20)
+    if args.cmd == 'prune':
+        freed = cache.evict()
+        print(f'[pixel_cache] Freed {freed / 2**20:.1f} MB', file=sys.stderr)
+    entries = cache.entries()
+    total = sum(size for _, size, _ in entries)
+    print(f'[pixel_cache] {len(entries)} charts, {total / 2**20:.1f} MB of {args.budget_mb} MB in {cache.root}',
+          file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
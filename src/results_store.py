@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# results_store.py — reports/results.sqlite: trials, lint results and human ratings in one indexed file.
+#
+# Tables:
+#   trials       — one row per trial_id: the runs.csv columns, plus `source`, a
+#                  digest of the record it was written from (upserts skip unchanged trials)
+#   rules        — rule_id <-> rule name
+#   lint_results — one row per lint.json entry: (trial_id, seq) with rule_id, status,
+#                  value, detail, ratio, line, complexity, and the whole entry as JSON
+#   ratings      — human rubric verdicts (one row per rater, task, model, condition,
+#                  rubric item), keys normalized with rubric_keys.py; reloaded when a
+#                  rubric file changes (file hashes in `meta`)
+# Indexes: trials (task, model, condition), lint_results (rule_id, status) and
+# (trial_id); ratings (task, model, condition, rubric).
+#
+# aggregate.py keeps it in sync and exports the CSVs from it; watch.py upserts
+# each trial it re-runs. WAL mode lets readers query while a writer updates it.
+import csv
+import hashlib
+import json
+import sqlite3
+from itertools import islice
+from pathlib import Path
+
+from rubric_keys import COLUMNS, MODEL_ALIASES, TASK_ALIASES, norm_key
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS trials (
+    trial_id     TEXT PRIMARY KEY,
+    task         TEXT,
+    model        TEXT,
+    condition    TEXT,
+    sample       TEXT,
+    timestamp    TEXT,
+    duration_sec,
+    returncode,
+    code_sha256  TEXT,
+    image_exists,
+    image_sha256 TEXT,
+    image_w,
+    image_h,
+    source       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rules (
+    rule_id INTEGER PRIMARY KEY,
+    name    TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS lint_results (
+    trial_id   TEXT NOT NULL REFERENCES trials(trial_id) ON DELETE CASCADE,
+    seq        INTEGER NOT NULL,
+    rule_id    INTEGER NOT NULL REFERENCES rules(rule_id),
+    status     TEXT,
+    value,
+    detail     TEXT,
+    ratio,
+    line,
+    complexity TEXT,
+    entry      TEXT NOT NULL,
+    PRIMARY KEY (trial_id, seq)
+);
+CREATE TABLE IF NOT EXISTS ratings (
+    source    TEXT NOT NULL,
+    rater     TEXT,
+    task      TEXT,
+    model     TEXT,
+    condition TEXT,
+    rubric    TEXT NOT NULL,
+    answer    TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trials_task_model_condition ON trials (task, model, condition);
+CREATE INDEX IF NOT EXISTS lint_results_rule_status ON lint_results (rule_id, status);
+CREATE INDEX IF NOT EXISTS lint_results_trial ON lint_results (trial_id);
+CREATE INDEX IF NOT EXISTS ratings_key ON ratings (task, model, condition, rubric);
+'''
+
+RUN_COLUMNS = ['trial_id', 'task', 'model', 'condition', 'sample', 'timestamp', 'duration_sec', 'returncode',
+               'code_sha256', 'image_exists', 'image_sha256', 'image_w', 'image_h']
+LINT_COLUMNS = ['status', 'value', 'detail', 'ratio', 'line', 'complexity']
+SYNC_BATCH = 500
+QUERY_COLUMNS = ['trial_id', 'task', 'model', 'condition', 'sample', 'rule', 'status', 'value', 'detail', 'ratio',
+                 'line', 'complexity']
+
+def record_digest(rec):
+    return hashlib.sha1(json.dumps(rec, sort_keys=True, default=str).encode()).hexdigest()
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=60)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def _rule_ids(self, names):
+        self.conn.executemany('INSERT OR IGNORE INTO rules (name) VALUES (?)', [(n,) for n in set(names)])
+        return dict(self.conn.execute('SELECT name, rule_id FROM rules').fetchall())
+
+    def sync(self, trials, prune=True):
+        """Upsert the records in `trials` (trial_id -> collect_trial() record, or any iterable of records)
+        whose content changed; with prune, delete trials not among them. Returns (upserted, deleted).
+
+        Records are taken SYNC_BATCH at a time and the trial_ids seen go to a temporary table,
+        so an iterator of records is never held in memory. One transaction."""
+        records = iter(trials.values() if isinstance(trials, dict) else trials)
+        upserted = deleted = 0
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS seen (trial_id TEXT PRIMARY KEY)')
+            self.conn.execute('DELETE FROM seen')
+            while True:
+                batch = list(islice(records, SYNC_BATCH))
+                if not batch:
+                    break
+                upserted += self._upsert(batch)
+            if prune:
+                deleted = self.conn.execute(
+                    'DELETE FROM trials WHERE trial_id NOT IN (SELECT trial_id FROM seen)').rowcount
+        return upserted, deleted
+
+    def _upsert(self, batch):
+        ids = [rec['trial_id'] for rec in batch]
+        self.conn.executemany('INSERT OR IGNORE INTO seen (trial_id) VALUES (?)', [(t,) for t in ids])
+        known = dict(self.conn.execute(
+            f"SELECT trial_id, source FROM trials WHERE trial_id IN ({', '.join('?' * len(ids))})", ids))
+        changed = []
+        for rec in batch:
+            digest = record_digest(rec)
+            if known.get(rec['trial_id']) != digest:
+                changed.append((rec, digest))
+        ids = self._rule_ids(item.get('rule', '') for rec, _ in changed for item in rec['lint'])
+        self.conn.executemany('DELETE FROM lint_results WHERE trial_id=?', [(rec['trial_id'],) for rec, _ in changed])
+        self.conn.executemany(
+            f"INSERT INTO trials ({', '.join(RUN_COLUMNS)}, source) VALUES ({', '.join('?' * (len(RUN_COLUMNS) + 1))}) "
+            f"ON CONFLICT (trial_id) DO UPDATE SET "
+            + ', '.join(f'{c}=excluded.{c}' for c in RUN_COLUMNS[1:] + ['source']),
+            [[rec['run'][c] for c in RUN_COLUMNS] + [digest] for rec, digest in changed])
+        self.conn.executemany(
+            f"INSERT INTO lint_results (trial_id, seq, rule_id, {', '.join(LINT_COLUMNS)}, entry) "
+            f"VALUES ({', '.join('?' * (len(LINT_COLUMNS) + 4))})",
+            [[rec['trial_id'], seq, ids[item.get('rule', '')]] + [_scalar(item.get(c)) for c in LINT_COLUMNS]
+             + [json.dumps(item)]
+             for rec, _ in changed for seq, item in enumerate(rec['lint'])])
+        return len(changed)
+
+    def iter_records(self):
+        """Records (as collect_trial() returns them) in trial_id order, one at a time: the trials and
+        their lint results are read by two cursors walked in step."""
+        lint = self.conn.execute('SELECT trial_id, entry FROM lint_results ORDER BY trial_id, seq')
+        pending = next(lint, None)
+        for row in self.conn.execute(f"SELECT {', '.join(RUN_COLUMNS)} FROM trials ORDER BY trial_id"):
+            run = dict(zip(RUN_COLUMNS, row))
+            if run['image_exists'] is not None and run['image_exists'] != '':
+                run['image_exists'] = bool(run['image_exists'])
+            rec = {k: run[k] for k in ('trial_id', 'task', 'model', 'condition', 'sample')}
+            rec.update(run=run, lint=[])
+            while pending is not None and pending[0] == rec['trial_id']:
+                rec['lint'].append(json.loads(pending[1]))
+                pending = next(lint, None)
+            yield rec
+
+    def records(self):
+        """trial_id -> record (as collect_trial() returns it), in trial_id order."""
+        return {rec['trial_id']: rec for rec in self.iter_records()}
+
+    def sync_ratings(self, paths):
+        """Reload the ratings of rubric files whose content changed since the last load, and drop
+        those of files no longer among `paths`."""
+        from runner import sha256
+        paths = [Path(p) for p in paths]
+        stale = []
+        for p in paths:
+            digest = sha256(p) if p.exists() else ''
+            if (self.meta(f'ratings:{p.name}') or '') != digest:
+                stale.append((p, digest))
+        names = {p.name for p in paths}
+        dropped = [s for (s,) in self.conn.execute('SELECT DISTINCT source FROM ratings') if s not in names]
+        if not stale and not dropped:
+            return 0
+        n = 0
+        with self.conn:
+            for source in dropped:
+                self.conn.execute('DELETE FROM ratings WHERE source=?', (source,))
+                self.conn.execute('DELETE FROM meta WHERE key=?', (f'ratings:{source}',))
+            for p, digest in stale:
+                self.conn.execute('DELETE FROM ratings WHERE source=?', (p.name,))
+                rows = []
+                if p.exists():
+                    with p.open(newline='', encoding='utf-8') as f:
+                        for r in csv.DictReader(f):
+                            r = {COLUMNS.get(k, k): v for k, v in r.items()}
+                            rows.append((p.name, r.get('rater'), TASK_ALIASES.get(norm_key(r.get('task'))),
+                                         MODEL_ALIASES.get(norm_key(r.get('model'))), norm_key(r.get('condition')),
+                                         r.get('rubric', ''), (r.get('answer') or '').strip().casefold() or None))
+                self.conn.executemany('INSERT INTO ratings VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+                self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                                  (f'ratings:{p.name}', digest))
+                n += len(rows)
+        return n
+
+    def meta(self, key):
+        row = self.conn.execute('SELECT value FROM meta WHERE key=?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def query(self, task=None, model=None, condition=None, sample=None, rule=None, status=None, trial_id=None,
+              limit=None):
+        """Lint results joined with their trial, filtered on any of the keys (each a value or a list)."""
+        where, args = [], []
+        for col, val in [('t.task', task), ('t.model', model), ('t.condition', condition), ('t.sample', sample),
+                         ('r.name', rule), ('l.status', status), ('t.trial_id', trial_id)]:
+            if val:
+                vals = [val] if isinstance(val, str) else list(val)
+                where.append(f"{col} IN ({', '.join('?' * len(vals))})")
+                args.extend(vals)
+        sql = ('SELECT t.trial_id, t.task, t.model, t.condition, t.sample, r.name, l.status, l.value, l.detail, '
+               'l.ratio, l.line, l.complexity FROM lint_results l JOIN trials t USING (trial_id) '
+               'JOIN rules r USING (rule_id)')
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY t.trial_id, l.seq'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        return self.conn.execute(sql, args).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+def _scalar(v):
+    """SQLite-storable form of a lint entry field (lists/dicts as JSON)."""
+    return json.dumps(v) if isinstance(v, (list, dict)) else v
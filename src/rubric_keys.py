@@ -0,0 +1,34 @@
+# rubric_keys.py — Where the human rubric files are and how their keys map onto ours.
+#
+# The rubric exports name tasks, models and columns their own way ('small multi',
+# 'ChatGPT 5 Thinking', 'prompt_style'). Both the results store (ratings table)
+# and agreement.py normalize them with these tables, so the two always agree.
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+GOLD_FILES = ['reports/LLM_Plotting_Rubric.csv', 'rating/clean_llm_rubric.csv']   # relative to ROOT
+DEFAULT_GOLD = [ROOT / f for f in GOLD_FILES]
+
+TASK_ALIASES = {
+    'bars': 't01_bars',
+    'linegaps': 't02_line_gaps',
+    'scattergroup': 't03_scatter_group',
+    'heatmap': 't04_heatmap_corr', 'heatmapcorr': 't04_heatmap_corr',
+    'smallmulti': 't05_small_multiples', 'smallmultiples': 't05_small_multiples',
+    'dualaxis': 't06_dual_axis',
+    'histogram': 't07_histogram',
+    'stackedbars': 't08_stacked_bars',
+}
+TASK_ALIASES.update({t.replace('_', ''): t for t in set(TASK_ALIASES.values())})   # 't01_bars' itself
+MODEL_ALIASES = {
+    'chatgpt': 'gpt5thinking', 'chatgpt5thinking': 'gpt5thinking', 'gpt5thinking': 'gpt5thinking',
+    'gemini': 'gemini25pro', 'gemini25pro': 'gemini25pro',
+    'grok': 'grok',
+}
+# column names used by the rubric exports -> ours
+COLUMNS = {'graph_type': 'task', 'prompt_type': 'condition', 'prompt_style': 'condition',
+           'verdict': 'answer', 'score': 'answer'}
+
+def norm_key(s):
+    """casefolded, without anything but ASCII letters and digits ('Small multi' -> 'smallmulti')."""
+    return ''.join(ch for ch in (s or '').casefold() if ch.isascii() and ch.isalnum())
@@ -3,6 +3,10 @@
 #
 # Usage:
 #   python runner.py <trial_folder>
+#   python runner.py --batch <runs_dir> [--jobs N]
+#
+# --batch runs every runs/<task>/<model>/<condition>/<sample>/ folder holding a
+# code.py (found by crawl.py), --jobs trials at a time, and prints one line per trial.
 #
 # Trial folder layout (created by your SOP/script):
 #   <trial_folder>/
@@ -12,26 +16,41 @@
 #     stdout.txt   # (produced) captured stdout
 #     stderr.txt   # (produced) captured stderr
 #     run.json     # (produced) metadata: hashes, duration, return code, etc.
+#     figure.json  # (produced, if code saves chart.png via matplotlib) exact text contrast
+#
+# When the run fails (non-zero return code or no chart.png), run.json also gets
+# `failure`: the category, exception and offending name found by failures.py in
+# the stderr tail.
 #
 # What this does:
-#   - Runs code.py in a clean subprocess with MPL 'Agg' backend (no GUI).
+#   - Runs code.py in a clean subprocess with MPL 'Agg' backend (no GUI), through
+#     runner_child.py, which records the drawn text artists when chart.png is saved.
 #   - Enforces a 60s timeout.
 #   - Captures stdout/stderr and saves them alongside artifacts.
 #   - Computes SHA-256 hashes for code.py and chart.png (if produced).
 #   - Writes a structured run.json so downstream scripts can aggregate results.
 #
 # Notes:
-#   - We do NOT modify or import your code in-process (safer isolation).
+#   - We do NOT modify or import your code in-process (safer isolation); the child
+#     only wraps Figure.savefig and never changes what it writes.
 #   - We rely on your prompts to save to 'chart.png' (dpi=150, bbox_inches='tight').
 #   - If the model calls plt.show(), MPLBACKEND=Agg prevents GUI issues.
+import argparse
 import json
 import os
+import struct
 import sys
 import time
 import hashlib
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from crawl import trial_fields, walk
+from failures import TAIL_BYTES, describe
+
+CHILD = Path(__file__).resolve().parent / 'runner_child.py'
+
 def sha256(p: Path):
     if not p.exists():
         return None
@@ -41,34 +60,29 @@ def sha256(p: Path):
             h.update(chunk)
     return h.hexdigest()
 
-def main():
-    if len(sys.argv) != 2:
-        print(__doc__)
-        sys.exit(2)
-    trial_dir = Path(sys.argv[1]).resolve()
-    if not trial_dir.exists():
-        print(f"[runner] Trial folder not found: {trial_dir}", file=sys.stderr)
-        sys.exit(1)
+def png_size(p: Path):
+    """(width, height) from a PNG's IHDR chunk (first 24 bytes), or None if not a PNG."""
+    with p.open('rb') as f:
+        head = f.read(24)
+    if len(head) < 24 or head[:8] != b'\x89PNG\r\n\x1a\n' or head[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', head[16:24])
 
+def run_trial(trial_dir: Path, trial_id=None):
+    """Execute the trial's code.py and write its artifacts; returns the run.json metadata."""
     code = trial_dir/'code.py'
-    data = trial_dir/'data.csv'
     img  = trial_dir/'chart.png'
     stdout_file = trial_dir/'stdout.txt'
     stderr_file = trial_dir/'stderr.txt'
     run_meta = trial_dir/'run.json'
-
-    if not code.exists():
-        print(f"[runner] Missing code.py in {trial_dir}", file=sys.stderr)
-        sys.exit(1)
-    if not data.exists():
-        print(f"[runner] Missing data.csv in {trial_dir}", file=sys.stderr)
-        sys.exit(1)
+    manifest = trial_dir/'figure.json'
 
     # Remove previous outputs to avoid stale artifacts
     if img.exists(): img.unlink()
     if stdout_file.exists(): stdout_file.unlink()
     if stderr_file.exists(): stderr_file.unlink()
     if run_meta.exists(): run_meta.unlink()
+    if manifest.exists(): manifest.unlink()
 
     env = os.environ.copy()
     env['MPLBACKEND'] = 'Agg'  # headless backend for matplotlib
@@ -76,7 +90,7 @@ def main():
     t0 = time.time()
     try:
         proc = subprocess.run(
-            [sys.executable, str(code)],
+            [sys.executable, str(CHILD), str(code)],
             cwd=str(trial_dir),
             env=env,
             stdout=subprocess.PIPE,
@@ -100,24 +114,21 @@ def main():
     code_hash = sha256(code)
     img_hash = sha256(img)
 
-    # Try to get image size if produced
+    # Image size from the PNG header (no decoder needed)
     img_size = None
     try:
-        from PIL import Image
         if img.exists():
-            with Image.open(img) as im:
-                img_size = {'width': im.width, 'height': im.height}
+            size = png_size(img)
+            if size is None:
+                from PIL import Image
+                with Image.open(img) as im:
+                    size = im.size
+            img_size = {'width': size[0], 'height': size[1]}
     except Exception:
         pass
 
-    # Build trial_id from path segments if possible
-    parts = trial_dir.parts
-    trial_id = None
-    if len(parts) >= 5:
-        trial_id = '__'.join(parts[-5:])  # task__instance__model__condition__sample (approx)
-
     meta = {
-        'trial_id': trial_id,
+        'trial_id': trial_id or trial_fields(trial_dir)[0],
         'trial_dir': str(trial_dir),
         'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime()),
         'duration_sec': round(t1 - t0, 3),
@@ -126,9 +137,63 @@ def main():
         'image_exists': img.exists(),
         'image_sha256': img_hash,
         'image_size_px': img_size,
+        'figure_manifest': manifest.exists(),
+        'failure': None,
     }
+    if returncode != 0 or not img.exists():
+        meta['failure'] = describe((stderr or b'')[-TAIL_BYTES:].decode('utf-8', errors='replace'), returncode)
     run_meta.write_text(json.dumps(meta, indent=2))
-    print(json.dumps(meta, indent=2))
+    return meta
+
+def run_batch(runs_dir: Path, jobs=1):
+    """Run every trial under runs_dir that has code.py and data.csv; returns the number that failed."""
+    trials = []
+    for t in walk(runs_dir, require='code.py'):
+        if 'data.csv' in t.files:
+            trials.append(t)
+        else:
+            print(f"[runner] Missing data.csv in {t.path}", file=sys.stderr)
+    failed = 0
+    # each trial runs in its own subprocess, so threads are enough to run them side by side
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as tp:
+        futures = {tp.submit(run_trial, t.dir, t.trial_id): t for t in trials}
+        for fut in as_completed(futures):
+            try:
+                meta = fut.result()
+            except Exception as e:
+                # the runner itself failed (unreadable folder, run.json not writable, ...): report and go on
+                failed += 1
+                print(f"[runner] {futures[fut].trial_id} error: {type(e).__name__}: {e}", file=sys.stderr)
+                continue
+            ok = meta['failure'] is None
+            failed += not ok
+            note = '' if ok else f" ({meta['failure']['category']})"
+            print(f"[runner] {futures[fut].trial_id} rc={meta['returncode']} {meta['duration_sec']:.1f}s{note}")
+    print(f"[runner] Ran {len(trials)} trials under {runs_dir}, {failed} failed", file=sys.stderr)
+    return failed
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('trial_dir', nargs='?', help='Trial folder to run')
+    ap.add_argument('--batch', metavar='RUNS_DIR', help='Run every trial under a runs/ tree')
+    ap.add_argument('--jobs', type=int, default=1, help='Trials run at once with --batch')
+    args = ap.parse_args()
+    if bool(args.trial_dir) == bool(args.batch):
+        ap.print_usage(sys.stderr)
+        sys.exit(2)
+    if args.batch:
+        run_batch(Path(args.batch).resolve(), args.jobs)
+        return
+
+    trial_dir = Path(args.trial_dir).resolve()
+    if not trial_dir.exists():
+        print(f"[runner] Trial folder not found: {trial_dir}", file=sys.stderr)
+        sys.exit(1)
+    for name in ('code.py', 'data.csv'):
+        if not (trial_dir/name).exists():
+            print(f"[runner] Missing {name} in {trial_dir}", file=sys.stderr)
+            sys.exit(1)
+    print(json.dumps(run_trial(trial_dir), indent=2))
 
 if __name__ == '__main__':
     main()
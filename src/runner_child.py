@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# runner_child.py — Bootstrap that runner.py executes in the trial subprocess.
+#
+# Usage (by runner.py, cwd = trial folder):
+#   python runner_child.py code.py
+#
+# Runs code.py as __main__ exactly as `python code.py` would (same sys.argv[0],
+# sys.path[0] = trial folder), after wrapping matplotlib's Figure.savefig. When
+# the model saves `chart.png`, the wrapper records every Text artist that was
+# actually drawn (titles, axis labels, tick labels, legend text, annotations),
+# resolves its RGBA colour against the effective background (text bbox, legend
+# frame, axes facecolor, figure/savefig facecolor, white underneath), and writes the exact
+# WCAG contrast ratios to `figure.json` next to the chart. linter.py reads that
+# manifest, so exact text contrast needs no image decoding.
+#
+# The hook never changes what savefig writes and swallows its own errors.
+import json
+import os
+import runpy
+import sys
+from pathlib import Path
+
+MANIFEST = 'figure.json'
+CHART = 'chart.png'
+
+def rel_luminance(rgb):
+    def lin(c):
+        return c/12.92 if c <= 0.04045 else ((c+0.055)/1.055)**2.4
+    r, g, b = (lin(c) for c in rgb)
+    return 0.2126*r + 0.7152*g + 0.0722*b
+
+def wcag_ratio(fg, bg):
+    l1, l2 = rel_luminance(fg), rel_luminance(bg)
+    return (max(l1, l2) + 0.05) / (min(l1, l2) + 0.05)
+
+def over(top, under):
+    """Composite an RGBA colour over an opaque RGB one."""
+    a = top[3]
+    return tuple(a*t + (1-a)*u for t, u in zip(top[:3], under))
+
+def to_hex(rgb):
+    return '#%02x%02x%02x' % tuple(int(round(255*c)) for c in rgb)
+
+def text_kinds(fig):
+    """id(Text) -> element kind, for the texts whose role is known; id(Text) -> Legend."""
+    kinds, legends = {}, {}
+    if getattr(fig, '_suptitle', None) is not None:
+        kinds[id(fig._suptitle)] = 'title'
+    for ax in fig.get_axes():
+        for t in (ax.title, getattr(ax, '_left_title', None), getattr(ax, '_right_title', None)):
+            if t is not None:
+                kinds[id(t)] = 'title'
+        kinds[id(ax.xaxis.label)] = 'xlabel'
+        kinds[id(ax.yaxis.label)] = 'ylabel'
+        for t in ax.get_xticklabels(which='both') + ax.get_yticklabels(which='both'):
+            kinds[id(t)] = 'tick'
+    legs = [ax.get_legend() for ax in fig.get_axes()] + list(getattr(fig, 'legends', []))
+    for leg in legs:
+        if leg is not None:
+            for t in leg.get_texts() + [leg.get_title()]:
+                kinds[id(t)] = 'legend'
+                legends[id(t)] = leg
+    return kinds, legends
+
+def figure_manifest(fig, drawn, facecolor, transparent):
+    from matplotlib.colors import to_rgba
+
+    white = (1.0, 1.0, 1.0)
+    fig_bg = white if transparent else over(to_rgba(facecolor), white)
+    axes_bg = []
+    if not transparent:
+        for ax in fig.get_axes():
+            if ax.patch.get_visible():
+                axes_bg.append((ax.patch.get_window_extent(), over(to_rgba(ax.patch.get_facecolor()), fig_bg)))
+
+    kinds, legends = text_kinds(fig)
+    renderer = fig.canvas.get_renderer()
+    texts = []
+    for t in drawn:
+        s = t.get_text()
+        if not s.strip() or not t.get_visible():
+            continue
+        bg = fig_bg
+        box = t.get_window_extent(renderer)
+        cx, cy = (box.x0 + box.x1) / 2, (box.y0 + box.y1) / 2
+        for extent, color in axes_bg:
+            if extent.contains(cx, cy):
+                bg = color
+        leg = legends.get(id(t))
+        if leg is not None and leg.get_frame_on():
+            frame = leg.get_frame()
+            bg = over(to_rgba(frame.get_facecolor()), bg)
+        patch = t.get_bbox_patch()
+        if patch is not None and patch.get_visible() and patch.get_fill():
+            bg = over(to_rgba(patch.get_facecolor()), bg)
+        fg = over(to_rgba(t.get_color(), t.get_alpha()), bg)
+        texts.append({
+            'kind': kinds.get(id(t), 'text'),
+            'text': s[:40],
+            'color': to_hex(fg),
+            'background': to_hex(bg),
+            'ratio': round(wcag_ratio(fg, bg), 3),
+        })
+
+    min_by_kind = {}
+    for item in texts:
+        k = item['kind']
+        min_by_kind[k] = min(min_by_kind.get(k, item['ratio']), item['ratio'])
+    worst = min(texts, key=lambda x: x['ratio']) if texts else None
+    return {
+        'n_texts': len(texts),
+        'min_ratio': worst['ratio'] if worst else None,
+        'min_by_kind': min_by_kind,
+        'worst': worst,
+        'texts': texts,
+    }
+
+def install_hook():
+    try:
+        import matplotlib.figure
+        import matplotlib.text
+    except Exception:
+        return
+    Figure = matplotlib.figure.Figure
+    Text = matplotlib.text.Text
+    orig_savefig = Figure.savefig
+    orig_draw = Text.draw
+    recording = []   # stack of {id: Text} drawn during the current chart.png savefig
+
+    def draw(self, renderer, *args, **kwargs):
+        if recording:
+            recording[-1][id(self)] = self
+        return orig_draw(self, renderer, *args, **kwargs)
+
+    def savefig(self, fname, *args, **kwargs):
+        target = None
+        if isinstance(fname, (str, os.PathLike)):
+            target = Path(os.fspath(fname))
+            if target.suffix == '':
+                target = target.with_suffix('.png')
+        if target is None or target.name != CHART:
+            return orig_savefig(self, fname, *args, **kwargs)
+        recording.append({})
+        try:
+            result = orig_savefig(self, fname, *args, **kwargs)
+        finally:
+            drawn = list(recording.pop().values())
+        try:
+            import matplotlib
+            facecolor = kwargs.get('facecolor', matplotlib.rcParams['savefig.facecolor'])
+            if facecolor == 'auto':
+                facecolor = self.get_facecolor()
+            transparent = kwargs.get('transparent', matplotlib.rcParams['savefig.transparent'])
+            manifest = figure_manifest(self, drawn, facecolor, bool(transparent))
+            (target.parent / MANIFEST).write_text(json.dumps(manifest, indent=2))
+        except Exception as e:
+            (target.parent / MANIFEST).write_text(json.dumps({'error': f'{type(e).__name__}: {e}'}))
+        return result
+
+    Text.draw = draw
+    Figure.savefig = savefig
+
+def main():
+    if len(sys.argv) != 2:
+        print('Usage: python runner_child.py code.py', file=sys.stderr)
+        sys.exit(2)
+    code = os.path.abspath(sys.argv[1])
+    sys.argv = [sys.argv[1]]
+    sys.path[0] = os.path.dirname(code)
+    install_hook()
+    runpy.run_path(code, run_name='__main__')
+
+if __name__ == '__main__':
+    main()
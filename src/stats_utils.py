@@ -0,0 +1,15 @@
+# stats_utils.py — Percentiles of already sorted lists, without numpy or pandas.
+#
+# Shared by linter.py (--timings summary) and aggregate.py (lint_timings.csv), so
+# the linter does not import the reporting stack just for these.
+
+def percentile_position(n, q):
+    """(position, lower index, upper index) of the q-th percentile among n sorted values."""
+    pos = (n - 1) * q / 100
+    lo = int(pos)
+    return pos, lo, min(lo + 1, n - 1)
+
+def percentile(sorted_vals, q):
+    """Linear-interpolated percentile (numpy's default) of an already sorted list."""
+    pos, lo, hi = percentile_position(len(sorted_vals), q)
+    return sorted_vals[lo] + (pos - lo) * (sorted_vals[hi] - sorted_vals[lo])
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# watch.py — Keep runs/ executed, linted and aggregated while you work on trials.
+#
+# Usage (from the repo root):
+#   python -m src.watch runs/ [--out reports] [--jobs 2] [--debounce 1.0] [--poll 1.0] [--once]
+#
+# Watches every runs/<task>/<model>/<condition>/<sample>/ folder. When code.py
+# or data.csv is saved, the trial is scheduled once the folder has been quiet
+# for --debounce seconds: runner.py (subprocess), then the linter (in-process,
+# sharing the lint and pixel caches), then that trial's row is re-read, upserted
+# into --out/results.sqlite and the reports in --out are exported from it.
+# Trial records come from aggregate.py's manifest (.cache/aggregate.sqlite):
+# on start only trials changed since it was last synced are re-read, and each
+# finished trial's run.json/lint.json is recorded in it.
+# At most --jobs trials are processed at once. A trial saved again while it is
+# running is re-run when it finishes.
+#
+# On start, trials whose code.py/data.csv are newer than their run.json are
+# scheduled too; --once processes just those and exits.
+#
+# Change detection uses inotify on Linux (via ctypes, no extra dependency) and
+# falls back to polling the mtimes of code.py/data.csv every --poll seconds.
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+# sibling modules, also when started as `python -m src.watch`
+SRC = Path(__file__).resolve().parent
+sys.path.insert(0, str(SRC))
+
+from aggregate import (ALWAYS_WRITTEN, cached_trials, export, refresh_trials, report_state,  # noqa: E402
+                       sync_manifest)
+from aggregate_cache import AggregateCache  # noqa: E402
+from crawl import TRIAL_DEPTH, trial_fields, walk  # noqa: E402
+from lint_cache import LintCache  # noqa: E402
+from linter import (TrialInputs, configure, lint_trial, load_config, missing_inputs, select_rules,  # noqa: E402
+                    write_lint)
+from rubric_keys import DEFAULT_GOLD  # noqa: E402
+
+WATCHED = ('code.py', 'data.csv')
+
+def trial_of(runs_dir: Path, path: Path):
+    """The trial folder a changed code.py/data.csv belongs to, else None."""
+    try:
+        rel = path.relative_to(runs_dir)
+    except ValueError:
+        return None
+    if len(rel.parts) != TRIAL_DEPTH + 1 or rel.name not in WATCHED:
+        return None
+    return path.parent
+
+def trial_dirs(runs_dir: Path):
+    return [t.dir for t in walk(runs_dir, require=None)]
+
+def is_stale(trial_dir: Path):
+    """code.py/data.csv newer than the last run (or never run)."""
+    try:
+        ran = (trial_dir/'run.json').stat().st_mtime
+    except OSError:
+        return (trial_dir/'code.py').exists()
+    return any((trial_dir/n).exists() and (trial_dir/n).stat().st_mtime > ran for n in WATCHED)
+
+# --- change sources ---------------------------------------------------------
+
+class Inotify:
+    """Recursive inotify watch of the runs tree (directories down to the trial folders)."""
+    IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE = 0x8, 0x80, 0x100
+    IN_Q_OVERFLOW, IN_ISDIR = 0x4000, 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, runs_dir: Path):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.runs_dir = runs_dir
+        self.dirs = {}
+        self.add_tree(runs_dir)
+
+    def add_tree(self, top: Path):
+        depth = len(top.relative_to(self.runs_dir).parts)
+        if depth > TRIAL_DEPTH:
+            return
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(top), self.MASK)
+        if wd >= 0:
+            self.dirs[wd] = top
+        if depth < TRIAL_DEPTH:
+            for sub in top.iterdir():
+                if sub.is_dir():
+                    self.add_tree(sub)
+
+    def changes(self, timeout: float):
+        """Trial folders with a written code.py/data.csv; None means 'rescan everything'."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 1 << 16)
+        found = set()
+        off = 0
+        while off < len(data):
+            wd, mask, _, n = self.EVENT.unpack_from(data, off)
+            name = data[off + self.EVENT.size: off + self.EVENT.size + n].rstrip(b'\0')
+            off += self.EVENT.size + n
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            parent = self.dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = parent / os.fsdecode(name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self.add_tree(path)
+                    found.update(d for d in trial_dirs(self.runs_dir) if path in (d, *d.parents)
+                                 and (d/'code.py').exists())
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                trial = trial_of(self.runs_dir, path)
+                if trial is not None:
+                    found.add(trial)
+        return found
+
+class Poller:
+    """mtime/size snapshot of every code.py/data.csv, compared every `interval` seconds."""
+
+    def __init__(self, runs_dir: Path, interval: float):
+        self.runs_dir = runs_dir
+        self.interval = interval
+        self.snapshot = self.scan()
+        self.next = time.time() + interval
+
+    def scan(self):
+        snap = {}
+        for d in trial_dirs(self.runs_dir):
+            for name in WATCHED:
+                try:
+                    st = os.stat(d/name)
+                except OSError:
+                    continue
+                snap[d/name] = (st.st_mtime_ns, st.st_size)
+        return snap
+
+    def changes(self, timeout: float):
+        wait_s = self.next - time.time()
+        if wait_s > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0.0, wait_s))
+        self.next = time.time() + self.interval
+        snap = self.scan()
+        changed = {p.parent for p, sig in snap.items() if self.snapshot.get(p) != sig}
+        self.snapshot = snap
+        return changed
+
+# --- pipeline ---------------------------------------------------------------
+
+def process(trial_dir: Path, rules, pixels):
+    """runner.py, then lint (rules whose inputs exist); returns (returncode, seconds)."""
+    t0 = time.time()
+    proc = subprocess.run([sys.executable, str(SRC/'runner.py'), str(trial_dir)],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    usable = [r for r in rules if not missing_inputs(trial_dir, [r])]
+    cache = LintCache()
+    t = TrialInputs(trial_dir, pixels)
+    try:
+        write_lint(trial_dir, lint_trial(t, usable, cache))
+    finally:
+        t.close()
+        cache.close()
+    return proc.returncode, time.time() - t0
+
+class Status:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = self.failed = 0
+        self.last = ''
+        self.tty = sys.stderr.isatty()
+
+    def show(self, queued: int, running: int):
+        line = (f'[watch] {self.total} trials | queued {queued} | running {running} | '
+                f'done {self.done} | failed {self.failed}' + (f' | last: {self.last}' if self.last else ''))
+        if self.tty:
+            print('\r' + line[:160].ljust(160), end='', file=sys.stderr, flush=True)
+        else:
+            print(line, file=sys.stderr)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('runs', nargs='?', default='runs', help='Path to runs/ directory (task-first)')
+    ap.add_argument('--out', default='reports', help='Directory to write aggregated CSVs')
+    ap.add_argument('--jobs', type=int, default=2, help='Trials processed concurrently')
+    ap.add_argument('--debounce', type=float, default=1.0, help='Quiet seconds before a changed trial runs')
+    ap.add_argument('--poll', type=float, default=1.0, help='Polling interval without inotify')
+    ap.add_argument('--once', action='store_true', help='Process stale trials, write reports and exit')
+    args = ap.parse_args()
+
+    runs_dir = Path(args.runs).resolve()
+    out_dir = Path(args.out)
+    if not runs_dir.is_dir():
+        print(f"[watch] Runs folder not found: {runs_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        configure(load_config())
+    except ValueError as e:
+        print(f"[watch] {e}", file=sys.stderr)
+        sys.exit(2)
+    rules = select_rules()
+    pixels = None
+    if any(r.needs_pixels for r in rules):
+        from pixel_cache import PixelCache
+        pixels = PixelCache()
+
+    # the manifest of aggregate.py: only trials changed since it last ran are re-read
+    cache = AggregateCache()
+    out_key = str(out_dir.resolve())
+    changed, state = sync_manifest(runs_dir, cache)
+    state = report_state(state, 'csv', DEFAULT_GOLD)
+    trials = cached_trials(runs_dir, cache)
+    if (changed or cache.output_state(out_key) != state
+            or not all((out_dir/n).exists() for n in ALWAYS_WRITTEN)):
+        export(out_dir, trials, verbose=False)
+        cache.set_output_state(out_key, state)
+    source = None
+    if not args.once:
+        try:
+            source = Inotify(runs_dir)
+            how = 'inotify'
+        except (OSError, AttributeError, TypeError):
+            source = Poller(runs_dir, args.poll)
+            how = f'polling every {args.poll:g}s'
+        print(f'[watch] Watching {runs_dir} ({how}); reports in {out_dir}', file=sys.stderr)
+
+    pending = {d: 0.0 for d in trial_dirs(runs_dir) if is_stale(d)}   # trial -> run not before
+    running = {}    # future -> trial
+    status = Status(len(trials))
+    status.show(len(pending), 0)
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        try:
+            while True:
+                now = time.time()
+                busy = set(running.values())
+                for d in sorted(d for d, due in pending.items() if due <= now and d not in busy):
+                    if len(running) >= args.jobs:
+                        break
+                    del pending[d]
+                    running[pool.submit(process, d, rules, pixels)] = d
+
+                if args.once and not pending and not running:
+                    break
+                if running:
+                    done, _ = wait(running, timeout=0.05, return_when=FIRST_COMPLETED)
+                    finished = []
+                    for fut in done:
+                        d = running.pop(fut)
+                        try:
+                            rc, secs = fut.result()
+                        except Exception as e:
+                            rc, secs = f'{type(e).__name__}: {e}', 0.0
+                        finished.append(d)
+                        status.done += 1
+                        status.failed += rc != 0
+                        status.last = f"{trial_fields(d)[0]} rc={rc} {secs:.1f}s"
+                    if done:
+                        for d in finished:   # dropped if it has no run.json
+                            trials.pop(trial_fields(d)[0], None)
+                        trials.update(refresh_trials(runs_dir, cache, finished))
+                        status.total = len(trials)
+                        export(out_dir, trials, verbose=False)
+                        # written from the manifest, but not from a full sync_manifest() state
+                        cache.set_output_state(out_key, None)
+                        status.show(len(pending), len(running))
+
+                if source is not None:
+                    due = [t for t in pending.values() if t > now]
+                    timeout = 0.0 if running else max(0.05, min(due, default=now + 1.0) - now)
+                    changed = source.changes(timeout)
+                    if changed is None:   # inotify queue overflow: catch up from mtimes
+                        changed = {d for d in trial_dirs(runs_dir) if is_stale(d)}
+                    for d in changed:
+                        pending[d] = time.time() + args.debounce
+                    if changed:
+                        status.show(len(pending), len(running))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            cache.close()
+    if status.tty:
+        print(file=sys.stderr)
+    print(f'[watch] Processed {status.done} trials ({status.failed} failed); reports in {out_dir}',
+          file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
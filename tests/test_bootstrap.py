@@ -0,0 +1,82 @@
+# test_bootstrap.py — bootstrap_rates() draws and the intervals add_intervals() builds from them:
+# reproducible for a seed, paired across conditions for the prompt gains, NaN with one cluster.
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT/'src'))
+
+import bootstrap  # noqa: E402
+from bootstrap import bootstrap_rates, percentile_interval  # noqa: E402
+from metrics import KEYS, add_intervals, compute_metrics  # noqa: E402
+
+def lint_frame(rows):
+    """A load_lint()-like frame from (task, model, condition, sample, rule, status) tuples."""
+    df = pd.DataFrame(rows, columns=['task', 'model', 'condition', 'sample', 'rule', 'status'])
+    df.insert(0, 'trial_id', df['task'] + '__' + df['model'] + '__' + df['condition'] + '__' + df['sample'])
+    df['ratio'] = np.nan
+    for col in KEYS + ['status']:
+        df[col] = df[col].astype('category')
+    return df
+
+def intervals(lint, **kw):
+    return add_intervals(compute_metrics(lint), lint, resamples=2000, **kw)
+
+# two (task, sample) pairs of one model and rule: pair A violates under baseline and standards,
+# pair B never does, and nobody violates under selfcheck
+PAIRED = lint_frame([
+    ('t01_bars', 'grok', 'baseline', 's1', 'labels_present', 'fail'),
+    ('t01_bars', 'grok', 'standards', 's1', 'labels_present', 'fail'),
+    ('t01_bars', 'grok', 'selfcheck', 's1', 'labels_present', 'pass'),
+    ('t02_line_gaps', 'grok', 'baseline', 's1', 'labels_present', 'pass'),
+    ('t02_line_gaps', 'grok', 'standards', 's1', 'labels_present', 'pass'),
+    ('t02_line_gaps', 'grok', 'selfcheck', 's1', 'labels_present', 'pass'),
+])
+
+def test_fixed_seed_is_deterministic():
+    a = intervals(PAIRED, seed=7)
+    b = intervals(PAIRED, seed=7)
+    for name in a:
+        pd.testing.assert_frame_equal(a[name], b[name])
+
+def test_batches_on_a_process_pool_draw_the_same(monkeypatch):
+    monkeypatch.setattr(bootstrap, 'BATCH_CELLS', 50)   # many batches
+    rng = np.random.default_rng(0)
+    successes, group = rng.integers(0, 2, 40), np.repeat(np.arange(4), 10)
+    one = bootstrap_rates(successes, np.ones(40), group, resamples=300, seed=3, jobs=1)
+    two = bootstrap_rates(successes, np.ones(40), group, resamples=300, seed=3, jobs=2)
+    np.testing.assert_array_equal(one, two)
+
+def test_paired_gains():
+    pg = intervals(PAIRED, seed=0)['prompt_gain_by_rule_model'].iloc[0]
+    # baseline and standards come from the same draw of pairs: their difference is always 0,
+    # where independent draws of the two rates (1/2 each) would spread from -1/2 to 1/2
+    assert pg['gain_baseline_to_standards'] == 0
+    assert (pg['gain_baseline_to_standards_ci_low'], pg['gain_baseline_to_standards_ci_high']) == (0, 0)
+    # standards - selfcheck is the share of pair A in a draw of 2: 0, 1/2 or 1 (p = 1/4, 1/2, 1/4)
+    assert pg['gain_standards_to_selfcheck'] == 0.5
+    assert (pg['gain_standards_to_selfcheck_ci_low'], pg['gain_standards_to_selfcheck_ci_high']) == (0, 1)
+
+def test_cluster_with_one_task_has_no_bounds():
+    one_task = lint_frame([('t01_bars', 'grok', condition, sample, 'labels_present', status)
+                           for condition in ('baseline', 'standards', 'selfcheck')
+                           for sample, status in (('s1', 'fail'), ('s2', 'pass'), ('s3', 'pass'))])
+    tables = intervals(one_task, cluster=True)
+    pg = tables['prompt_gain_by_rule_model'].iloc[0]
+    assert pg[[f'{g}_ci_{b}' for g in ('gain_baseline_to_standards', 'gain_standards_to_selfcheck')
+               for b in ('low', 'high')]].isna().all()
+    rates = tables['violation_rate_by_model_condition_rule']
+    assert rates[['violation_rate_ci_low', 'violation_rate_ci_high']].isna().all().all()
+    # resampling samples (no cluster) still gives bounds
+    rates = intervals(one_task)['violation_rate_by_model_condition_rule']
+    assert rates[['violation_rate_ci_low', 'violation_rate_ci_high']].notna().all().all()
+
+def test_percentile_interval_skips_nan_draws():
+    draws = np.array([[0.0, np.nan], [1.0, np.nan], [np.nan, np.nan], [0.5, np.nan]])
+    low, high = percentile_interval(draws, confidence=1.0)
+    assert (low[0], high[0]) == (0.0, 1.0)
+    assert np.isnan(low[1]) and np.isnan(high[1])
@@ -0,0 +1,48 @@
+# test_calibrate_contrast.py — sweep() (sort + searchsorted + cumsum) must give the confusion counts
+# of flagging `ratio < threshold` at every threshold, ties included.
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT/'src'))
+
+from calibrate_contrast import at_threshold, sweep  # noqa: E402
+
+# unsorted, with ties among problems, among non-problems and across the two
+RATIO = np.array([4.5, 2.1, 7.0, 4.5, 3.0, 2.1, 4.5, 10.2, 3.0, 1.5, 7.0, 4.5])
+PROBLEM = np.array([1, 1, 0, 0, 1, 1, 0, 0, 0, 1, 0, 1])
+
+def brute_force(ratio, problem, t):
+    flag = ratio < t
+    return {'tp': int((flag & (problem == 1)).sum()), 'fp': int((flag & (problem == 0)).sum()),
+            'fn': int((~flag & (problem == 1)).sum()), 'tn': int((~flag & (problem == 0)).sum())}
+
+def test_sweep_matches_brute_force():
+    curve = sweep(RATIO, PROBLEM)
+    u = np.unique(RATIO)
+    cuts = np.concatenate([[u[0]], (u[:-1] + u[1:]) / 2, [u[-1] + 0.01]])
+    assert len(curve) == len(cuts)
+    assert curve['threshold'].tolist() == np.round(cuts, 3).tolist()
+    for row, t in zip(curve.itertuples(), cuts):
+        expected = brute_force(RATIO, PROBLEM, t)
+        assert {k: getattr(row, k) for k in expected} == expected, t
+        n = len(RATIO)
+        po = (expected['tp'] + expected['tn']) / n
+        flagged, pos = expected['tp'] + expected['fp'], int(PROBLEM.sum())
+        pe = (flagged * pos + (n - flagged) * (n - pos)) / n ** 2
+        assert row.accuracy == pytest.approx(po, abs=1e-4)
+        if pe < 1:
+            assert row.cohen_kappa == pytest.approx((po - pe) / (1 - pe), abs=1e-4)
+
+def test_sweep_ends_flag_nothing_and_everything():
+    curve = sweep(RATIO, PROBLEM)
+    assert curve.iloc[0][['tp', 'fp']].tolist() == [0, 0]
+    assert curve.iloc[-1][['fn', 'tn']].tolist() == [0, 0]
+
+@pytest.mark.parametrize('t', [1.5, 2.1, 3.0, 4.5, 4.6, 7.0, 11.0])
+def test_at_threshold_flags_like_the_threshold(t):
+    row = at_threshold(sweep(RATIO, PROBLEM), RATIO, t)
+    assert {k: row[k] for k in ('tp', 'fp', 'fn', 'tn')} == brute_force(RATIO, PROBLEM, t)
@@ -0,0 +1,21 @@
+# test_contrast.py — contrast_ratio() (lookup tables + histograms, band by band) must agree with
+# the float32 reference contrast_ratio_float() on every rendered chart under runs/.
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT/'src'))
+
+from chart_pixels import contrast_ratio, contrast_ratio_float, contrast_ratio_rgb, load_rgb  # noqa: E402
+
+CHARTS = sorted(ROOT.glob('runs/*/*/*/*/chart.png'))
+
+@pytest.mark.parametrize('chart', CHARTS, ids=lambda p: p.parent.relative_to(ROOT/'runs').as_posix())
+def test_contrast_ratio_matches_float(chart):
+    rgb = load_rgb(chart)
+    ratio = contrast_ratio(chart)
+    assert ratio == pytest.approx(contrast_ratio_float(rgb), abs=1e-3)
+    # the banded path and the whole-array path build the same histograms
+    assert ratio == contrast_ratio_rgb(rgb)
@@ -0,0 +1,72 @@
+# test_write_reports.py — write_reports() must write the same bytes whether its rows are sorted in
+# memory or through spill files (--stream), on a small runs/ tree with ties and timed entries.
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT/'src'))
+
+from aggregate import LintJsonlStream, collect, stream_records, write_reports  # noqa: E402
+from crawl import walk  # noqa: E402
+
+def lint_entries(i):
+    """A few lint.json entries; rules repeat across trials (ties in the sort keys) and some are timed."""
+    entries = [
+        {'rule': 'labels_present', 'status': 'fail' if i % 3 == 0 else 'pass', 'detail': 'title'},
+        {'rule': 'contrast_text', 'status': 'warn' if i % 2 else 'pass', 'ratio': 3.0 + i % 4,
+         'time_ms': float(i % 5), 'bytes_read': 100 * i},
+        {'rule': 'legend_call', 'status': 'warn', 'detail': 'no legend() call', 'time_ms': 1.5},
+    ]
+    if i % 2:
+        entries.append({'rule': 'perf_row_iteration', 'status': 'warn', 'line': 3, 'complexity': 'O(n)',
+                        'detail': 'iterrows (+1 more)',
+                        'findings': [{'line': 3, 'complexity': 'O(n)', 'detail': 'iterrows'},
+                                     {'line': 9, 'complexity': 'O(n^2)', 'detail': 'iterrows'}]})
+    else:
+        entries.append({'rule': 'perf_row_iteration', 'status': 'pass'})
+    return entries
+
+@pytest.fixture
+def runs_dir(tmp_path):
+    runs = tmp_path/'runs'
+    i = 0
+    for task in ('t01_bars', 't02_line_gaps'):
+        for model in ('gemini25pro', 'grok'):
+            for condition in ('baseline', 'selfcheck', 'standards'):
+                for sample in ('s1', 's2'):
+                    d = runs/task/model/condition/sample
+                    d.mkdir(parents=True)
+                    run = {'timestamp': f'2025-01-01T00:00:{i:02d}', 'duration_sec': 1.0 + i / 10,
+                           'returncode': i % 7 == 0, 'code_sha256': f'{i:064x}', 'image_exists': True,
+                           'image_size_px': {'width': 640, 'height': 480}}
+                    (d/'run.json').write_text(json.dumps(run), encoding='utf-8')
+                    (d/'lint.json').write_text(json.dumps(lint_entries(i)), encoding='utf-8')
+                    i += 1
+    return runs
+
+def read_reports(out_dir: Path):
+    return {p.name: p.read_bytes() for p in sorted(out_dir.iterdir()) if p.is_file()}
+
+@pytest.mark.parametrize('spill_rows', [1, 5, 1000])
+def test_spilled_reports_match_in_memory(runs_dir, tmp_path, spill_rows):
+    write_reports(tmp_path/'memory', collect(runs_dir))
+    write_reports(tmp_path/'spilled', stream_records(runs_dir), spill_rows=spill_rows)
+    memory, spilled = read_reports(tmp_path/'memory'), read_reports(tmp_path/'spilled')
+    assert {'runs.csv', 'lint_summary.csv', 'violations.csv', 'lint_timings.csv', 'perf_patterns.csv'} <= set(memory)
+    assert spilled == memory
+    # the spill folder is gone afterwards
+    assert not any(p.name.startswith('.spill-') for p in (tmp_path/'spilled').iterdir())
+
+def test_streamed_lint_jsonl_matches_lint_json(runs_dir, tmp_path):
+    jsonl = tmp_path/'lint.jsonl'
+    with jsonl.open('w', encoding='utf-8') as f:
+        for t in walk(runs_dir, require='lint.json'):
+            lint = json.loads((t.dir/'lint.json').read_text(encoding='utf-8'))
+            f.write(json.dumps({'trial_id': t.trial_id, 'task': t.task, 'model': t.model,
+                                'condition': t.condition, 'sample': t.sample, 'lint': lint}) + '\n')
+    write_reports(tmp_path/'memory', collect(runs_dir))
+    write_reports(tmp_path/'jsonl', stream_records(runs_dir, LintJsonlStream(jsonl)), spill_rows=5)
+    assert read_reports(tmp_path/'jsonl') == read_reports(tmp_path/'memory')